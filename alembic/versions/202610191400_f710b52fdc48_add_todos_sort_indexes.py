@@ -0,0 +1,263 @@
+"""add todos sort indexes
+
+Revision ID: f710b52fdc48
+Revises: 5d0ed6a36401
+Create Date: 2026-10-19 14:00:48.257391
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f710b52fdc48"
+down_revision: Union[str, Sequence[str], None] = "5d0ed6a36401"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# subtask_count をSubTaskの追加・削除に合わせて更新する
+# app.db.todo.SUBTASK_COUNT_TRIGGERS のこの時点の写し
+# モデルの変更で過去のマイグレーションが変わらないよう
+# importせずにここに固定する
+COUNT_SUBTASKS = """
+CREATE OR REPLACE FUNCTION count_subtasks() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    ids uuid[];
+    ns bigint[];
+BEGIN
+    -- Todoごとの増減をtodo_idの順に集める
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(todo_id ORDER BY todo_id),
+            array_agg(n ORDER BY todo_id)
+        INTO ids, ns
+        FROM (
+            SELECT todo_id, count(*) AS n
+            FROM new_subtasks GROUP BY todo_id
+        ) AS d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(todo_id ORDER BY todo_id),
+            array_agg(-n ORDER BY todo_id)
+        INTO ids, ns
+        FROM (
+            SELECT todo_id, count(*) AS n
+            FROM old_subtasks GROUP BY todo_id
+        ) AS d;
+    ELSE
+        -- todo_idが変わった分だけ付け替える
+        SELECT array_agg(todo_id ORDER BY todo_id),
+            array_agg(n ORDER BY todo_id)
+        INTO ids, ns
+        FROM (
+            SELECT todo_id, sum(n) AS n
+            FROM (
+                SELECT todo_id, 1 AS n FROM new_subtasks
+                UNION ALL
+                SELECT todo_id, -1 AS n FROM old_subtasks
+            ) AS s
+            GROUP BY todo_id HAVING sum(n) <> 0
+        ) AS d;
+    END IF;
+    IF ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+    -- Todoをまたぐ一括処理同士でデッドロックしないよう
+    -- 更新の前にtodo_idの順で行ロックを取る
+    -- 行ロックは下のUPDATEでも同じくコミットまで持つので
+    -- 同じTodoへの書き込みは元から直列になる
+    -- ここで変わるのはロックを取る順番だけ
+    PERFORM 1 FROM todos
+    WHERE todo_id = ANY(ids)
+    ORDER BY todo_id
+    FOR NO KEY UPDATE;
+    UPDATE todos
+    SET subtask_count = todos.subtask_count + d.n
+    FROM unnest(ids, ns) AS d(todo_id, n)
+    WHERE todos.todo_id = d.todo_id;
+    RETURN NULL;
+END
+$$
+"""
+
+# 既存のTodoの subtask_count を数える
+BACKFILL_BATCH_SIZE = 1000
+# todo_idの範囲ごとにコミットし、ロックを長く持たない
+# 先に行ロックを取ってから数えることで、並行する
+# トリガーの更新を取りこぼさずに上書きしない
+BACKFILL_SUBTASK_COUNT = f"""
+DO $$
+DECLARE
+    last_id uuid := '00000000-0000-0000-0000-000000000000';
+    ids uuid[];
+BEGIN
+    LOOP
+        SELECT array_agg(todo_id ORDER BY todo_id) INTO ids
+        FROM (
+            SELECT todo_id FROM todos
+            WHERE todo_id > last_id
+            ORDER BY todo_id
+            LIMIT {BACKFILL_BATCH_SIZE}
+            FOR NO KEY UPDATE
+        ) AS t;
+        EXIT WHEN ids IS NULL;
+
+        UPDATE todos
+        SET subtask_count = c.n
+        FROM (
+            SELECT t.todo_id, count(s.subtask_id) AS n
+            FROM unnest(ids) AS t(todo_id)
+            LEFT JOIN subtasks AS s ON s.todo_id = t.todo_id
+            GROUP BY t.todo_id
+        ) AS c
+        WHERE todos.todo_id = c.todo_id
+            AND todos.subtask_count <> c.n;
+
+        last_id := ids[array_length(ids, 1)];
+        COMMIT;
+    END LOOP;
+END
+$$
+"""
+
+# (インデックス名, 列)
+NEW_INDEXES = [
+    ("ix_todos_created_at_todo_id", ["created_at", "todo_id"]),
+    ("ix_todos_updated_at_todo_id", ["updated_at", "todo_id"]),
+    ("ix_todos_title_todo_id", ["title", "todo_id"]),
+    (
+        "ix_todos_status_created_at_todo_id",
+        ["status", "created_at", "todo_id"],
+    ),
+    (
+        "ix_todos_subtask_count_todo_id",
+        ["subtask_count", "todo_id"],
+    ),
+]
+# todo_idを含むインデックスで置き換えるもの
+OLD_INDEXES = [
+    ("ix_todos_created_at", ["created_at"]),
+    ("ix_todos_updated_at", ["updated_at"]),
+    ("ix_todos_status_created_at", ["status", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 前処理
+    pre_upgrade()
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column(
+        "todos",
+        sa.Column(
+            "subtask_count",
+            sa.Integer(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+    # 先にトリガーを作り、以降の増減を反映させる
+    op.execute(COUNT_SUBTASKS)
+    op.execute(
+        "CREATE TRIGGER subtasks_count_insert"
+        " AFTER INSERT ON subtasks"
+        " REFERENCING NEW TABLE AS new_subtasks"
+        " FOR EACH STATEMENT EXECUTE FUNCTION count_subtasks()"
+    )
+    op.execute(
+        "CREATE TRIGGER subtasks_count_delete"
+        " AFTER DELETE ON subtasks"
+        " REFERENCING OLD TABLE AS old_subtasks"
+        " FOR EACH STATEMENT EXECUTE FUNCTION count_subtasks()"
+    )
+    op.execute(
+        "CREATE TRIGGER subtasks_count_update"
+        " AFTER UPDATE ON subtasks"
+        " REFERENCING OLD TABLE AS old_subtasks"
+        " NEW TABLE AS new_subtasks"
+        " FOR EACH STATEMENT EXECUTE FUNCTION count_subtasks()"
+    )
+    # DOの中でコミットするためトランザクションの外で実行する
+    with op.get_context().autocommit_block():
+        op.execute(BACKFILL_SUBTASK_COUNT)
+        # 書き込みを止めないようCONCURRENTLYで作成する
+        # INVALIDなインデックスを残さないよう
+        # IF NOT EXISTSは付けない
+        for name, columns in NEW_INDEXES:
+            op.create_index(
+                name,
+                "todos",
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+        for name, _ in OLD_INDEXES:
+            op.drop_index(
+                name,
+                table_name="todos",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    # ### end Alembic commands ###
+    # 後処理
+    post_upgrade()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 前処理
+    pre_downgrade()
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.get_context().autocommit_block():
+        for name, columns in OLD_INDEXES:
+            op.create_index(
+                name,
+                "todos",
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+        for name, _ in reversed(NEW_INDEXES):
+            op.drop_index(
+                name,
+                table_name="todos",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.execute(
+        "DROP TRIGGER subtasks_count_update ON subtasks"
+    )
+    op.execute(
+        "DROP TRIGGER subtasks_count_delete ON subtasks"
+    )
+    op.execute(
+        "DROP TRIGGER subtasks_count_insert ON subtasks"
+    )
+    op.execute("DROP FUNCTION count_subtasks()")
+    op.drop_column("todos", "subtask_count")
+    # ### end Alembic commands ###
+    # 後処理
+    post_downgrade()
+
+
+def pre_upgrade() -> None:
+    # スキーマ更新前に実行する必要がある処理
+    pass
+
+
+def post_upgrade() -> None:
+    # スキーマ更新後に実行する必要がある処理
+    pass
+
+
+def pre_downgrade() -> None:
+    # スキーマ更新前に実行する必要がある処理
+    pass
+
+
+def post_downgrade() -> None:
+    # スキーマ更新後に実行する必要がある処理
+    pass
@@ -1,8 +1,12 @@
 from fastapi import APIRouter
 
+from .diagnostics import router as diagnostics_router
 from .operations import router as operations_router
 from .todos import router as todos_router
 
 router = APIRouter()
 router.include_router(todos_router, prefix="/todos")
 router.include_router(operations_router, prefix="/operations")
+router.include_router(
+    diagnostics_router, prefix="/diagnostics"
+)
@@ -0,0 +1,41 @@
+from typing import Literal
+from uuid import UUID
+
+from app.models import BaseModel
+
+type KeyType = Literal["lineno", "filename", "traceback"]
+
+
+class AllocationStat(BaseModel):
+    traceback: list[str]
+    size: int
+    count: int
+
+
+class AllocationDiff(AllocationStat):
+    size_diff: int
+    count_diff: int
+
+
+class TracemallocStatusResponse(BaseModel):
+    tracing: bool
+    traceback_limit: int
+    current: int
+    peak: int
+    snapshots: list[UUID]
+
+
+class TakeSnapshotResponse(BaseModel):
+    snapshot_id: UUID
+    top: list[AllocationStat]
+
+
+class SnapshotStatsResponse(BaseModel):
+    snapshot_id: UUID
+    top: list[AllocationStat]
+
+
+class CompareSnapshotsResponse(BaseModel):
+    snapshot_id: UUID
+    base_snapshot_id: UUID
+    top: list[AllocationDiff]
@@ -0,0 +1,155 @@
+import tracemalloc
+from uuid import UUID, uuid4
+
+from starlette.concurrency import run_in_threadpool
+
+from app.exceptions import BadRequest, NotFound
+
+from .schemas import (
+    AllocationDiff,
+    AllocationStat,
+    CompareSnapshotsResponse,
+    KeyType,
+    SnapshotStatsResponse,
+    TakeSnapshotResponse,
+    TracemallocStatusResponse,
+)
+
+# 保持するスナップショットの上限。超えたら古いものから捨てる
+MAX_SNAPSHOTS = 10
+
+# 計測自体やimportによる確保は除外する
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+# ワーカープロセスごとの状態
+_snapshots: dict[UUID, tracemalloc.Snapshot] = {}
+
+
+def _get_snapshot(snapshot_id: UUID) -> tracemalloc.Snapshot:
+    snapshot = _snapshots.get(snapshot_id)
+    if snapshot is None:
+        raise NotFound("Snapshot", snapshot_id)
+    return snapshot
+
+
+def _status() -> TracemallocStatusResponse:
+    current, peak = tracemalloc.get_traced_memory()
+    return TracemallocStatusResponse(
+        tracing=tracemalloc.is_tracing(),
+        traceback_limit=tracemalloc.get_traceback_limit(),
+        current=current,
+        peak=peak,
+        snapshots=list(_snapshots),
+    )
+
+
+def _top(
+    snapshot: tracemalloc.Snapshot,
+    key_type: KeyType,
+    limit: int,
+) -> list[AllocationStat]:
+    return [
+        AllocationStat(
+            traceback=stat.traceback.format(),
+            size=stat.size,
+            count=stat.count,
+        )
+        for stat in snapshot.statistics(key_type)[:limit]
+    ]
+
+
+class GetTracemallocStatus:
+    async def execute(self) -> TracemallocStatusResponse:
+        return _status()
+
+
+class StartTracemalloc:
+    async def execute(
+        self, frames: int
+    ) -> TracemallocStatusResponse:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return _status()
+
+
+class StopTracemalloc:
+    async def execute(self) -> TracemallocStatusResponse:
+        tracemalloc.stop()
+        _snapshots.clear()
+        return _status()
+
+
+class TakeSnapshot:
+    async def execute(
+        self, key_type: KeyType, limit: int
+    ) -> TakeSnapshotResponse:
+        if not tracemalloc.is_tracing():
+            raise BadRequest(
+                message="tracemalloc is not started"
+            )
+
+        def take() -> tuple[
+            tracemalloc.Snapshot, list[AllocationStat]
+        ]:
+            snapshot = tracemalloc.take_snapshot()
+            snapshot = snapshot.filter_traces(SNAPSHOT_FILTERS)
+            return snapshot, _top(snapshot, key_type, limit)
+
+        snapshot, top = await run_in_threadpool(take)
+        snapshot_id = uuid4()
+        _snapshots[snapshot_id] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            del _snapshots[next(iter(_snapshots))]
+        return TakeSnapshotResponse(
+            snapshot_id=snapshot_id, top=top
+        )
+
+
+class GetSnapshotStats:
+    async def execute(
+        self, snapshot_id: UUID, key_type: KeyType, limit: int
+    ) -> SnapshotStatsResponse:
+        snapshot = _get_snapshot(snapshot_id)
+        top = await run_in_threadpool(
+            _top, snapshot, key_type, limit
+        )
+        return SnapshotStatsResponse(
+            snapshot_id=snapshot_id, top=top
+        )
+
+
+class CompareSnapshots:
+    async def execute(
+        self,
+        snapshot_id: UUID,
+        base_snapshot_id: UUID,
+        key_type: KeyType,
+        limit: int,
+    ) -> CompareSnapshotsResponse:
+        snapshot = _get_snapshot(snapshot_id)
+        base = _get_snapshot(base_snapshot_id)
+
+        def compare() -> list[AllocationDiff]:
+            # 増えた量が大きい順に並ぶ
+            stats = snapshot.compare_to(base, key_type)
+            return [
+                AllocationDiff(
+                    traceback=stat.traceback.format(),
+                    size=stat.size,
+                    count=stat.count,
+                    size_diff=stat.size_diff,
+                    count_diff=stat.count_diff,
+                )
+                for stat in stats[:limit]
+            ]
+
+        top = await run_in_threadpool(compare)
+        return CompareSnapshotsResponse(
+            snapshot_id=snapshot_id,
+            base_snapshot_id=base_snapshot_id,
+            top=top,
+        )
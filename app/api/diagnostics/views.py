@@ -0,0 +1,135 @@
+import secrets
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, Query
+
+from app.exceptions import Forbidden
+from app.settings import settings
+
+from .schemas import (
+    CompareSnapshotsResponse,
+    KeyType,
+    SnapshotStatsResponse,
+    TakeSnapshotResponse,
+    TracemallocStatusResponse,
+)
+from .use_cases import (
+    CompareSnapshots,
+    GetSnapshotStats,
+    GetTracemallocStatus,
+    StartTracemalloc,
+    StopTracemalloc,
+    TakeSnapshot,
+)
+
+
+async def verify_token(
+    x_diagnostics_token: Annotated[str, Header()] = "",
+) -> None:
+    # トークン未設定なら常に拒否する (デフォルトで無効)
+    token = settings.DIAGNOSTICS_TOKEN
+    if not token or not secrets.compare_digest(
+        x_diagnostics_token.encode(), token.encode()
+    ):
+        raise Forbidden()
+
+
+# 管理者向けのためAPIドキュメントには含めない
+router = APIRouter(
+    tags=["diagnostics"],
+    include_in_schema=False,
+    dependencies=[Depends(verify_token)],
+)
+
+KeyTypeQuery = Annotated[KeyType, Query()]
+LimitQuery = Annotated[int, Query(ge=1, le=1000)]
+
+
+@router.get(
+    "/tracemalloc", summary="tracemallocの状態を取得する"
+)
+async def get_tracemalloc_status(
+    use_case: Annotated[
+        GetTracemallocStatus, Depends(GetTracemallocStatus)
+    ],
+) -> TracemallocStatusResponse:
+    return await use_case.execute()
+
+
+@router.post(
+    "/tracemalloc/start", summary="tracemallocを開始する"
+)
+async def start_tracemalloc(
+    use_case: Annotated[
+        StartTracemalloc, Depends(StartTracemalloc)
+    ],
+    frames: Annotated[int, Query(ge=1, le=100)] = 1,
+) -> TracemallocStatusResponse:
+    return await use_case.execute(frames=frames)
+
+
+@router.post(
+    "/tracemalloc/stop",
+    summary="tracemallocを停止し、スナップショットを破棄する",
+)
+async def stop_tracemalloc(
+    use_case: Annotated[
+        StopTracemalloc, Depends(StopTracemalloc)
+    ],
+) -> TracemallocStatusResponse:
+    return await use_case.execute()
+
+
+@router.post(
+    "/tracemalloc/snapshots",
+    summary="スナップショットを取得する",
+)
+async def take_snapshot(
+    use_case: Annotated[TakeSnapshot, Depends(TakeSnapshot)],
+    key_type: KeyTypeQuery = "lineno",
+    limit: LimitQuery = 20,
+) -> TakeSnapshotResponse:
+    return await use_case.execute(
+        key_type=key_type, limit=limit
+    )
+
+
+@router.get(
+    "/tracemalloc/snapshots/{snapshot_id}",
+    summary="スナップショットの確保量上位を取得する",
+)
+async def get_snapshot_stats(
+    snapshot_id: UUID,
+    use_case: Annotated[
+        GetSnapshotStats, Depends(GetSnapshotStats)
+    ],
+    key_type: KeyTypeQuery = "lineno",
+    limit: LimitQuery = 20,
+) -> SnapshotStatsResponse:
+    return await use_case.execute(
+        snapshot_id=snapshot_id,
+        key_type=key_type,
+        limit=limit,
+    )
+
+
+@router.get(
+    "/tracemalloc/snapshots/{snapshot_id}/diff/{base_snapshot_id}",
+    summary="2つのスナップショットの差分を取得する",
+)
+async def compare_snapshots(
+    snapshot_id: UUID,
+    base_snapshot_id: UUID,
+    use_case: Annotated[
+        CompareSnapshots, Depends(CompareSnapshots)
+    ],
+    key_type: KeyTypeQuery = "lineno",
+    limit: LimitQuery = 20,
+) -> CompareSnapshotsResponse:
+    return await use_case.execute(
+        snapshot_id=snapshot_id,
+        base_snapshot_id=base_snapshot_id,
+        key_type=key_type,
+        limit=limit,
+    )
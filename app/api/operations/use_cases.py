@@ -1,19 +1,32 @@
+from typing import ClassVar
 from uuid import UUID
 
 from app import db
-from app.database import AsyncSession
+from app.database import ReadOnlySession
 from app.exceptions import NotFound
 from app.models import Operation
+from app.utils.singleflight import SingleFlight
 
 
 class GetOperation:
+    # ポーリングが集中しても同じOperationの取得は1回にまとめる
+    _flights: ClassVar[SingleFlight[Operation]] = (
+        SingleFlight()
+    )
+
     def __init__(
         self,
-        session: AsyncSession,
+        session: ReadOnlySession,
     ) -> None:
         self.session = session
 
     async def execute(self, operation_id: UUID) -> Operation:
+        return await self._flights.do(
+            (self.session, operation_id),
+            lambda: self._execute(operation_id),
+        )
+
+    async def _execute(self, operation_id: UUID) -> Operation:
         async with self.session() as session:
             operation = await db.Operation.get_by_id(
                 session, operation_id
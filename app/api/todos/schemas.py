@@ -1,15 +1,22 @@
 from uuid import UUID
 
-from pydantic import Field
+from pydantic import Field, model_validator
 
 from app.models import (
     BaseModel,
+    BatchTodosResult,
+    PartialTodo,
     Status,
     Todo,
     TodoWithSubTasks,
 )
 from app.pager import Pager
 
+# 1リクエストで扱える件数の上限
+BATCH_SIZE_LIMIT = 1000
+# 一覧に含めるTodoごとのSubTaskの件数の上限
+MAX_SUBTASKS_LIMIT = 100
+
 
 class ListTodosResponse(Pager[Todo]):
     items: list[Todo] = Field(serialization_alias="todos")
@@ -21,6 +28,16 @@ class ListTodoWithSubTasksResponse(Pager[TodoWithSubTasks]):
     )
 
 
+class ListPartialTodosResponse(Pager[PartialTodo]):
+    items: list[PartialTodo] = Field(
+        serialization_alias="todos"
+    )
+
+
+# fields= で指定できる項目
+TODO_FIELDS = frozenset(Todo.model_fields)
+
+
 class CreateTodoRequest(BaseModel):
     title: str
 
@@ -33,6 +50,35 @@ class GetTodoResponse(Todo):
     pass
 
 
+class GetPartialTodoResponse(PartialTodo):
+    pass
+
+
+class GetTodosRequest(BaseModel):
+    ids: list[UUID] = Field(
+        min_length=1, max_length=BATCH_SIZE_LIMIT
+    )
+    include_subtasks: bool = False
+    subtasks_limit: int = Field(
+        default=0, ge=0, le=MAX_SUBTASKS_LIMIT
+    )
+
+
+class GetTodosResponse(BaseModel):
+    # 指定されたidの順に並べる
+    todos: list[GetTodoResponse]
+    missing: list[UUID] = Field(
+        description="存在しなかったtodo_id"
+    )
+
+
+class GetTodosWithSubTasksResponse(BaseModel):
+    todos: list[TodoWithSubTasks]
+    missing: list[UUID] = Field(
+        description="存在しなかったtodo_id"
+    )
+
+
 class UpdateTodoRequest(BaseModel):
     title: str
     status: Status
@@ -44,3 +90,33 @@ class UpdateTodoResponse(Todo):
 
 class ImportTodosResponse(BaseModel):
     operation_id: UUID
+
+
+class BatchUpdateTodoRequest(UpdateTodoRequest):
+    todo_id: UUID
+
+
+class BatchTodosRequest(BaseModel):
+    create: list[CreateTodoRequest] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+    update: list[BatchUpdateTodoRequest] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+    delete: list[UUID] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+
+    @model_validator(mode="after")
+    def check_unique(self) -> "BatchTodosRequest":
+        # 同じTodoへの操作は1件だけにする
+        ids = [
+            todo.todo_id for todo in self.update
+        ] + self.delete
+        if len(ids) != len(set(ids)):
+            raise ValueError("todo_id must be unique")
+        return self
+
+
+class BatchTodosResponse(BatchTodosResult):
+    pass
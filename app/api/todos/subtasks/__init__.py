@@ -1,3 +1,3 @@
-from .views import router
+from .views import batch_router, router
 
-__all__ = ["router"]
+__all__ = ["batch_router", "router"]
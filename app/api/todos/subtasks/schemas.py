@@ -1,8 +1,22 @@
-from app.models import BaseModel, Status, SubTask
+from uuid import UUID
+
+from pydantic import Field, model_validator
+
+from app.models import (
+    BaseModel,
+    BatchSubTasksResult,
+    Status,
+    SubTask,
+)
+
+from ..schemas import BATCH_SIZE_LIMIT
 
 
 class ListSubTasksResponse(BaseModel):
     subtasks: list[SubTask]
+    next_cursor: str | None = Field(
+        description="次のページのカーソル。最後のページならnull"
+    )
 
 
 class CreateSubTaskRequest(BaseModel):
@@ -24,3 +38,67 @@ class UpdateSubTaskRequest(BaseModel):
 
 class UpdateSubTaskResponse(SubTask):
     pass
+
+
+class BatchUpdateSubTaskRequest(UpdateSubTaskRequest):
+    subtask_id: UUID
+
+
+class BatchSubTasksRequest(BaseModel):
+    create: list[CreateSubTaskRequest] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+    update: list[BatchUpdateSubTaskRequest] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+    delete: list[UUID] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+
+    @model_validator(mode="after")
+    def check_unique(self) -> "BatchSubTasksRequest":
+        # 同じSubTaskへの操作は1件だけにする
+        ids = [
+            st.subtask_id for st in self.update
+        ] + self.delete
+        if len(ids) != len(set(ids)):
+            raise ValueError("subtask_id must be unique")
+        return self
+
+
+class SubTaskKey(BaseModel):
+    todo_id: UUID
+    subtask_id: UUID
+
+
+class BatchCreateTodoSubTaskRequest(CreateSubTaskRequest):
+    todo_id: UUID
+
+
+class BatchUpdateTodoSubTaskRequest(BatchUpdateSubTaskRequest):
+    todo_id: UUID
+
+
+class BatchTodosSubTasksRequest(BaseModel):
+    create: list[BatchCreateTodoSubTaskRequest] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+    update: list[BatchUpdateTodoSubTaskRequest] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+    delete: list[SubTaskKey] = Field(
+        default=[], max_length=BATCH_SIZE_LIMIT
+    )
+
+    @model_validator(mode="after")
+    def check_unique(self) -> "BatchTodosSubTasksRequest":
+        ids = [st.subtask_id for st in self.update] + [
+            st.subtask_id for st in self.delete
+        ]
+        if len(ids) != len(set(ids)):
+            raise ValueError("subtask_id must be unique")
+        return self
+
+
+class BatchSubTasksResponse(BatchSubTasksResult):
+    pass
@@ -1,31 +1,66 @@
+from datetime import datetime
 from uuid import UUID, uuid4
 
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import (
+    AsyncSession as _AsyncSession,
+)
+
 from app import db
-from app.database import AsyncSession
+from app.database import AsyncSession, ReadOnlySession
 from app.exceptions import NotFound
-from app.models import Status, SubTask
+from app.models import (
+    BaseModel,
+    BatchSubTaskResult,
+    BatchSubTasksResult,
+    Status,
+    SubTask,
+)
+from app.pager import LimitCursor, decode_cursor, encode_cursor
+
+_subtask_key: TypeAdapter[db.SubTaskKey] = TypeAdapter(
+    tuple[datetime, UUID]
+)
 
 
 class ListSubTasks:
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: ReadOnlySession) -> None:
         self.session = session
 
     async def execute(
         self,
         todo_id: UUID,
-    ) -> list[SubTask]:
+        limit_cursor: LimitCursor,
+    ) -> tuple[list[SubTask], str | None]:
+        # (SubTaskの一覧, 次のページのカーソル) を返す
+        after = (
+            decode_cursor(_subtask_key, limit_cursor.cursor)
+            if limit_cursor.cursor
+            else None
+        )
         async with self.session() as session:
-            todo = await db.Todo.get_by_id(session, todo_id)
-            if not todo:
-                raise NotFound("Todo", todo_id)
-
+            # 1件多く取得して次のページがあるか判定する
             subtasks = await db.SubTask.get_all_by_todo(
-                session, todo
+                session,
+                todo_id,
+                limit=limit_cursor.limit + 1,
+                after=after,
             )
+            if subtasks is None:
+                raise NotFound("Todo", todo_id)
+            next_cursor = None
+            if len(subtasks) > limit_cursor.limit:
+                subtasks = subtasks[: limit_cursor.limit]
+                last = subtasks[-1]
+                next_cursor = encode_cursor(
+                    _subtask_key,
+                    (last.created_at, last.subtask_id),
+                )
             return [
-                SubTask.model_validate(todo)
-                async for todo in subtasks
-            ]
+                SubTask.model_validate(subtask)
+                for subtask in subtasks
+            ], next_cursor
 
 
 class CreateSubTask:
@@ -36,35 +71,35 @@ class CreateSubTask:
         self, todo_id: UUID, title: str
     ) -> SubTask:
         async with self.session.begin() as session:
-            todo = await db.Todo.get_by_id(session, todo_id)
-            if not todo:
-                raise NotFound("Todo", todo_id)
-
-            subtask = await db.SubTask.create(
-                session,
-                todo=todo,
-                subtask_id=uuid4(),
-                title=title,
-                status=Status.NEW,
-            )
+            # Todoの存在確認は外部キー制約に任せる
+            try:
+                subtask = await db.SubTask.create(
+                    session,
+                    todo_id=todo_id,
+                    subtask_id=uuid4(),
+                    title=title,
+                    status=Status.NEW,
+                )
+            except IntegrityError as e:
+                if not db.is_foreign_key_violation(e):
+                    raise
+                raise NotFound("Todo", todo_id) from e
             return SubTask.model_validate(subtask)
 
 
 class GetSubTask:
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: ReadOnlySession) -> None:
         self.session = session
 
     async def execute(
         self, todo_id: UUID, subtask_id: UUID
     ) -> SubTask:
         async with self.session() as session:
-            todo = await db.Todo.get_by_id(session, todo_id)
-            if not todo:
-                raise NotFound("Todo", todo_id)
-
-            subtask = await db.SubTask.get_by_id(
-                session, todo, subtask_id
+            found, subtask = await db.SubTask.get_by_id(
+                session, todo_id, subtask_id
             )
+            if not found:
+                raise NotFound("Todo", todo_id)
             if not subtask:
                 raise NotFound("SubTask", subtask_id)
             return SubTask.model_validate(subtask)
@@ -82,22 +117,17 @@ class UpdateSubTask:
         status: Status,
     ) -> SubTask:
         async with self.session.begin() as session:
-            todo = await db.Todo.get_by_id(session, todo_id)
-            if not todo:
-                raise NotFound("Todo", todo_id)
-
-            subtask = await db.SubTask.get_by_id(
-                session, todo, subtask_id
-            )
-            if not subtask:
-                raise NotFound("SubTask", subtask_id)
-
-            await subtask.update(
+            found, subtask = await db.SubTask.update(
                 session,
-                todo=todo,
+                todo_id=todo_id,
+                subtask_id=subtask_id,
                 title=title,
                 status=status,
             )
+            if not found:
+                raise NotFound("Todo", todo_id)
+            if not subtask:
+                raise NotFound("SubTask", subtask_id)
             return SubTask.model_validate(subtask)
 
 
@@ -111,12 +141,183 @@ class DeleteSubTask:
         subtask_id: UUID,
     ) -> None:
         async with self.session.begin() as session:
-            todo = await db.Todo.get_by_id(session, todo_id)
-            if not todo:
+            found, _ = await db.SubTask.delete(
+                session, todo_id, subtask_id
+            )
+            if not found:
                 raise NotFound("Todo", todo_id)
-            subtask = await db.SubTask.get_by_id(
-                session, todo, subtask_id
+
+
+class BatchSubTaskCreate(BaseModel):
+    todo_id: UUID
+    title: str
+
+
+class BatchSubTaskUpdate(BaseModel):
+    todo_id: UUID
+    subtask_id: UUID
+    title: str
+    status: Status
+
+
+class BatchSubTaskDelete(BaseModel):
+    todo_id: UUID
+    subtask_id: UUID
+
+
+class BatchSubTasks:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def execute(
+        self,
+        create: list[BatchSubTaskCreate],
+        update: list[BatchSubTaskUpdate],
+        delete: list[BatchSubTaskDelete],
+    ) -> BatchSubTasksResult:
+        async with self.session.begin() as session:
+            # 親のTodoの存在確認はTodoごとではなくまとめて1回
+            todo_ids = (
+                {item.todo_id for item in create}
+                | {item.todo_id for item in update}
+                | {item.todo_id for item in delete}
             )
-            if not subtask:
-                return
-            await db.SubTask.delete(session, subtask)
+            existing = await db.Todo.lock_existing_ids(
+                session, list(todo_ids)
+            )
+            return await _batch_subtasks(
+                session, existing, create, update, delete
+            )
+
+
+class BatchTodoSubTasks:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def execute(
+        self,
+        todo_id: UUID,
+        create: list[str],
+        update: list[BatchSubTaskUpdate],
+        delete: list[UUID],
+    ) -> BatchSubTasksResult:
+        async with self.session.begin() as session:
+            existing = await db.Todo.lock_existing_ids(
+                session, [todo_id]
+            )
+            if not existing:
+                raise NotFound("Todo", todo_id)
+            return await _batch_subtasks(
+                session,
+                existing,
+                [
+                    BatchSubTaskCreate(
+                        todo_id=todo_id, title=title
+                    )
+                    for title in create
+                ],
+                update,
+                [
+                    BatchSubTaskDelete(
+                        todo_id=todo_id, subtask_id=subtask_id
+                    )
+                    for subtask_id in delete
+                ],
+            )
+
+
+async def _batch_subtasks(
+    session: _AsyncSession,
+    existing: set[UUID],
+    create: list[BatchSubTaskCreate],
+    update: list[BatchSubTaskUpdate],
+    delete: list[BatchSubTaskDelete],
+) -> BatchSubTasksResult:
+    # RETURNINGは挿入した順に返る
+    created = iter(
+        await db.SubTask.bulk_create(
+            session,
+            [
+                db.BulkSubTaskCreateParam(
+                    todo_id=item.todo_id,
+                    title=item.title,
+                    status=Status.NEW,
+                )
+                for item in create
+                if item.todo_id in existing
+            ],
+        )
+    )
+    updated = {
+        subtask.subtask_id: subtask
+        for subtask in await db.SubTask.bulk_update(
+            session,
+            [
+                db.BulkSubTaskUpdateParam(
+                    todo_id=item.todo_id,
+                    subtask_id=item.subtask_id,
+                    title=item.title,
+                    status=item.status,
+                )
+                for item in update
+                if item.todo_id in existing
+            ],
+        )
+    }
+    deleted = set(
+        await db.SubTask.bulk_delete(
+            session,
+            [
+                (item.todo_id, item.subtask_id)
+                for item in delete
+                if item.todo_id in existing
+            ],
+        )
+    )
+
+    def created_result(
+        item: BatchSubTaskCreate,
+    ) -> BatchSubTaskResult:
+        if item.todo_id not in existing:
+            return BatchSubTaskResult(
+                todo_id=item.todo_id,
+                subtask_id=None,
+                status_code=404,
+            )
+        subtask = SubTask.model_validate(next(created))
+        return BatchSubTaskResult(
+            todo_id=item.todo_id,
+            subtask_id=subtask.subtask_id,
+            status_code=201,
+            subtask=subtask,
+        )
+
+    def updated_result(
+        item: BatchSubTaskUpdate,
+    ) -> BatchSubTaskResult:
+        subtask = updated.get(item.subtask_id)
+        return BatchSubTaskResult(
+            todo_id=item.todo_id,
+            subtask_id=item.subtask_id,
+            status_code=200 if subtask else 404,
+            subtask=(
+                SubTask.model_validate(subtask)
+                if subtask
+                else None
+            ),
+        )
+
+    return BatchSubTasksResult(
+        create=[created_result(item) for item in create],
+        update=[updated_result(item) for item in update],
+        delete=[
+            BatchSubTaskResult(
+                todo_id=item.todo_id,
+                subtask_id=item.subtask_id,
+                status_code=204
+                if item.subtask_id in deleted
+                else 404,
+            )
+            for item in delete
+        ],
+    )
@@ -5,8 +5,12 @@ from fastapi import APIRouter, Depends, status
 
 from app.api_route import LoggingRoute
 from app.context import bind_subtask_id
+from app.pager import LimitCursorQuery
 
 from .schemas import (
+    BatchSubTasksRequest,
+    BatchSubTasksResponse,
+    BatchTodosSubTasksRequest,
     CreateSubTaskRequest,
     CreateSubTaskResponse,
     GetSubTaskResponse,
@@ -15,6 +19,11 @@ from .schemas import (
     UpdateSubTaskResponse,
 )
 from .use_cases import (
+    BatchSubTaskCreate,
+    BatchSubTaskDelete,
+    BatchSubTasks,
+    BatchSubTaskUpdate,
+    BatchTodoSubTasks,
     CreateSubTask,
     DeleteSubTask,
     GetSubTask,
@@ -23,18 +32,21 @@ from .use_cases import (
 )
 
 router = APIRouter(route_class=LoggingRoute)
+# 複数のTodoにまたがる操作 (/api/todos/subtasks)
+batch_router = APIRouter(route_class=LoggingRoute)
 
 
 @router.get("", summary="SubTaskの一覧を取得する")
 async def list_subtasks(
     todo_id: UUID,
+    limit_cursor: LimitCursorQuery,
     use_case: Annotated[ListSubTasks, Depends(ListSubTasks)],
 ) -> ListSubTasksResponse:
+    subtasks, next_cursor = await use_case.execute(
+        todo_id=todo_id, limit_cursor=limit_cursor
+    )
     return ListSubTasksResponse(
-        subtasks=[
-            st
-            for st in await use_case.execute(todo_id=todo_id)
-        ]
+        subtasks=subtasks, next_cursor=next_cursor
     )
 
 
@@ -56,6 +68,67 @@ async def create_subtask(
     )
 
 
+@router.post(
+    "/batch",
+    summary="SubTaskを一括で作成・更新・削除する",
+)
+async def batch_subtasks(
+    todo_id: UUID,
+    data: BatchSubTasksRequest,
+    use_case: Annotated[
+        BatchTodoSubTasks, Depends(BatchTodoSubTasks)
+    ],
+) -> BatchSubTasksResponse:
+    return BatchSubTasksResponse.model_validate(
+        await use_case.execute(
+            todo_id=todo_id,
+            create=[st.title for st in data.create],
+            update=[
+                BatchSubTaskUpdate(
+                    todo_id=todo_id,
+                    subtask_id=st.subtask_id,
+                    title=st.title,
+                    status=st.status,
+                )
+                for st in data.update
+            ],
+            delete=data.delete,
+        )
+    )
+
+
+@batch_router.post(
+    "/batch",
+    summary="複数のTodoのSubTaskを一括で作成・更新・削除する",
+)
+async def batch_todos_subtasks(
+    data: BatchTodosSubTasksRequest,
+    use_case: Annotated[BatchSubTasks, Depends(BatchSubTasks)],
+) -> BatchSubTasksResponse:
+    return BatchSubTasksResponse.model_validate(
+        await use_case.execute(
+            create=[
+                BatchSubTaskCreate.model_validate(
+                    st, from_attributes=True
+                )
+                for st in data.create
+            ],
+            update=[
+                BatchSubTaskUpdate.model_validate(
+                    st, from_attributes=True
+                )
+                for st in data.update
+            ],
+            delete=[
+                BatchSubTaskDelete.model_validate(
+                    st, from_attributes=True
+                )
+                for st in data.delete
+            ],
+        )
+    )
+
+
 @router.get(
     "/{subtask_id}",
     summary="SubTaskを取得する",
@@ -1,32 +1,66 @@
-import csv
-from io import TextIOWrapper
-from typing import Literal, overload
+from collections.abc import AsyncIterator
+from io import StringIO, TextIOWrapper
+from typing import ClassVar, Literal, overload
 from uuid import UUID, uuid4
 
 from fastapi import BackgroundTasks, UploadFile
+from pydantic import TypeAdapter
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import (
+    AsyncSession as _AsyncSession,
+)
 from structlog import get_logger
 
 from app import db
 from app.api.todos.webhook import WebhookClient
-from app.database import AsyncSession
-from app.exceptions import FileTooLarge, NotFound
+from app.database import (
+    AsyncSession,
+    BackgroundSession,
+    ReadOnlySession,
+)
+from app.exceptions import BadRequest, FileTooLarge, NotFound
 from app.models import (
     BaseModel,
+    BatchTodoResult,
+    BatchTodosResult,
     OperationStatus,
     OperationType,
+    PartialTodo,
     Status,
     Todo,
+    TodoSort,
     TodoWithSubTasks,
+    UTCDatetime,
 )
-from app.pager import LimitOffset, Pager
+from app.pager import (
+    LimitOffset,
+    Pager,
+    decode_cursor,
+    encode_cursor,
+)
+from app.utils.singleflight import SingleFlight
 
 
 class ListTodosFilter(BaseModel):
     min_subtasks: int
+    q: str | None = None
+    status: Status | None = None
+    updated_after: UTCDatetime | None = None
+    updated_before: UTCDatetime | None = None
+    created_after: UTCDatetime | None = None
 
 
 class ListTodos:
-    def __init__(self, session: AsyncSession) -> None:
+    # 同じ条件で同時に来たリクエストはクエリを共有する
+    _flights: ClassVar[
+        SingleFlight[
+            Pager[Todo]
+            | Pager[TodoWithSubTasks]
+            | Pager[PartialTodo]
+        ]
+    ] = SingleFlight()
+
+    def __init__(self, session: ReadOnlySession) -> None:
         self.session = session
 
     @overload
@@ -35,6 +69,10 @@ class ListTodos:
         limit_offset: LimitOffset,
         filter_: ListTodosFilter,
         include_subtasks: Literal[True],
+        subtasks_limit: int = 0,
+        fields: None = None,
+        sort: TodoSort = TodoSort.CREATED_AT_DESC,
+        cursor: str | None = None,
     ) -> Pager[TodoWithSubTasks]: ...
 
     @overload
@@ -43,19 +81,139 @@ class ListTodos:
         limit_offset: LimitOffset,
         filter_: ListTodosFilter,
         include_subtasks: Literal[False],
+        subtasks_limit: int = 0,
+        fields: None = None,
+        sort: TodoSort = TodoSort.CREATED_AT_DESC,
+        cursor: str | None = None,
     ) -> Pager[Todo]: ...
 
+    @overload
     async def execute(
         self,
         limit_offset: LimitOffset,
         filter_: ListTodosFilter,
         include_subtasks: bool,
-    ) -> Pager[Todo] | Pager[TodoWithSubTasks]:
-        async with self.session() as session:
-            query = db.Todo.stmt_get_all(
-                filter_.min_subtasks,
+        subtasks_limit: int = 0,
+        *,
+        fields: frozenset[str],
+        sort: TodoSort = TodoSort.CREATED_AT_DESC,
+        cursor: str | None = None,
+    ) -> Pager[PartialTodo]: ...
+
+    async def execute(
+        self,
+        limit_offset: LimitOffset,
+        filter_: ListTodosFilter,
+        include_subtasks: bool,
+        subtasks_limit: int = 0,
+        fields: frozenset[str] | None = None,
+        sort: TodoSort = TodoSort.CREATED_AT_DESC,
+        cursor: str | None = None,
+    ) -> (
+        Pager[Todo]
+        | Pager[TodoWithSubTasks]
+        | Pager[PartialTodo]
+    ):
+        if not include_subtasks:
+            subtasks_limit = 0
+        after = None
+        if cursor is not None:
+            # タイトルの近さの順はキーセットで辿れない
+            if filter_.q is not None or limit_offset.offset:
+                raise BadRequest(
+                    {"cursor": cursor},
+                    message="cursor conflicts with q/offset",
+                )
+            after = _decode_todo_cursor(cursor, sort)
+        key = (
+            self.session,
+            limit_offset.limit,
+            limit_offset.offset,
+            filter_,
+            include_subtasks,
+            subtasks_limit,
+            fields,
+            sort,
+            after,
+        )
+        return await self._flights.do(
+            key,
+            lambda: self._execute(
+                limit_offset,
+                filter_,
                 include_subtasks,
-            )
+                subtasks_limit,
+                fields,
+                sort,
+                after,
+            ),
+        )
+
+    async def _execute(
+        self,
+        limit_offset: LimitOffset,
+        filter_: ListTodosFilter,
+        include_subtasks: bool,
+        subtasks_limit: int,
+        fields: frozenset[str] | None,
+        sort: TodoSort,
+        after: db.TodoKey | None,
+    ) -> (
+        Pager[Todo]
+        | Pager[TodoWithSubTasks]
+        | Pager[PartialTodo]
+    ):
+        async with self.session() as session:
+
+            def stmt(
+                after: db.TodoKey | None,
+            ) -> Select[tuple[db.Todo]]:
+                # 件数を制限する場合はselectinloadを使わず
+                # ページを取得した後にまとめて読み込む
+                return db.Todo.stmt_get_all(
+                    filter_.min_subtasks,
+                    include_subtasks and not subtasks_limit,
+                    fields,
+                    filter_.q,
+                    filter_.status,
+                    filter_.updated_after,
+                    filter_.updated_before,
+                    filter_.created_after,
+                    sort,
+                    after,
+                )
+
+            query = stmt(None)
+            seek = stmt(after) if after is not None else None
+
+            def encode(todo: db.Todo) -> str:
+                return _encode_todo_cursor(todo, sort)
+
+            # q= の場合はタイトルの近さの順なので作らない
+            cursor = encode if filter_.q is None else None
+
+            async def loader(
+                session: _AsyncSession, todos: list[db.Todo]
+            ) -> None:
+                await db.Todo.load_subtasks(
+                    session, todos, subtasks_limit
+                )
+
+            if fields is not None:
+                return await Pager[PartialTodo].paginate(
+                    session=session,
+                    query=query,
+                    limit_offset=limit_offset,
+                    transformer=lambda todos: [
+                        _partial_todo(
+                            todo, fields, include_subtasks
+                        )
+                        for todo in todos
+                    ],
+                    loader=loader if subtasks_limit else None,
+                    seek=seek,
+                    cursor=cursor,
+                )
 
             def transformer(
                 todos: list[db.Todo],
@@ -74,9 +232,140 @@ class ListTodos:
                 query=query,
                 limit_offset=limit_offset,
                 transformer=transformer,
+                loader=loader if subtasks_limit else None,
+                seek=seek,
+                cursor=cursor,
             )
 
 
+class _TodoCursor(BaseModel):
+    # 並び順と、その並び順のキーの値
+    sort: TodoSort
+    todo_id: UUID
+    created_at: UTCDatetime | None = None
+    updated_at: UTCDatetime | None = None
+    title: str | None = None
+    status: Status | None = None
+    subtask_count: int | None = None
+
+
+_todo_cursor = TypeAdapter(_TodoCursor)
+
+
+def _encode_todo_cursor(todo: db.Todo, sort: TodoSort) -> str:
+    return encode_cursor(
+        _todo_cursor,
+        _TodoCursor.model_validate(
+            {
+                "sort": sort,
+                **{
+                    name: getattr(todo, name)
+                    for name in db.Todo.sort_keys(sort)
+                },
+            }
+        ),
+    )
+
+
+def _decode_todo_cursor(
+    cursor: str, sort: TodoSort
+) -> db.TodoKey:
+    # 別の sort= で作られたカーソルは受け付けない
+    value = decode_cursor(_todo_cursor, cursor)
+    key = tuple(
+        getattr(value, name)
+        for name in db.Todo.sort_keys(sort)
+    )
+    if value.sort != sort or None in key:
+        raise BadRequest(
+            {"cursor": cursor}, message="Invalid cursor"
+        )
+    return key
+
+
+def _partial_todo(
+    todo: db.Todo,
+    fields: frozenset[str],
+    include_subtasks: bool = False,
+) -> PartialTodo:
+    # 読み込んでいない列には触れない
+    names = (
+        fields | {"subtasks"} if include_subtasks else fields
+    )
+    return PartialTodo.model_validate(
+        {
+            "todo_id": todo.todo_id,
+            **{name: getattr(todo, name) for name in names},
+        }
+    )
+
+
+class GetTodos:
+    def __init__(self, session: ReadOnlySession) -> None:
+        self.session = session
+
+    @overload
+    async def execute(
+        self,
+        todo_ids: list[UUID],
+        include_subtasks: Literal[True],
+        subtasks_limit: int = 0,
+    ) -> tuple[list[TodoWithSubTasks], list[UUID]]: ...
+
+    @overload
+    async def execute(
+        self,
+        todo_ids: list[UUID],
+        include_subtasks: Literal[False],
+        subtasks_limit: int = 0,
+    ) -> tuple[list[Todo], list[UUID]]: ...
+
+    async def execute(
+        self,
+        todo_ids: list[UUID],
+        include_subtasks: bool,
+        subtasks_limit: int = 0,
+    ) -> (
+        tuple[list[TodoWithSubTasks], list[UUID]]
+        | tuple[list[Todo], list[UUID]]
+    ):
+        # (指定された順のTodo, 存在しなかったtodo_id) を返す
+        todo_ids = list(dict.fromkeys(todo_ids))
+        async with self.session() as session:
+            todos = {
+                todo.todo_id: todo
+                for todo in await db.Todo.get_by_ids(
+                    session,
+                    todo_ids,
+                    include_subtasks and not subtasks_limit,
+                )
+            }
+            if include_subtasks and subtasks_limit:
+                await db.Todo.load_subtasks(
+                    session,
+                    list(todos.values()),
+                    subtasks_limit,
+                )
+            missing = [
+                todo_id
+                for todo_id in todo_ids
+                if todo_id not in todos
+            ]
+            found = [
+                todos[todo_id]
+                for todo_id in todo_ids
+                if todo_id in todos
+            ]
+            if include_subtasks:
+                return [
+                    TodoWithSubTasks.model_validate(todo)
+                    for todo in found
+                ], missing
+            return [
+                Todo.model_validate(todo) for todo in found
+            ], missing
+
+
 class CreateTodo:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
@@ -93,14 +382,32 @@ class CreateTodo:
 
 
 class GetTodo:
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: ReadOnlySession) -> None:
         self.session = session
 
-    async def execute(self, todo_id: UUID) -> Todo:
+    @overload
+    async def execute(
+        self, todo_id: UUID, fields: None = None
+    ) -> Todo: ...
+
+    @overload
+    async def execute(
+        self, todo_id: UUID, fields: frozenset[str]
+    ) -> PartialTodo: ...
+
+    async def execute(
+        self,
+        todo_id: UUID,
+        fields: frozenset[str] | None = None,
+    ) -> Todo | PartialTodo:
         async with self.session() as session:
-            todo = await db.Todo.get_by_id(session, todo_id)
+            todo = await db.Todo.get_by_id(
+                session, todo_id, fields
+            )
             if not todo:
                 raise NotFound("Todo", todo_id)
+            if fields is not None:
+                return _partial_todo(todo, fields)
             return Todo.model_validate(todo)
 
 
@@ -137,16 +444,107 @@ class DeleteTodo:
             await db.Todo.delete(session, todo)
 
 
+class BatchTodoUpdate(BaseModel):
+    todo_id: UUID
+    title: str
+    status: Status
+
+
+class BatchTodos:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def execute(
+        self,
+        create: list[str],
+        update: list[BatchTodoUpdate],
+        delete: list[UUID],
+    ) -> BatchTodosResult:
+        # すべてを1つのトランザクションで実行する
+        async with self.session.begin() as session:
+            created = await db.Todo.bulk_create(
+                session,
+                [
+                    db.BulkTodoCreateParam(
+                        title=title, status=Status.NEW
+                    )
+                    for title in create
+                ],
+            )
+            created_ids = [todo.todo_id for todo in created]
+            updated_ids = await db.Todo.bulk_update(
+                session,
+                [
+                    db.BulkTodoUpdateParam(
+                        todo_id=todo.todo_id,
+                        title=todo.title,
+                        status=todo.status,
+                    )
+                    for todo in update
+                ],
+            )
+            await db.Todo.bulk_delete(session, delete)
+            # subtask_countを含めて読み直す
+            todos = {
+                todo.todo_id: Todo.model_validate(todo)
+                for todo in await db.Todo.get_by_ids(
+                    session, [*created_ids, *updated_ids]
+                )
+            }
+
+        return BatchTodosResult(
+            create=[
+                BatchTodoResult(
+                    todo_id=todo_id,
+                    status_code=201,
+                    todo=todos[todo_id],
+                )
+                for todo_id in created_ids
+            ],
+            update=[
+                BatchTodoResult(
+                    todo_id=todo.todo_id,
+                    status_code=200,
+                    todo=todos[todo.todo_id],
+                )
+                if todo.todo_id in todos
+                else BatchTodoResult(
+                    todo_id=todo.todo_id, status_code=404
+                )
+                for todo in update
+            ],
+            # 個別のAPIと同じく、存在しなくても204とする
+            delete=[
+                BatchTodoResult(
+                    todo_id=todo_id, status_code=204
+                )
+                for todo_id in delete
+            ],
+        )
+
+
+# インポート・エクスポートするCSVファイルの列
+CSV_FIELDNAMES = [
+    "title",
+    "status",
+    "subtask_title",
+    "subtask_status",
+]
+
+
 class ImportTodos:
     MAX_FILE_SIZE = 5 * 1024 * 1024
 
     def __init__(
         self,
         session: AsyncSession,
+        background_session: BackgroundSession,
         background_tasks: BackgroundTasks,
         webhook: WebhookClient,
     ) -> None:
         self.session = session
+        # インポート処理はAPIとは別のプールを使う
+        self.background_session = background_session
         self.background_tasks = background_tasks
         self.webhook = webhook
         self.logger = get_logger(__name__)
@@ -188,10 +586,13 @@ class ImportTodos:
             await self.import_todos(file)
         except Exception as e:
             # エラー発生時
+            # バックグラウンド用のプールが枯渇していても
+            # 記録できるようAPIのプールから書き込む
             await self._update_operation(
                 operation_id,
                 OperationStatus.ERROR,
                 reason=str(e),
+                session_maker=self.session,
             )
         else:
             # 正常終了時
@@ -205,8 +606,12 @@ class ImportTodos:
         operation_id: UUID,
         status: OperationStatus,
         reason: str = "",
+        session_maker: AsyncSession | None = None,
     ) -> None:
-        async with self.session.begin() as session:
+        session_maker = (
+            session_maker or self.background_session
+        )
+        async with session_maker.begin() as session:
             op = await db.Operation.get_by_id(
                 session,
                 operation_id=operation_id,
@@ -232,19 +637,17 @@ class ImportTodos:
     async def import_todos(
         self, file: UploadFile
     ) -> tuple[list[db.Todo], list[db.SubTask]]:
+        # インポート時しか使わないので起動時には読み込まない
+        import csv
+
         reader = csv.DictReader(
             TextIOWrapper(file.file, encoding="utf-8"),
-            fieldnames=[
-                "title",
-                "status",
-                "subtask_title",
-                "subtask_status",
-            ],
+            fieldnames=CSV_FIELDNAMES,
         )
         # ヘッダーをスキップ
         next(reader)
 
-        async with self.session.begin() as session:
+        async with self.background_session.begin() as session:
             todo_data: list[db.BulkTodoCreateParam] = []
             subtask_rows: list[list[dict[str, str]]] = []
             for row in reader:
@@ -288,3 +691,49 @@ class ImportTodos:
                 session, subtask_data
             )
             return new_todos, new_subtasks
+
+
+class ExportTodos:
+    # 1回に書き出す行数
+    CHUNK_SIZE = 1000
+
+    def __init__(self, session: ReadOnlySession) -> None:
+        self.session = session
+
+    async def execute(self) -> AsyncIterator[str]:
+        # ImportTodosで読み込める形式のCSVを少しずつ返す
+        # エクスポート時しか使わないので起動時には読み込まない
+        import csv
+
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_FIELDNAMES)
+        async with self.session() as session:
+            rows = await db.Todo.stream_with_subtasks(
+                session, self.CHUNK_SIZE
+            )
+            last_todo_id = None
+            count = 0
+            async for (
+                todo_id,
+                title,
+                status,
+                subtask_title,
+                subtask_status,
+            ) in rows:
+                if todo_id != last_todo_id:
+                    # CSVファイルのTODO行
+                    writer.writerow([title, status, "", ""])
+                    last_todo_id = todo_id
+                if subtask_title is not None:
+                    # CSVファイルのSubTask行
+                    writer.writerow(
+                        ["", "", subtask_title, subtask_status]
+                    )
+                count += 1
+                if count % self.CHUNK_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
@@ -8,26 +8,44 @@ from fastapi import (
     UploadFile,
     status,
 )
+from fastapi.responses import StreamingResponse
 
 from app.api_route import LoggingRoute
 from app.context import bind_todo_id
+from app.exceptions import BadRequest
+from app.models import Status, TodoSort, UTCDatetime
 from app.pager import LimitOffsetQuery
 
 from .schemas import (
+    BATCH_SIZE_LIMIT,
+    MAX_SUBTASKS_LIMIT,
+    TODO_FIELDS,
+    BatchTodosRequest,
+    BatchTodosResponse,
     CreateTodoRequest,
     CreateTodoResponse,
+    GetPartialTodoResponse,
     GetTodoResponse,
+    GetTodosRequest,
+    GetTodosResponse,
+    GetTodosWithSubTasksResponse,
     ImportTodosResponse,
+    ListPartialTodosResponse,
     ListTodosResponse,
     ListTodoWithSubTasksResponse,
     UpdateTodoRequest,
     UpdateTodoResponse,
 )
+from .subtasks import batch_router as subtask_batch_router
 from .subtasks import router as subtask_router
 from .use_cases import (
+    BatchTodos,
+    BatchTodoUpdate,
     CreateTodo,
     DeleteTodo,
+    ExportTodos,
     GetTodo,
+    GetTodos,
     ImportTodos,
     ListTodos,
     ListTodosFilter,
@@ -40,27 +58,148 @@ router = APIRouter(
 )
 
 
+# datetimeを直接書くと、freezegunがdatetimeを差し替えている間に
+# 注釈を評価し直したときにFakeDatetimeとなり検証できない
 async def _get_filter(
     min_subtasks: Annotated[int, Query(ge=0)] = 0,
+    q: Annotated[
+        str | None,
+        Query(
+            # 2文字以下はトライグラムのインデックスで絞れない
+            min_length=3,
+            max_length=256,
+            description=(
+                "TodoかSubTaskのタイトルに含む3文字以上の"
+                "文字列。タイトルが近い順に並べる"
+            ),
+        ),
+    ] = None,
+    status: Annotated[Status | None, Query()] = None,
+    updated_after: Annotated[
+        UTCDatetime | None,
+        Query(
+            description=(
+                "この日時以降に更新されたTodoに絞る。"
+                "タイムゾーンが無ければUTCとみなす"
+            ),
+        ),
+    ] = None,
+    updated_before: Annotated[
+        UTCDatetime | None,
+        Query(
+            description="この日時より前に更新されたTodoに絞る"
+        ),
+    ] = None,
+    created_after: Annotated[
+        UTCDatetime | None,
+        Query(
+            description="この日時以降に作成されたTodoに絞る"
+        ),
+    ] = None,
 ) -> ListTodosFilter:
-    return ListTodosFilter(min_subtasks=min_subtasks)
+    return ListTodosFilter(
+        min_subtasks=min_subtasks,
+        q=q,
+        status=status,
+        updated_after=updated_after,
+        updated_before=updated_before,
+        created_after=created_after,
+    )
 
 
 FilterQuery = Annotated[ListTodosFilter, Depends(_get_filter)]
 
 
-@router.get("", summary="Todoの一覧を取得する")
+async def _get_fields(
+    fields: Annotated[
+        str | None,
+        Query(
+            description=(
+                "返す項目をカンマ区切りで指定する。"
+                "todo_idは常に含む"
+            ),
+            examples=["todo_id,title"],
+        ),
+    ] = None,
+) -> frozenset[str] | None:
+    if fields is None:
+        return None
+    names = frozenset(
+        name.strip()
+        for name in fields.split(",")
+        if name.strip()
+    )
+    if unknown := names - TODO_FIELDS:
+        raise BadRequest(
+            {"fields": sorted(unknown)},
+            message="Unknown fields",
+        )
+    return names | {"todo_id"}
+
+
+FieldsQuery = Annotated[
+    frozenset[str] | None, Depends(_get_fields)
+]
+
+
+@router.get(
+    "",
+    summary="Todoの一覧を取得する",
+    # fields= で指定されなかった項目は出力しない
+    response_model_exclude_unset=True,
+)
 async def list_todos(
     limit_offset: LimitOffsetQuery,
     filter_: Annotated[ListTodosFilter, Depends(_get_filter)],
     use_case: Annotated[ListTodos, Depends(ListTodos)],
     include_subtasks: Annotated[bool, Query()] = False,
-) -> ListTodosResponse | ListTodoWithSubTasksResponse:
+    subtasks_limit: Annotated[
+        int,
+        Query(
+            ge=0,
+            le=MAX_SUBTASKS_LIMIT,
+            description="Todoごとに含めるSubTaskの数。0なら全件",
+        ),
+    ] = 0,
+    fields: FieldsQuery = None,
+    sort: Annotated[
+        TodoSort,
+        Query(description="並び順。-を付けると降順"),
+    ] = TodoSort.CREATED_AT_DESC,
+    cursor: Annotated[
+        str | None,
+        Query(
+            description=(
+                "前のページのnext_cursor。"
+                "offsetとq=とは同時に使えない"
+            ),
+        ),
+    ] = None,
+) -> (
+    ListTodosResponse
+    | ListTodoWithSubTasksResponse
+    | ListPartialTodosResponse
+):
+    if fields is not None:
+        partial = await use_case.execute(
+            limit_offset=limit_offset,
+            filter_=filter_,
+            include_subtasks=include_subtasks,
+            subtasks_limit=subtasks_limit,
+            fields=fields,
+            sort=sort,
+            cursor=cursor,
+        )
+        return ListPartialTodosResponse.model_validate(partial)
+
     if include_subtasks:
         with_subtasks = await use_case.execute(
             limit_offset=limit_offset,
             filter_=filter_,
             include_subtasks=True,
+            subtasks_limit=subtasks_limit,
+            sort=sort,
+            cursor=cursor,
         )
         return ListTodoWithSubTasksResponse.model_validate(
             with_subtasks
@@ -71,6 +210,8 @@ async def list_todos(
             limit_offset=limit_offset,
             filter_=filter_,
             include_subtasks=False,
+            sort=sort,
+            cursor=cursor,
         )
         return ListTodosResponse.model_validate(no_subtask)
 
@@ -89,18 +230,110 @@ async def create_todo(
     )
 
 
+# /{todo_id} より前に登録する
+@router.get(
+    "/by-ids",
+    summary="複数のTodoをidでまとめて取得する",
+)
+async def get_todos(
+    ids: Annotated[
+        list[UUID],
+        Query(min_length=1, max_length=BATCH_SIZE_LIMIT),
+    ],
+    use_case: Annotated[GetTodos, Depends(GetTodos)],
+    include_subtasks: Annotated[bool, Query()] = False,
+    subtasks_limit: Annotated[
+        int, Query(ge=0, le=MAX_SUBTASKS_LIMIT)
+    ] = 0,
+) -> GetTodosResponse | GetTodosWithSubTasksResponse:
+    return await _get_todos(
+        use_case, ids, include_subtasks, subtasks_limit
+    )
+
+
+@router.post(
+    "/by-ids",
+    summary="複数のTodoをidでまとめて取得する (POST)",
+    description="URLに収まらない数のidを指定する場合に使う",
+)
+async def post_get_todos(
+    data: GetTodosRequest,
+    use_case: Annotated[GetTodos, Depends(GetTodos)],
+) -> GetTodosResponse | GetTodosWithSubTasksResponse:
+    return await _get_todos(
+        use_case,
+        data.ids,
+        data.include_subtasks,
+        data.subtasks_limit,
+    )
+
+
+async def _get_todos(
+    use_case: GetTodos,
+    ids: list[UUID],
+    include_subtasks: bool,
+    subtasks_limit: int,
+) -> GetTodosResponse | GetTodosWithSubTasksResponse:
+    if include_subtasks:
+        with_subtasks, missing = await use_case.execute(
+            ids,
+            include_subtasks=True,
+            subtasks_limit=subtasks_limit,
+        )
+        return GetTodosWithSubTasksResponse(
+            todos=with_subtasks, missing=missing
+        )
+    todos, missing = await use_case.execute(
+        ids, include_subtasks=False
+    )
+    return GetTodosResponse.model_validate(
+        {"todos": todos, "missing": missing}
+    )
+
+
+# /{todo_id} より前に登録する
+@router.get(
+    "/export",
+    summary="TodoをCSVファイルにエクスポートする",
+    description="インポートと同じ形式で全件を作成順に出力する",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/csv": {}}}},
+)
+async def export_todos(
+    use_case: Annotated[ExportTodos, Depends(ExportTodos)],
+) -> StreamingResponse:
+    return StreamingResponse(
+        use_case.execute(),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": (
+                'attachment; filename="todos.csv"'
+            )
+        },
+    )
+
+
 @router.get(
     "/{todo_id}",
     summary="Todoを取得する",
     dependencies=[Depends(bind_todo_id)],
+    response_model_exclude_unset=True,
 )
 async def get_todo(
     todo_id: UUID,
     use_case: Annotated[GetTodo, Depends(GetTodo)],
-) -> GetTodoResponse:
-    return cast(
-        GetTodoResponse,
-        await use_case.execute(todo_id=todo_id),
+    fields: FieldsQuery = None,
+) -> GetTodoResponse | GetPartialTodoResponse:
+    if fields is not None:
+        partial = await use_case.execute(
+            todo_id=todo_id, fields=fields
+        )
+        # セットされた項目だけを引き継ぐ
+        return GetPartialTodoResponse.model_validate(
+            partial.model_dump(exclude_unset=True)
+        )
+    return GetTodoResponse.model_validate(
+        await use_case.execute(todo_id=todo_id)
     )
 
 
@@ -150,6 +383,32 @@ async def import_todos(
     )
 
 
+@router.post(
+    "/batch",
+    summary="Todoを一括で作成・更新・削除する",
+)
+async def batch_todos(
+    data: BatchTodosRequest,
+    use_case: Annotated[BatchTodos, Depends(BatchTodos)],
+) -> BatchTodosResponse:
+    return BatchTodosResponse.model_validate(
+        await use_case.execute(
+            create=[todo.title for todo in data.create],
+            update=[
+                BatchTodoUpdate.model_validate(
+                    todo, from_attributes=True
+                )
+                for todo in data.update
+            ],
+            delete=data.delete,
+        )
+    )
+
+
+router.include_router(
+    subtask_batch_router,
+    prefix="/subtasks",
+)
 router.include_router(
     subtask_router,
     prefix="/{todo_id}/subtasks",
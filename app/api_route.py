@@ -4,6 +4,7 @@ from typing import Any
 
 import structlog
 from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRoute
 
 
@@ -36,12 +37,15 @@ async def dump_request(request: Request) -> None:
 
 
 async def dump_response(response: Response) -> None:
-    try:
-        res = json.loads(
-            response.body.decode()  # type: ignore
-        )
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        res = "{}"
+    res = "{}"
+    # StreamingResponseはbodyを持たない
+    if not isinstance(response, StreamingResponse):
+        try:
+            res = json.loads(
+                response.body.decode()  # type: ignore
+            )
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
 
     logger = structlog.getLogger()
     status_code = response.status_code
@@ -1,8 +1,15 @@
+import math
+import time
 from typing import Annotated, AsyncIterator
 
 import structlog
-from fastapi import Depends
-from sqlalchemy.exc import SQLAlchemyError
+from fastapi import Depends, Request, Response
+from sqlalchemy.exc import (
+    InterfaceError,
+    OperationalError,
+    SQLAlchemyError,
+)
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
     AsyncSession as _AsyncSession,
 )
@@ -11,13 +18,14 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
-from app.exceptions import AppException
+from app.exceptions import AppException, ServiceUnavailable
 from app.settings import settings
 
 async_engine = create_async_engine(
     str(settings.DB_URI),
-    pool_size=5,
-    pool_timeout=10,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
     pool_use_lifo=True,
     pool_pre_ping=True,
 )
@@ -27,12 +35,116 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# バックグラウンド処理用。リクエストとは接続を共有しない
+background_engine = create_async_engine(
+    str(settings.DB_URI),
+    pool_size=settings.DB_BACKGROUND_POOL_SIZE,
+    max_overflow=settings.DB_BACKGROUND_MAX_OVERFLOW,
+    pool_timeout=settings.DB_BACKGROUND_POOL_TIMEOUT,
+    pool_use_lifo=True,
+    pool_pre_ping=True,
+)
 
-async def get_session() -> AsyncIterator[
-    async_sessionmaker[_AsyncSession]
-]:
+BackgroundSessionLocal = async_sessionmaker(
+    bind=background_engine,
+    expire_on_commit=False,
+)
+
+# 読み取り専用のレプリカ (DB_REPLICA_URIの設定時のみ)
+replica_engine = (
+    create_async_engine(
+        settings.DB_REPLICA_URI,
+        pool_size=settings.DB_REPLICA_POOL_SIZE,
+        max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_use_lifo=True,
+        pool_pre_ping=True,
+    )
+    if settings.DB_REPLICA_URI
+    else None
+)
+
+ReplicaSessionLocal = (
+    async_sessionmaker(
+        bind=replica_engine,
+        expire_on_commit=False,
+    )
+    if replica_engine
+    else None
+)
+
+# 書き込み後にプライマリへ固定する期限 (UNIX時間) を保持する
+PIN_TO_PRIMARY_COOKIE = "db-primary-until"
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# レプリカが使えないと判断する接続系のエラー
+REPLICA_CONNECTION_ERRORS = (
+    OperationalError,
+    InterfaceError,
+    OSError,
+)
+
+
+class ReplicaHealth:
+    def __init__(self, retry_interval: float) -> None:
+        self.retry_interval = retry_interval
+        self._unhealthy_until = 0.0
+
+    @property
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self._unhealthy_until
+
+    def mark_unhealthy(self) -> None:
+        self._unhealthy_until = (
+            time.monotonic() + self.retry_interval
+        )
+
+
+replica_health = ReplicaHealth(
+    settings.DB_REPLICA_RETRY_INTERVAL
+)
+
+
+def _pin_to_primary(
+    request: Request, response: Response
+) -> None:
+    seconds = settings.DB_READ_YOUR_WRITES_SECONDS
+    if not ReplicaSessionLocal or seconds <= 0:
+        return
+    if request.method in SAFE_METHODS:
+        return
+
+    # 書き込み直後の読み取りで古い値を返さないようにする
+    response.set_cookie(
+        PIN_TO_PRIMARY_COOKIE,
+        str(time.time() + seconds),
+        max_age=math.ceil(seconds),
+        httponly=True,
+    )
+
+
+def _is_pinned_to_primary(request: Request) -> bool:
+    try:
+        until = float(request.cookies[PIN_TO_PRIMARY_COOKIE])
+    except (KeyError, ValueError):
+        return False
+    return until > time.time()
+
+
+async def get_session(
+    request: Request,
+    response: Response,
+) -> AsyncIterator[async_sessionmaker[_AsyncSession]]:
+    _pin_to_primary(request, response)
     try:
         yield AsyncSessionLocal
+    except PoolTimeoutError as e:
+        # 接続の空きを待ちきれなかった場合は過負荷として扱う
+        structlog.getLogger().warning(f"{e!r}")
+        raise ServiceUnavailable(
+            settings.ADMISSION_RETRY_AFTER
+        ) from e
     except SQLAlchemyError as e:
         # DB 関連のエラーはログを残して 500 を返す
         structlog.getLogger().exception(f"{e!r}")
@@ -42,3 +154,80 @@ async def get_session() -> AsyncIterator[
 AsyncSession = Annotated[
     async_sessionmaker[_AsyncSession], Depends(get_session)
 ]
+
+
+def _replica_unavailable(e: Exception) -> None:
+    # しばらくはプライマリから読み取る
+    replica_health.mark_unhealthy()
+    structlog.getLogger().exception(
+        "replica unavailable", error=repr(e)
+    )
+
+
+async def get_readonly_session(
+    request: Request,
+    primary: AsyncSession,
+) -> AsyncIterator[async_sessionmaker[_AsyncSession]]:
+    if (
+        not replica_engine
+        or not ReplicaSessionLocal
+        or not replica_health.is_healthy
+        or _is_pinned_to_primary(request)
+    ):
+        yield primary
+        return
+
+    try:
+        # 取り出し時のpool_pre_pingで接続できるかを確かめる
+        # LIFOなので確かめた接続がそのまま使われる
+        async with replica_engine.connect():
+            pass
+    except PoolTimeoutError as e:
+        structlog.getLogger().warning(f"{e!r}")
+        raise ServiceUnavailable(
+            settings.ADMISSION_RETRY_AFTER
+        ) from e
+    except REPLICA_CONNECTION_ERRORS as e:
+        # このリクエストからプライマリで読み取る
+        _replica_unavailable(e)
+        yield primary
+        return
+
+    try:
+        yield ReplicaSessionLocal
+    except PoolTimeoutError as e:
+        structlog.getLogger().warning(f"{e!r}")
+        raise ServiceUnavailable(
+            settings.ADMISSION_RETRY_AFTER
+        ) from e
+    except REPLICA_CONNECTION_ERRORS as e:
+        # 処理の途中で切れた場合はやり直せないので
+        # 503 で再送を促し、再送はプライマリへ向かう
+        _replica_unavailable(e)
+        raise ServiceUnavailable(
+            settings.ADMISSION_RETRY_AFTER
+        ) from e
+    except SQLAlchemyError as e:
+        structlog.getLogger().exception(f"{e!r}")
+        raise AppException() from e
+
+
+# 参照系のユースケースで使う
+ReadOnlySession = Annotated[
+    async_sessionmaker[_AsyncSession],
+    Depends(get_readonly_session),
+]
+
+
+async def get_background_session() -> AsyncIterator[
+    async_sessionmaker[_AsyncSession]
+]:
+    # レスポンス後に使われるため、例外は利用側で処理する
+    yield BackgroundSessionLocal
+
+
+# バックグラウンド処理のユースケースで使う
+BackgroundSession = Annotated[
+    async_sessionmaker[_AsyncSession],
+    Depends(get_background_session),
+]
@@ -1,13 +1,28 @@
-from .base import Base
+from .base import Base, is_foreign_key_violation
 from .operation import Operation
-from .subtask import BulkSubTaskCreateParam, SubTask
-from .todo import BulkTodoCreateParam, Todo
+from .subtask import (
+    BulkSubTaskCreateParam,
+    BulkSubTaskUpdateParam,
+    SubTask,
+    SubTaskKey,
+)
+from .todo import (
+    BulkTodoCreateParam,
+    BulkTodoUpdateParam,
+    Todo,
+    TodoKey,
+)
 
 __all__ = [
     "Base",
     "Operation",
     "SubTask",
+    "SubTaskKey",
     "Todo",
+    "TodoKey",
     "BulkTodoCreateParam",
+    "BulkTodoUpdateParam",
     "BulkSubTaskCreateParam",
+    "BulkSubTaskUpdateParam",
+    "is_foreign_key_violation",
 ]
@@ -1,4 +1,7 @@
+from collections.abc import Sequence
 from datetime import datetime
+from typing import Any
+from uuid import UUID
 
 from sqlalchemy import (
     DateTime,
@@ -6,13 +9,21 @@ from sqlalchemy import (
     Integer,
     MetaData,
     String,
+    Uuid,
+    event,
+    literal,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
     mapped_column,
 )
+from sqlalchemy.sql.elements import BindParameter
 
 from app.models.enums import (
     OperationStatus,
@@ -21,6 +32,9 @@ from app.models.enums import (
 )
 from app.utils.datetime import utcnow
 
+# PostgreSQLのSQLSTATE
+FOREIGN_KEY_VIOLATION = "23503"
+
 convention = {
     "pk": "pk_%(table_name)s",
     "ix": "ix_%(column_0_label)s",
@@ -68,3 +82,37 @@ class Base(AsyncAttrs, DeclarativeBase):
             ]
         )
         return f"<{self.__class__.__name__}({columns})>"
+
+
+@event.listens_for(Base.metadata, "before_create")
+def create_extensions(
+    target: MetaData, connection: Connection, **kw: Any
+) -> None:
+    # タイトルの部分一致検索 (gin_trgm_ops) に使う
+    connection.execute(
+        text("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    )
+
+
+def like_pattern(value: str) -> str:
+    # LIKEの部分一致パターン。既定のエスケープ文字を使う
+    escaped = (
+        value.replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+    )
+    return f"%{escaped}%"
+
+
+def uuid_array(
+    ids: Sequence[UUID],
+) -> BindParameter[list[UUID]]:
+    # = ANY(...) に渡す uuid[] 型の1つのパラメータ
+    return literal(list(ids), ARRAY(Uuid()))
+
+
+def is_foreign_key_violation(e: DBAPIError) -> bool:
+    return (
+        getattr(e.orig, "pgcode", None)
+        == FOREIGN_KEY_VIOLATION
+    )
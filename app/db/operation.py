@@ -1,7 +1,7 @@
 from typing import Self
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import (
     Mapped,
@@ -46,15 +46,21 @@ class Operation(Base):
         session: AsyncSession,
         operation_id: UUID,
     ) -> Self | None:
-        stmt = select(cls).where(
-            cls.operation_id == operation_id
-        )
+        stmt = cls.stmt_get_by_id(operation_id)
         op = await session.scalar(stmt)
         if not op:
             return None
 
         return op
 
+    @classmethod
+    def stmt_get_by_id(
+        cls, operation_id: UUID
+    ) -> Select[tuple[Self]]:
+        return select(cls).where(
+            cls.operation_id == operation_id
+        )
+
     async def update(
         self,
         session: AsyncSession,
@@ -1,11 +1,29 @@
-from collections.abc import AsyncIterator, Iterable
+from collections.abc import Iterable, Sequence
+from datetime import datetime
 from typing import TYPE_CHECKING, Self, TypedDict
 from uuid import UUID, uuid4
 
-from sqlalchemy import ForeignKey, asc, insert, select
+from sqlalchemy import (
+    ForeignKey,
+    Index,
+    Select,
+    and_,
+    any_,
+    asc,
+    column,
+    delete,
+    insert,
+    literal,
+    select,
+    true,
+    tuple_,
+    update,
+    values,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import (
     Mapped,
+    aliased,
     mapped_column,
     relationship,
 )
@@ -13,7 +31,7 @@ from sqlalchemy.orm import (
 from app.models import Status
 from app.utils import get_chunk
 
-from .base import Base, str_256
+from .base import Base, str_256, uuid_array
 
 if TYPE_CHECKING:
     from .todo import Todo
@@ -25,17 +43,43 @@ class BulkSubTaskCreateParam(TypedDict):
     status: Status
 
 
+class BulkSubTaskUpdateParam(TypedDict):
+    todo_id: UUID
+    subtask_id: UUID
+    title: str
+    status: Status
+
+
+# 一覧の並び順 (created_at, subtask_id)
+type SubTaskKey = tuple[datetime, UUID]
+
 BULK_SIZE_LIMIT = 100
 
 
 class SubTask(Base):
     __tablename__ = "subtasks"
+    __table_args__ = (
+        # Todoごとの一覧をキーセットでページングする
+        Index(
+            "ix_subtasks_todo_id_created_at",
+            "todo_id",
+            "created_at",
+            "subtask_id",
+        ),
+        # Todoの q= の検索でSubTaskのタイトルも対象にする
+        Index(
+            "ix_subtasks_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
 
     subtask_id: Mapped[UUID] = mapped_column(primary_key=True)
     title: Mapped[str_256]
     status: Mapped[Status]
     todo_id: Mapped[UUID] = mapped_column(
-        ForeignKey("todos.todo_id"), index=True
+        ForeignKey("todos.todo_id")
     )
     todo: Mapped["Todo"] = relationship(
         back_populates="subtasks",
@@ -45,67 +89,202 @@ class SubTask(Base):
     async def get_all_by_todo(
         cls,
         session: AsyncSession,
-        todo: "Todo",
-    ) -> AsyncIterator[Self]:
-        stmt = (
+        todo_id: UUID,
+        limit: int = 0,
+        after: SubTaskKey | None = None,
+    ) -> list[Self] | None:
+        # Todoが存在しなければNone
+        stmt = cls.stmt_get_all_by_todo(todo_id, after)
+        if limit:
+            stmt = stmt.limit(limit)
+        subtasks = list(await session.scalars(stmt))
+        if not subtasks:
+            # Todoが存在するかは空のときだけ確かめる
+            todos = cls.metadata.tables["todos"]
+            found = await session.scalar(
+                select(todos.c.todo_id).where(
+                    todos.c.todo_id == todo_id
+                )
+            )
+            if found is None:
+                return None
+        return subtasks
+
+    @classmethod
+    def stmt_get_all_by_todo(
+        cls, todo_id: UUID, after: SubTaskKey | None = None
+    ) -> Select[tuple[Self]]:
+        # todosと結合すると並び順がインデックスから外れるので
+        # subtasksだけを読む
+        stmt = select(cls).where(cls.todo_id == todo_id)
+        if after:
+            # afterより後ろをインデックスの範囲で読む
+            created_at, subtask_id = after
+            stmt = stmt.where(
+                tuple_(cls.created_at, cls.subtask_id)
+                > tuple_(
+                    literal(created_at, cls.created_at.type),
+                    literal(subtask_id, cls.subtask_id.type),
+                )
+            )
+        return stmt.order_by(
+            asc(cls.created_at), asc(cls.subtask_id)
+        )
+
+    @classmethod
+    async def get_first_by_todos(
+        cls,
+        session: AsyncSession,
+        todo_ids: Sequence[UUID],
+        limit: int,
+    ) -> list[Self]:
+        stmt = cls.stmt_get_first_by_todos(todo_ids, limit)
+        return list(await session.scalars(stmt))
+
+    @classmethod
+    def stmt_get_first_by_todos(
+        cls, todo_ids: Sequence[UUID], limit: int
+    ) -> Select[tuple[Self]]:
+        # Todoごとに一覧の先頭limit件だけを取得する
+        todos = cls.metadata.tables["todos"]
+        first = (
             select(cls)
-            .where(cls.todo_id == todo.todo_id)
-            .order_by(asc(cls.created_at))
+            .where(cls.todo_id == todos.c.todo_id)
+            .order_by(asc(cls.created_at), asc(cls.subtask_id))
+            .limit(limit)
+            .lateral("first_subtasks")
+        )
+        subtask = aliased(cls, first)
+        return (
+            select(subtask)
+            .select_from(todos)
+            .join(first, true())
+            .where(
+                todos.c.todo_id == any_(uuid_array(todo_ids))
+            )
+            .order_by(
+                subtask.todo_id,
+                subtask.created_at,
+                subtask.subtask_id,
+            )
         )
-        return await session.stream_scalars(stmt)
 
     @classmethod
     async def get_by_id(
         cls,
         session: AsyncSession,
-        todo: "Todo",
+        todo_id: UUID,
         subtask_id: UUID,
-    ) -> Self | None:
-        stmt = select(cls).where(
-            cls.todo_id == todo.todo_id,
-            cls.subtask_id == subtask_id,
+    ) -> tuple[bool, Self | None]:
+        # (Todoが存在するか, SubTask) を返す
+        stmt = cls.stmt_get_by_id(todo_id, subtask_id)
+        row = (await session.execute(stmt)).one_or_none()
+        if row is None:
+            return False, None
+        return True, row[1]
+
+    @classmethod
+    def stmt_get_by_id(
+        cls, todo_id: UUID, subtask_id: UUID
+    ) -> Select[tuple[UUID, Self]]:
+        todos = cls.metadata.tables["todos"]
+        return (
+            select(todos.c.todo_id, cls)
+            .select_from(todos)
+            .outerjoin(
+                cls,
+                and_(
+                    cls.todo_id == todos.c.todo_id,
+                    cls.subtask_id == subtask_id,
+                ),
+            )
+            .where(todos.c.todo_id == todo_id)
         )
-        subtask = await session.scalar(stmt)
-        return subtask
 
     @classmethod
     async def create(
         cls,
         session: AsyncSession,
-        todo: "Todo",
+        todo_id: UUID,
         subtask_id: UUID,
         title: str,
         status: Status,
     ) -> Self:
-        subtask = cls(
-            todo=todo,
-            subtask_id=subtask_id,
-            title=title,
-            status=status,
+        # Todoが無ければ外部キー制約違反のIntegrityError
+        stmt = (
+            insert(cls)
+            .values(
+                todo_id=todo_id,
+                subtask_id=subtask_id,
+                title=title,
+                status=status,
+            )
+            .returning(cls)
         )
-        session.add(subtask)
-        await session.flush()
-        await session.refresh(subtask)
+        subtask = await session.scalar(stmt)
+        assert subtask is not None
         return subtask
 
+    @classmethod
     async def update(
-        self,
+        cls,
         session: AsyncSession,
-        todo: "Todo",
+        todo_id: UUID,
+        subtask_id: UUID,
         title: str,
         status: Status,
-    ) -> None:
-        self.todo = todo
-        self.title = title
-        self.status = status
-        await session.flush()
+    ) -> tuple[bool, Self | None]:
+        # (Todoが存在するか, 更新したSubTask) を返す
+        todos = cls.metadata.tables["todos"]
+        updated = (
+            update(cls)
+            .where(
+                cls.todo_id == todo_id,
+                cls.subtask_id == subtask_id,
+            )
+            .values(title=title, status=status)
+            .returning(*cls.__table__.c)
+            .cte("updated")
+        )
+        stmt = (
+            select(todos.c.todo_id, aliased(cls, updated))
+            .select_from(todos)
+            .outerjoin(updated, true())
+            .where(todos.c.todo_id == todo_id)
+        )
+        row = (await session.execute(stmt)).one_or_none()
+        if row is None:
+            return False, None
+        return True, row[1]
 
     @classmethod
     async def delete(
-        cls, session: AsyncSession, subtask: Self
-    ) -> None:
-        await session.delete(subtask)
-        await session.flush()
+        cls,
+        session: AsyncSession,
+        todo_id: UUID,
+        subtask_id: UUID,
+    ) -> tuple[bool, bool]:
+        # (Todoが存在するか, 削除したか) を返す
+        todos = cls.metadata.tables["todos"]
+        deleted = (
+            delete(cls)
+            .where(
+                cls.todo_id == todo_id,
+                cls.subtask_id == subtask_id,
+            )
+            .returning(cls.subtask_id)
+            .cte("deleted")
+        )
+        stmt = (
+            select(todos.c.todo_id, deleted.c.subtask_id)
+            .select_from(todos)
+            .outerjoin(deleted, true())
+            .where(todos.c.todo_id == todo_id)
+        )
+        row = (await session.execute(stmt)).one_or_none()
+        if row is None:
+            return False, False
+        return True, row[1] is not None
 
     @classmethod
     async def bulk_create(
@@ -142,3 +321,99 @@ class SubTask(Base):
         return [
             subtask for subtask in await session.scalars(stmt)
         ]
+
+    @classmethod
+    async def bulk_update(
+        cls,
+        session: AsyncSession,
+        subtasks: Iterable[BulkSubTaskUpdateParam],
+    ) -> list[Self]:
+        # 更新できたSubTaskを返す
+        return [
+            subtask
+            for chunk in get_chunk(subtasks, n=BULK_SIZE_LIMIT)
+            for subtask in await cls._bulk_update(
+                session, chunk
+            )
+        ]
+
+    @classmethod
+    async def _bulk_update(
+        cls,
+        session: AsyncSession,
+        subtasks: Iterable[BulkSubTaskUpdateParam],
+    ) -> list[Self]:
+        c = cls.__table__.c
+        data = values(
+            column("todo_id", c.todo_id.type),
+            column("subtask_id", c.subtask_id.type),
+            column("title", c.title.type),
+            column("status", c.status.type),
+            name="data",
+        ).data(
+            [
+                (
+                    subtask["todo_id"],
+                    subtask["subtask_id"],
+                    subtask["title"],
+                    subtask["status"],
+                )
+                for subtask in subtasks
+            ]
+        )
+        stmt = (
+            update(cls)
+            .where(
+                cls.todo_id == data.c.todo_id,
+                cls.subtask_id == data.c.subtask_id,
+            )
+            .values(title=data.c.title, status=data.c.status)
+            .returning(cls)
+        )
+        result = await session.scalars(
+            stmt,
+            execution_options={"synchronize_session": False},
+        )
+        return list(result)
+
+    @classmethod
+    async def bulk_delete(
+        cls,
+        session: AsyncSession,
+        keys: Sequence[tuple[UUID, UUID]],
+    ) -> list[UUID]:
+        # (todo_id, subtask_id) の組で削除する
+        return [
+            subtask_id
+            for chunk in get_chunk(keys, n=BULK_SIZE_LIMIT)
+            for subtask_id in await cls._bulk_delete(
+                session, chunk
+            )
+        ]
+
+    @classmethod
+    async def _bulk_delete(
+        cls,
+        session: AsyncSession,
+        keys: Iterable[tuple[UUID, UUID]],
+    ) -> list[UUID]:
+        c = cls.__table__.c
+        data = values(
+            column("todo_id", c.todo_id.type),
+            column("subtask_id", c.subtask_id.type),
+            name="data",
+        ).data(list(keys))
+        # DELETE ... USING (VALUES ...) になる
+        stmt = (
+            delete(cls)
+            .where(
+                cls.todo_id == data.c.todo_id,
+                cls.subtask_id == data.c.subtask_id,
+            )
+            .returning(cls.subtask_id)
+        )
+        result = await session.scalars(
+            stmt,
+            execution_options={"synchronize_session": False},
+        )
+        return list(result)
@@ -1,21 +1,49 @@
-from collections.abc import AsyncIterator, Iterable
-from typing import Self, TypedDict
+from collections.abc import (
+    AsyncIterator,
+    Collection,
+    Iterable,
+    Sequence,
+)
+from datetime import datetime
+from typing import Any, Self, TypedDict, cast
 from uuid import UUID, uuid4
 
-from sqlalchemy import Select, desc, func, insert, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    CompoundSelect,
+    Index,
+    Select,
+    Table,
+    any_,
+    asc,
+    column,
+    delete,
+    desc,
+    event,
+    func,
+    insert,
+    literal,
+    select,
+    text,
+    tuple_,
+    union,
+    update,
+    values,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlalchemy.orm import (
     Mapped,
-    column_property,
+    load_only,
     mapped_column,
     relationship,
     selectinload,
 )
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models import Status
+from app.models import Status, TodoSort
 from app.utils import get_chunk
 
-from .base import Base, str_256
+from .base import Base, like_pattern, str_256, uuid_array
 from .subtask import SubTask
 
 
@@ -24,25 +52,78 @@ class BulkTodoCreateParam(TypedDict):
     status: Status
 
 
+class BulkTodoUpdateParam(TypedDict):
+    todo_id: UUID
+    title: str
+    status: Status
+
+
 BULK_SIZE_LIMIT = 100
 
+# sort= ごとに並べる列。statusは同じ中をcreated_atで並べる
+SORT_FIELDS: dict[str, tuple[str, ...]] = {
+    "created_at": ("created_at",),
+    "updated_at": ("updated_at",),
+    "title": ("title",),
+    "status": ("status", "created_at"),
+    "subtask_count": ("subtask_count",),
+}
+
+# 並び順のキー (SORT_FIELDS の列, todo_id) の値
+type TodoKey = tuple[object, ...]
+
 
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        # sort= の並び順ごとにtodo_idまで含めて持つ
+        # 降順は後ろから読むので昇順の1つで兼ねる
+        Index(
+            "ix_todos_created_at_todo_id",
+            "created_at",
+            "todo_id",
+        ),
+        Index(
+            "ix_todos_updated_at_todo_id",
+            "updated_at",
+            "todo_id",
+        ),
+        Index("ix_todos_title_todo_id", "title", "todo_id"),
+        # status= で絞り込んだ一覧にも使う
+        Index(
+            "ix_todos_status_created_at_todo_id",
+            "status",
+            "created_at",
+            "todo_id",
+        ),
+        Index(
+            "ix_todos_subtask_count_todo_id",
+            "subtask_count",
+            "todo_id",
+        ),
+        # q= の部分一致検索に使う
+        Index(
+            "ix_todos_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
 
     todo_id: Mapped[UUID] = mapped_column(primary_key=True)
     title: Mapped[str_256]
     status: Mapped[Status]
 
+    # 同じ時刻に作ったものもsubtask_idで順序を一意にする
     subtasks: Mapped[list[SubTask]] = relationship(
         back_populates="todo",
         cascade="delete, delete-orphan",
+        order_by=(SubTask.created_at, SubTask.subtask_id),
     )
 
-    subtask_count: Mapped[int] = column_property(
-        select(func.count(SubTask.subtask_id))
-        .where(SubTask.todo_id == todo_id)
-        .scalar_subquery()
+    # SubTaskの数。subtasksのトリガーで更新する
+    subtask_count: Mapped[int] = mapped_column(
+        default=0, server_default="0"
     )
 
     @classmethod
@@ -50,17 +131,87 @@ class Todo(Base):
         cls,
         min_subtasks: int,
         include_subtasks: bool,
+        fields: Collection[str] | None = None,
+        q: str | None = None,
+        status: Status | None = None,
+        updated_after: datetime | None = None,
+        updated_before: datetime | None = None,
+        created_after: datetime | None = None,
+        sort: TodoSort = TodoSort.CREATED_AT_DESC,
+        after: TodoKey | None = None,
     ) -> Select[tuple[Self]]:
-        stmt = select(cls)
+        names = cls.sort_keys(sort)
+        # カーソルを作れるよう並び順のキーは常に読む
+        stmt = cls._select(
+            None if fields is None else {*fields, *names}
+        )
+        keys = [getattr(cls, name) for name in names]
+        # 範囲は after 以上 before 未満とする
+        if status is not None:
+            stmt = stmt.where(cls.status == status)
+        if updated_after is not None:
+            stmt = stmt.where(cls.updated_at >= updated_after)
+        if updated_before is not None:
+            stmt = stmt.where(cls.updated_at < updated_before)
+        if created_after is not None:
+            stmt = stmt.where(cls.created_at >= created_after)
         if min_subtasks:
             stmt = stmt.where(
                 cls.subtask_count >= min_subtasks
             )
         if include_subtasks:
             stmt = stmt.options(selectinload(cls.subtasks))
-        stmt = stmt.order_by(desc(cls.created_at))
+        if q:
+            # タイトルが一致するものを先に並べる
+            stmt = stmt.where(
+                cls.todo_id.in_(cls.stmt_search(q))
+            )
+            stmt = stmt.order_by(
+                desc(func.word_similarity(q, cls.title))
+            )
+        if after is not None:
+            # afterより後ろをインデックスの範囲で読む
+            row = tuple_(*keys)
+            bound = tuple_(
+                *(
+                    literal(value, key.type)
+                    for value, key in zip(
+                        after, keys, strict=True
+                    )
+                )
+            )
+            stmt = stmt.where(
+                row < bound if sort.descending else row > bound
+            )
+        stmt = stmt.order_by(
+            *(
+                desc(key) if sort.descending else asc(key)
+                for key in keys
+            )
+        )
         return stmt
 
+    @classmethod
+    def sort_keys(cls, sort: TodoSort) -> tuple[str, ...]:
+        # 並び順のキー。最後のtodo_idで順序を一意にする
+        return (*SORT_FIELDS[sort.field], "todo_id")
+
+    @classmethod
+    def stmt_search(
+        cls, q: str
+    ) -> CompoundSelect[tuple[UUID]]:
+        # タイトルかSubTaskのタイトルに q を含むtodo_id
+        # ORにせずUNIONにしてそれぞれでインデックスを使う
+        pattern = like_pattern(q)
+        return union(
+            select(cls.todo_id).where(
+                cls.title.ilike(pattern)
+            ),
+            select(SubTask.todo_id).where(
+                SubTask.title.ilike(pattern)
+            ),
+        )
+
     @classmethod
     async def get_all(
         cls,
@@ -74,16 +225,158 @@ class Todo(Base):
         )
         return await session.stream_scalars(stmt)
 
+    @classmethod
+    async def stream_with_subtasks(
+        cls, session: AsyncSession, chunk_size: int
+    ) -> AsyncResult[
+        tuple[UUID, str, Status, str | None, Status | None]
+    ]:
+        # サーバーサイドカーソルでchunk_size行ずつ読む
+        stmt = cls.stmt_with_subtasks().execution_options(
+            yield_per=chunk_size
+        )
+        return await session.stream(stmt)
+
+    @classmethod
+    def stmt_with_subtasks(
+        cls,
+    ) -> Select[
+        tuple[UUID, str, Status, str | None, Status | None]
+    ]:
+        # TodoとそのSubTaskを作成順に1行ずつ並べる
+        # SubTaskが無いTodoはSubTaskの列がNULLの1行になる
+        stmt = (
+            select(
+                cls.todo_id,
+                cls.title,
+                cls.status,
+                SubTask.title,
+                SubTask.status,
+            )
+            .select_from(cls)
+            .outerjoin(SubTask, SubTask.todo_id == cls.todo_id)
+            .order_by(
+                asc(cls.created_at),
+                asc(cls.todo_id),
+                asc(SubTask.created_at),
+                asc(SubTask.subtask_id),
+            )
+        )
+        # 外部結合なので型にNULLを含める
+        return cast(
+            Select[
+                tuple[
+                    UUID,
+                    str,
+                    Status,
+                    str | None,
+                    Status | None,
+                ]
+            ],
+            stmt,
+        )
+
+    @classmethod
+    async def load_subtasks(
+        cls,
+        session: AsyncSession,
+        todos: Sequence[Self],
+        limit: int,
+    ) -> None:
+        # subtasksには先頭limit件だけを入れる
+        # subtask_countは全件の数のまま
+        subtasks: dict[UUID, list[SubTask]] = {
+            todo.todo_id: [] for todo in todos
+        }
+        for subtask in await SubTask.get_first_by_todos(
+            session, list(subtasks), limit
+        ):
+            subtasks[subtask.todo_id].append(subtask)
+        for todo in todos:
+            set_committed_value(
+                todo, "subtasks", subtasks[todo.todo_id]
+            )
+
     @classmethod
     async def get_by_id(
         cls,
         session: AsyncSession,
         todo_id: UUID,
+        fields: Collection[str] | None = None,
     ) -> Self | None:
-        stmt = select(cls).where(cls.todo_id == todo_id)
+        stmt = cls.stmt_get_by_id(todo_id, fields)
         todo = await session.scalar(stmt)
         return todo
 
+    @classmethod
+    def stmt_get_by_id(
+        cls,
+        todo_id: UUID,
+        fields: Collection[str] | None = None,
+    ) -> Select[tuple[Self]]:
+        return cls._select(fields).where(
+            cls.todo_id == todo_id
+        )
+
+    @classmethod
+    def _select(
+        cls, fields: Collection[str] | None
+    ) -> Select[tuple[Self]]:
+        if fields is None:
+            return select(cls)
+        # 指定された列だけをSELECTする
+        return select(cls).options(
+            load_only(
+                cls.todo_id,
+                *(
+                    getattr(cls, field)
+                    for field in fields
+                    if field in cls.__mapper__.column_attrs
+                ),
+            )
+        )
+
+    @classmethod
+    async def get_by_ids(
+        cls,
+        session: AsyncSession,
+        todo_ids: Sequence[UUID],
+        include_subtasks: bool = False,
+    ) -> list[Self]:
+        stmt = cls.stmt_get_by_ids(
+            todo_ids, include_subtasks
+        ).execution_options(populate_existing=True)
+        return list(await session.scalars(stmt))
+
+    @classmethod
+    def stmt_get_by_ids(
+        cls,
+        todo_ids: Sequence[UUID],
+        include_subtasks: bool = False,
+    ) -> Select[tuple[Self]]:
+        # IN (...) と違い件数によらず1つのパラメータで済む
+        stmt = select(cls).where(
+            cls.todo_id == any_(uuid_array(todo_ids))
+        )
+        if include_subtasks:
+            stmt = stmt.options(selectinload(cls.subtasks))
+        return stmt
+
+    @classmethod
+    async def lock_existing_ids(
+        cls,
+        session: AsyncSession,
+        todo_ids: Sequence[UUID],
+    ) -> set[UUID]:
+        # 存在するtodo_idを返す
+        # トランザクション中に削除されないようロックする
+        stmt = (
+            select(cls.todo_id)
+            .where(cls.todo_id == any_(uuid_array(todo_ids)))
+            .with_for_update(read=True, key_share=True)
+        )
+        return set(await session.scalars(stmt))
+
     @classmethod
     async def create(
         cls,
@@ -152,3 +445,170 @@ class Todo(Base):
         ]
         stmt = insert(cls).values(new_todo_dict).returning(cls)
         return [todo for todo in await session.scalars(stmt)]
+
+    @classmethod
+    async def bulk_update(
+        cls,
+        session: AsyncSession,
+        todos: Iterable[BulkTodoUpdateParam],
+    ) -> list[UUID]:
+        # 更新できたtodo_idを返す
+        return [
+            todo_id
+            for chunk in get_chunk(todos, n=BULK_SIZE_LIMIT)
+            for todo_id in await cls._bulk_update(
+                session, chunk
+            )
+        ]
+
+    @classmethod
+    async def _bulk_update(
+        cls,
+        session: AsyncSession,
+        todos: Iterable[BulkTodoUpdateParam],
+    ) -> list[UUID]:
+        # UPDATE ... FROM (VALUES ...) で複数行を1文で更新する
+        c = cls.__table__.c
+        data = values(
+            column("todo_id", c.todo_id.type),
+            column("title", c.title.type),
+            column("status", c.status.type),
+            name="data",
+        ).data(
+            [
+                (
+                    todo["todo_id"],
+                    todo["title"],
+                    todo["status"],
+                )
+                for todo in todos
+            ]
+        )
+        stmt = (
+            update(cls)
+            .where(cls.todo_id == data.c.todo_id)
+            .values(title=data.c.title, status=data.c.status)
+            .returning(cls.todo_id)
+        )
+        result = await session.scalars(
+            stmt,
+            execution_options={"synchronize_session": False},
+        )
+        return list(result)
+
+    @classmethod
+    async def bulk_delete(
+        cls,
+        session: AsyncSession,
+        todo_ids: Sequence[UUID],
+    ) -> list[UUID]:
+        ids = uuid_array(todo_ids)
+        # relationshipのcascadeと同じくSubTaskも削除する
+        await session.execute(
+            delete(SubTask).where(
+                SubTask.todo_id == any_(ids)
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        result = await session.scalars(
+            delete(cls)
+            .where(cls.todo_id == any_(ids))
+            .returning(cls.todo_id),
+            execution_options={"synchronize_session": False},
+        )
+        return list(result)
+
+
+# subtask_count をSubTaskの追加・削除に合わせて更新する
+# 文単位のトリガーにして一括登録でも1回の更新で済ませる
+# マイグレーションは作成時点の写しを持つため
+# ここを変えたら新しいマイグレーションで置き換える
+SUBTASK_COUNT_TRIGGERS = (
+    """
+    CREATE OR REPLACE FUNCTION count_subtasks() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        ids uuid[];
+        ns bigint[];
+    BEGIN
+        -- Todoごとの増減をtodo_idの順に集める
+        IF TG_OP = 'INSERT' THEN
+            SELECT array_agg(todo_id ORDER BY todo_id),
+                array_agg(n ORDER BY todo_id)
+            INTO ids, ns
+            FROM (
+                SELECT todo_id, count(*) AS n
+                FROM new_subtasks GROUP BY todo_id
+            ) AS d;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT array_agg(todo_id ORDER BY todo_id),
+                array_agg(-n ORDER BY todo_id)
+            INTO ids, ns
+            FROM (
+                SELECT todo_id, count(*) AS n
+                FROM old_subtasks GROUP BY todo_id
+            ) AS d;
+        ELSE
+            -- todo_idが変わった分だけ付け替える
+            SELECT array_agg(todo_id ORDER BY todo_id),
+                array_agg(n ORDER BY todo_id)
+            INTO ids, ns
+            FROM (
+                SELECT todo_id, sum(n) AS n
+                FROM (
+                    SELECT todo_id, 1 AS n FROM new_subtasks
+                    UNION ALL
+                    SELECT todo_id, -1 AS n FROM old_subtasks
+                ) AS s
+                GROUP BY todo_id HAVING sum(n) <> 0
+            ) AS d;
+        END IF;
+        IF ids IS NULL THEN
+            RETURN NULL;
+        END IF;
+        -- Todoをまたぐ一括処理同士でデッドロックしないよう
+        -- 更新の前にtodo_idの順で行ロックを取る
+        -- 行ロックは下のUPDATEでも同じくコミットまで持つので
+        -- 同じTodoへの書き込みは元から直列になる
+        -- ここで変わるのはロックを取る順番だけ
+        PERFORM 1 FROM todos
+        WHERE todo_id = ANY(ids)
+        ORDER BY todo_id
+        FOR NO KEY UPDATE;
+        UPDATE todos
+        SET subtask_count = todos.subtask_count + d.n
+        FROM unnest(ids, ns) AS d(todo_id, n)
+        WHERE todos.todo_id = d.todo_id;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER subtasks_count_insert
+    AFTER INSERT ON subtasks
+    REFERENCING NEW TABLE AS new_subtasks
+    FOR EACH STATEMENT EXECUTE FUNCTION count_subtasks()
+    """,
+    """
+    CREATE TRIGGER subtasks_count_delete
+    AFTER DELETE ON subtasks
+    REFERENCING OLD TABLE AS old_subtasks
+    FOR EACH STATEMENT EXECUTE FUNCTION count_subtasks()
+    """,
+    """
+    CREATE TRIGGER subtasks_count_update
+    AFTER UPDATE ON subtasks
+    REFERENCING OLD TABLE AS old_subtasks
+    NEW TABLE AS new_subtasks
+    FOR EACH STATEMENT EXECUTE FUNCTION count_subtasks()
+    """,
+)
+
+
+@event.listens_for(SubTask.__table__, "after_create")
+def create_subtask_count_triggers(
+    target: Table, connection: Connection, **kw: Any
+) -> None:
+    # マイグレーションを使わないテスト用のDBでも作る
+    for ddl in SUBTASK_COUNT_TRIGGERS:
+        connection.execute(text(ddl))
@@ -1,9 +1,19 @@
-from .exceptions import AppException, FileTooLarge, NotFound
+from .exceptions import (
+    AppException,
+    BadRequest,
+    FileTooLarge,
+    Forbidden,
+    NotFound,
+    ServiceUnavailable,
+)
 from .handlers import init_exception_handler
 
 __all__ = [
     "AppException",
+    "BadRequest",
+    "Forbidden",
     "NotFound",
     "init_exception_handler",
     "FileTooLarge",
+    "ServiceUnavailable",
 ]
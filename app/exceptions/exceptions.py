@@ -5,6 +5,7 @@ from uuid import UUID
 class AppException(Exception):
     status_code: int = 500
     message: str = "Internal Server Error"
+    headers: dict[str, str] | None = None
 
     def __init__(
         self,
@@ -16,6 +17,16 @@ class AppException(Exception):
             self.message = message
 
 
+class BadRequest(AppException):
+    status_code: int = 400
+    message: str = "Bad Request"
+
+
+class Forbidden(AppException):
+    status_code: int = 403
+    message: str = "Forbidden"
+
+
 class NotFound(AppException):
     status_code: int = 404
     message: str = "Not Found"
@@ -32,3 +43,12 @@ class FileTooLarge(AppException):
 
     def __init__(self, max_size: str) -> None:
         super().__init__(message=self.message.format(max_size))
+
+
+class ServiceUnavailable(AppException):
+    status_code: int = 503
+    message: str = "Service Unavailable"
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__()
+        self.headers = {"Retry-After": str(retry_after)}
@@ -17,4 +17,5 @@ def init_exception_handler(app: FastAPI) -> None:
         return JSONResponse(
             status_code=exc.status_code,
             content=content,
+            headers=exc.headers,
         )
@@ -1,11 +1,28 @@
+from asyncio import Barrier, TaskGroup
 from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
 from typing import TypedDict
+from uuid import UUID
 
+import structlog
 from fastapi import FastAPI
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+)
 
+from app import db
+from app.database import (
+    async_engine,
+    background_engine,
+    replica_engine,
+)
 from app.settings import settings
+from app.utils.loop_monitor import LoopLagMonitor
+
+NIL_UUID = UUID(int=0)
 
 
 class State(TypedDict):
@@ -14,7 +31,71 @@ class State(TypedDict):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[State]:
-    async with AsyncClient(
-        base_url=settings.WEBHOOK_URL
-    ) as ac:
+    # エンジンと起動時に作っておく接続数
+    pools = [
+        (async_engine, settings.DB_POOL_SIZE),
+        (background_engine, settings.DB_BACKGROUND_POOL_SIZE),
+    ]
+    if replica_engine:
+        pools.append(
+            (replica_engine, settings.DB_REPLICA_POOL_SIZE)
+        )
+
+    if settings.DB_WARM_UP:
+        for engine, pool_size in pools:
+            await warm_up(engine, pool_size)
+
+    async with AsyncExitStack() as stack:
+        if settings.LOOP_LAG_INTERVAL:
+            monitor = LoopLagMonitor(
+                interval=settings.LOOP_LAG_INTERVAL,
+                threshold=settings.LOOP_LAG_THRESHOLD,
+                report_interval=settings.LOOP_LAG_REPORT_INTERVAL,
+            )
+            await stack.enter_async_context(monitor.start())
+        ac = await stack.enter_async_context(
+            AsyncClient(base_url=settings.WEBHOOK_URL)
+        )
         yield State(webhook_client=ac)
+
+    # バックグラウンド処理やWebhook送信はリクエストの一部として
+    # サーバーが完了を待っているため、ここでは接続を閉じるだけ
+    for engine, _ in pools:
+        await engine.dispose()
+
+
+async def warm_up(engine: AsyncEngine, pool_size: int) -> None:
+    if pool_size <= 0:
+        return
+
+    # 全員が接続を確保するまで返却しないことで
+    # pool_size分の接続を確実に作る
+    barrier = Barrier(pool_size)
+
+    async def connect() -> None:
+        async with engine.connect() as conn:
+            await barrier.wait()
+            await prime_statements(conn)
+
+    try:
+        async with TaskGroup() as tg:
+            for _ in range(pool_size):
+                tg.create_task(connect())
+    except* Exception as eg:
+        # 起動は止めず、最初のリクエストで接続させる
+        structlog.getLogger().warning(
+            "pool warm-up failed",
+            errors=[repr(e) for e in eg.exceptions],
+        )
+
+
+async def prime_statements(conn: AsyncConnection) -> None:
+    # よく使うクエリを一度実行し、SQLのコンパイル結果と
+    # 接続ごとのプリペアドステートメントをキャッシュさせる
+    async with AsyncSession(bind=conn) as session:
+        await session.scalars(
+            db.Todo.stmt_get_all(0, False).limit(1)
+        )
+        await db.Todo.get_by_id(session, NIL_UUID)
+        await db.SubTask.get_by_id(session, NIL_UUID, NIL_UUID)
+        await db.Operation.get_by_id(session, NIL_UUID)
@@ -6,6 +6,7 @@ from app.exceptions import init_exception_handler
 from app.lifespan import lifespan
 from app.log import init_log
 from app.middlewares import init_middlewares
+from app.openapi import init_openapi
 
 from .api import router as api_router
 
@@ -15,6 +16,7 @@ app.router.route_class = LoggingRoute
 init_log()
 init_exception_handler(app)
 init_middlewares(app)
+init_openapi(app)
 
 app.include_router(api_router, prefix="/api")
 
@@ -1,9 +1,25 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import random
+import secrets
 import time
+import tracemalloc
+import zlib
+from collections import deque
+from compression import zstd
+from contextlib import suppress
+from pathlib import Path
+from typing import Protocol
 from uuid import uuid4
 
 import structlog
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.requests import Request
 from starlette.types import (
     ASGIApp,
@@ -17,6 +33,8 @@ from structlog.contextvars import (
     clear_contextvars,
 )
 
+from app.settings import settings
+
 
 class ProcessTimeMiddleware:
     def __init__(self, app: ASGIApp) -> None:
@@ -48,18 +66,509 @@ class ProcessTimeMiddleware:
                 bind_contextvars(status_code=status_code)
             await send(message)
 
+        # 診断用APIでtracemallocが有効なときだけ計測する
+        # 並行するリクエストの確保分も含むプロセス全体の増減で
+        # このリクエストの使用量ではないので process_ を付ける
+        # ピークはプロセスで1つなのでリクエスト単位では扱わない
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_memory, _ = tracemalloc.get_traced_memory()
+
         # 次の処理を呼び出し、その処理時間を計測
         start_time = time.perf_counter()
         await self.app(scope, receive, send_wrapper)
         process_time = time.perf_counter() - start_time
 
+        if tracing and tracemalloc.is_tracing():
+            end_memory, _ = tracemalloc.get_traced_memory()
+            bind_contextvars(
+                process_memory_delta=end_memory - start_memory
+            )
+
         # ログを出力
         logger.info(
             "canonical-log-line", process_time=process_time
         )
 
 
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        target_latency: float = 0.0,
+        min_concurrency: int = 1,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(
+            min_concurrency, max_concurrency
+        )
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        # 処理時間に応じて上限を増減する
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    async def acquire(self) -> bool:
+        if (
+            self.in_flight < int(self.limit)
+            and not self._waiters
+        ):
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except TimeoutError:
+            self._abandon(waiter)
+            return False
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return True
+
+    def _abandon(self, waiter: asyncio.Future[None]) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # 枠を受け取った直後に諦めた場合は返却する
+            self.release()
+        else:
+            waiter.cancel()
+            # releaseが取り除いた後なら待ち行列にはもうない
+            with suppress(ValueError):
+                self._waiters.remove(waiter)
+
+    def release(self, latency: float | None = None) -> None:
+        self.in_flight -= 1
+        if latency is not None and self.target_latency:
+            self._adjust_limit(latency)
+
+        # 空いた枠は待っているリクエストに直接渡す
+        while self._waiters and self.in_flight < int(
+            self.limit
+        ):
+            waiter = self._waiters.popleft()
+            # キャンセル済みの待ちには枠を渡さない
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _adjust_limit(self, latency: float) -> None:
+        # AIMD: 遅ければ大きく下げ、速ければ少しずつ上げる
+        if latency > self.target_latency:
+            self.limit = max(
+                self.min_concurrency, self.limit * 0.9
+            )
+        else:
+            self.limit = min(
+                self.max_concurrency,
+                self.limit + 1 / self.limit,
+            )
+
+
+class AdmissionControlMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        retry_after: int,
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.retry_after = retry_after
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire():
+            # 待ち行列が一杯、または待ち時間を超えた
+            response = JSONResponse(
+                {"message": "Service Unavailable"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.controller.release(
+                    time.perf_counter() - start_time
+                )
+
+        async def send_wrapper(message: Message) -> None:
+            await send(message)
+            if message["type"] != "http.response.body":
+                return
+            # BackgroundTasksはレスポンスの送信後も続くため
+            # 送信し終えた時点で枠を返す
+            if not message.get("more_body", False):
+                release()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor:
+    def __init__(self) -> None:
+        self._c = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        # 届いた分はすぐに送れるようにflushする
+        return self._c.compress(data) + self._c.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class ZstdCompressor:
+    def __init__(self) -> None:
+        self._c = zstd.ZstdCompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(
+            data, mode=zstd.ZstdCompressor.FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._c.flush(zstd.ZstdCompressor.FLUSH_FRAME)
+
+
+# 同じ優先度ならこの順で選ぶ
+COMPRESSORS: dict[str, type[Compressor]] = {
+    "zstd": ZstdCompressor,
+    "gzip": GzipCompressor,
+}
+
+
+def select_encoding(accept_encoding: str) -> str | None:
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    default = qualities.get("*", 0.0)
+    quality, encoding = max(
+        (qualities.get(encoding, default), encoding)
+        for encoding in reversed(COMPRESSORS)
+    )
+    return encoding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        offload_size: int,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = select_encoding(
+            Headers(scope=scope).get("accept-encoding", "")
+        )
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        compressor: Compressor | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, compressor
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers:
+                    # 圧縮済みのレスポンスには何もしない
+                    await send(message)
+                else:
+                    # 最初のボディを見てから圧縮するか決める
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if start_message is None:
+                # 送信済み (圧縮しない) のレスポンス
+                await send(message)
+                return
+
+            body: bytes = message.get("body", b"")
+            more_body: bool = message.get("more_body", False)
+
+            if compressor is None:
+                if (
+                    not more_body
+                    and len(body) < self.minimum_size
+                ):
+                    # 小さいレスポンスは圧縮しても得をしない
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                compressor = COMPRESSORS[encoding]()
+                headers = MutableHeaders(
+                    raw=start_message["headers"]
+                )
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                if not more_body:
+                    compressed = await self._compress(
+                        compressor, body, finish=True
+                    )
+                    headers["Content-Length"] = str(
+                        len(compressed)
+                    )
+                    await send(start_message)
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": compressed,
+                        }
+                    )
+                    return
+                await send(start_message)
+
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": await self._compress(
+                        compressor, body, finish=not more_body
+                    ),
+                    "more_body": more_body,
+                }
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _compress(
+        self, compressor: Compressor, data: bytes, finish: bool
+    ) -> bytes:
+        def run() -> bytes:
+            compressed = compressor.compress(data)
+            if finish:
+                compressed += compressor.finish()
+            return compressed
+
+        if len(data) >= self.offload_size:
+            # イベントループを止めないよう別スレッドで圧縮する
+            return await run_in_threadpool(run)
+        return run()
+
+
+# 本来のレスポンスを捨てても副作用のないメソッド
+PROFILE_RESPONSE_METHODS = frozenset({"GET", "HEAD"})
+
+
+class ProfilerMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        header: str,
+        sample_rate: float,
+        output_dir: str | None,
+        token: str | None = None,
+        token_header: str = "X-Profile-Token",
+    ) -> None:
+        self.app = app
+        self.header = header
+        self.token = token
+        self.token_header = token_header
+        self.sample_rate = sample_rate
+        self.output_dir = (
+            Path(output_dir) if output_dir else None
+        )
+        # cProfileは同時に1つしか有効にできない
+        self._busy = False
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._get_mode(Headers(scope=scope))
+        if mode is None and not (
+            self.output_dir
+            and random.random() < self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        respond = mode is not None and (
+            mode == "response" or not self.output_dir
+        )
+        if (
+            respond
+            and scope["method"] not in PROFILE_RESPONSE_METHODS
+        ):
+            # 捨てると書き込みの結果が返らないので、保存先が
+            # あればファイルに残し、なければ計測しない
+            if not self.output_dir:
+                await self.app(scope, receive, send)
+                return
+            respond = False
+
+        # 同じイベントループで並行して動く他のリクエストの
+        # 処理も含まれるため、負荷の低い環境で使うこと
+        self._busy = True
+        profiler = cProfile.Profile()
+        try:
+            if respond or not self.output_dir:
+                await self._respond(
+                    scope, receive, send, profiler
+                )
+            else:
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    profiler.disable()
+                await run_in_threadpool(
+                    self._dump,
+                    profiler,
+                    scope,
+                    self.output_dir,
+                )
+        finally:
+            self._busy = False
+
+    def _get_mode(self, headers: Headers) -> str | None:
+        mode = headers.get(self.header)
+        # トークン未設定ならヘッダーでの計測は常に拒否する
+        if (
+            mode is None
+            or not self.token
+            or not secrets.compare_digest(
+                headers.get(self.token_header, "").encode(),
+                self.token.encode(),
+            )
+        ):
+            return None
+        return mode
+
+    async def _respond(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        profiler: cProfile.Profile,
+    ) -> None:
+        async def discard(message: Message) -> None:
+            # 本来のレスポンスの代わりにプロファイルを返す
+            pass
+
+        profiler.enable()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.disable()
+
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats(
+            pstats.SortKey.CUMULATIVE
+        ).print_stats(50)
+        response = PlainTextResponse(out.getvalue())
+        await response(scope, receive, send)
+
+    @staticmethod
+    def _dump(
+        profiler: cProfile.Profile,
+        scope: Scope,
+        output_dir: Path,
+    ) -> None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = scope["path"].strip("/").replace("/", "_")
+        name = (
+            f"{time.time_ns()}-{scope['method']}-{path}.prof"
+        )
+        # snakeviz などで開ける pstats 形式で保存する
+        profiler.dump_stats(output_dir / name)
+        structlog.get_logger().info(
+            "profile saved", profile=str(output_dir / name)
+        )
+
+
 def init_middlewares(app: FastAPI) -> None:
+    if settings.PROFILER_ENABLED:
+        # アプリの処理だけを計測するよう最も内側に置く
+        app.add_middleware(
+            ProfilerMiddleware,
+            header=settings.PROFILER_HEADER,
+            sample_rate=settings.PROFILER_SAMPLE_RATE,
+            output_dir=settings.PROFILER_OUTPUT_DIR,
+            token=settings.PROFILER_TOKEN,
+            token_header=settings.PROFILER_TOKEN_HEADER,
+        )
+    if settings.COMPRESSION_MINIMUM_SIZE:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            offload_size=settings.COMPRESSION_OFFLOAD_SIZE,
+        )
+    if settings.ADMISSION_MAX_CONCURRENCY:
+        # 503のレスポンスにもCORSのヘッダーを付けるよう
+        # CORSMiddlewareの内側に置く
+        app.add_middleware(
+            AdmissionControlMiddleware,
+            controller=AdmissionController(
+                max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+                max_queue=settings.ADMISSION_MAX_QUEUE,
+                queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+                target_latency=settings.ADMISSION_TARGET_LATENCY,
+            ),
+            retry_after=settings.ADMISSION_RETRY_AFTER,
+        )
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[
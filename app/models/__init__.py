@@ -1,16 +1,38 @@
-from .base import BaseModel
-from .enums import OperationStatus, OperationType, Status
+from .base import BaseModel, UTCDatetime
+from .enums import (
+    OperationStatus,
+    OperationType,
+    Status,
+    TodoSort,
+)
 from .operation import Operation
-from .subtask import SubTask
-from .todo import Todo, TodoWithSubTasks
+from .subtask import (
+    BatchSubTaskResult,
+    BatchSubTasksResult,
+    SubTask,
+)
+from .todo import (
+    BatchTodoResult,
+    BatchTodosResult,
+    PartialTodo,
+    Todo,
+    TodoWithSubTasks,
+)
 
 __all__ = [
     "BaseModel",
+    "BatchSubTaskResult",
+    "BatchSubTasksResult",
+    "BatchTodoResult",
+    "BatchTodosResult",
     "Operation",
     "OperationStatus",
     "OperationType",
+    "PartialTodo",
     "Status",
     "SubTask",
     "Todo",
+    "TodoSort",
     "TodoWithSubTasks",
+    "UTCDatetime",
 ]
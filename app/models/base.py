@@ -6,7 +6,15 @@ from pydantic import BeforeValidator, ConfigDict
 
 from app.utils.datetime import to_utc
 
-UTCDatetime = Annotated[datetime, BeforeValidator(to_utc)]
+
+def _to_utc(value: object) -> object:
+    # datetime以外 (Noneなど) はdatetimeの検証に任せる
+    if isinstance(value, datetime):
+        return to_utc(value)
+    return value
+
+
+UTCDatetime = Annotated[datetime, BeforeValidator(_to_utc)]
 
 
 class BaseModel(_BaseModel):
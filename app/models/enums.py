@@ -7,6 +7,28 @@ class Status(StrEnum):
     COMPLETED = "COMPLETED"
 
 
+class TodoSort(StrEnum):
+    # "-" が付くものは降順
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    UPDATED_AT = "updated_at"
+    UPDATED_AT_DESC = "-updated_at"
+    TITLE = "title"
+    TITLE_DESC = "-title"
+    STATUS = "status"
+    STATUS_DESC = "-status"
+    SUBTASK_COUNT = "subtask_count"
+    SUBTASK_COUNT_DESC = "-subtask_count"
+
+    @property
+    def field(self) -> str:
+        return self.removeprefix("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.startswith("-")
+
+
 class OperationType(IntEnum):
     IMPORT_TODOS = 1
 
@@ -12,3 +12,18 @@ class SubTask(BaseModel):
     status: Status
     todo_id: UUID
     updated_at: UTCDatetime
+
+
+class BatchSubTaskResult(BaseModel):
+    todo_id: UUID
+    # 作成できなかった場合はNone
+    subtask_id: UUID | None
+    # 対象が存在しなければ404
+    status_code: int
+    subtask: SubTask | None = None
+
+
+class BatchSubTasksResult(BaseModel):
+    create: list[BatchSubTaskResult]
+    update: list[BatchSubTaskResult]
+    delete: list[BatchSubTaskResult]
@@ -17,3 +17,27 @@ class Todo(BaseModel):
 
 class TodoWithSubTasks(Todo):
     subtasks: list[SubTask]
+
+
+class PartialTodo(BaseModel):
+    # fields= で指定された項目だけをセットする
+    # 未指定の項目はexclude_unsetで出力しない
+    todo_id: UUID
+    title: str | None = None
+    status: Status | None = None
+    updated_at: UTCDatetime | None = None
+    subtask_count: int | None = None
+    subtasks: list[SubTask] | None = None
+
+
+class BatchTodoResult(BaseModel):
+    todo_id: UUID
+    # 個別のAPIを呼んだ場合と同じステータスコード
+    status_code: int
+    todo: Todo | None = None
+
+
+class BatchTodosResult(BaseModel):
+    create: list[BatchTodoResult]
+    update: list[BatchTodoResult]
+    delete: list[BatchTodoResult]
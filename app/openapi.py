@@ -0,0 +1,38 @@
+import json
+import sys
+from importlib import import_module
+from pathlib import Path
+from typing import Any
+
+from fastapi import FastAPI
+
+from app.settings import settings
+
+
+def init_openapi(app: FastAPI) -> None:
+    generate = app.openapi
+
+    def openapi() -> dict[str, Any]:
+        if app.openapi_schema:
+            return app.openapi_schema
+
+        # ビルド時に出力したスキーマがあればそれを使う
+        path = settings.OPENAPI_SCHEMA_PATH
+        if path and Path(path).is_file():
+            app.openapi_schema = json.loads(
+                Path(path).read_text()
+            )
+            return app.openapi_schema
+
+        return generate()
+
+    app.openapi = openapi  # type: ignore[method-assign]
+
+
+if __name__ == "__main__":
+    # python -m app.openapi openapi.json
+    # app.main からも import されるため実行時に読み込む
+    main_app: FastAPI = import_module("app.main").app
+    Path(sys.argv[1]).write_text(
+        json.dumps(main_app.openapi())
+    )
@@ -1,17 +1,21 @@
+import base64
 from typing import (
     Annotated,
+    Awaitable,
     Callable,
     Self,
     TypeVar,
 )
 
 from fastapi import Depends, Query
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.sql import Select
 
+from app.exceptions import BadRequest
+
 
 class LimitOffset(BaseModel):
     limit: int = Field(ge=0, description="0なら最後まで取得")
@@ -33,6 +37,56 @@ LimitOffsetQuery = Annotated[
     LimitOffset, Depends(_get_limit_offset)
 ]
 
+MAX_CURSOR_LIMIT = 1000
+
+
+class LimitCursor(BaseModel):
+    limit: int = Field(ge=1, le=MAX_CURSOR_LIMIT)
+    cursor: str | None = Field(
+        description="前のページのnext_cursor"
+    )
+
+
+async def _get_limit_cursor(
+    limit: Annotated[
+        int,
+        Query(
+            ge=1, le=MAX_CURSOR_LIMIT, description="取得件数"
+        ),
+    ] = 100,
+    cursor: Annotated[
+        str | None,
+        Query(description="前のページのnext_cursor"),
+    ] = None,
+) -> LimitCursor:
+    return LimitCursor(limit=limit, cursor=cursor)
+
+
+LimitCursorQuery = Annotated[
+    LimitCursor, Depends(_get_limit_cursor)
+]
+
+
+def encode_cursor[K](adapter: TypeAdapter[K], key: K) -> str:
+    # 並び順のキーをクライアントには不透明な文字列にする
+    return base64.urlsafe_b64encode(
+        adapter.dump_json(key)
+    ).decode()
+
+
+def decode_cursor[K](
+    adapter: TypeAdapter[K], cursor: str
+) -> K:
+    try:
+        return adapter.validate_json(
+            base64.urlsafe_b64decode(cursor)
+        )
+    except ValueError as e:
+        raise BadRequest(
+            {"cursor": cursor}, message="Invalid cursor"
+        ) from e
+
+
 U = TypeVar("U", bound=DeclarativeBase)
 
 
@@ -55,6 +109,10 @@ class Pager[T: BaseModel](BaseModel):
     next: int | None = Field(
         description="次のlimit件を取得する場合のoffset"
     )
+    next_cursor: str | None = Field(
+        default=None,
+        description="次のlimit件を取得する場合のcursor",
+    )
 
     @classmethod
     async def paginate(
@@ -63,18 +121,40 @@ class Pager[T: BaseModel](BaseModel):
         query: Select[tuple[U]],
         limit_offset: LimitOffset,
         transformer: Callable[[list[U]], list[T]],
+        loader: (
+            Callable[[AsyncSession, list[U]], Awaitable[None]]
+            | None
+        ) = None,
+        seek: Select[tuple[U]] | None = None,
+        cursor: Callable[[U], str] | None = None,
     ) -> Self:
-        items, paging = await _paginate(
-            session,
-            query,
-            offset=limit_offset.offset,
-            limit=limit_offset.limit,
-        )
+        # seekはqueryをカーソルの位置から読むSQL文
+        # cursorは最後の1件から次のページのカーソルを作る
+        if seek is None:
+            items, paging = await _paginate(
+                session,
+                query,
+                offset=limit_offset.offset,
+                limit=limit_offset.limit,
+            )
+            has_next = paging.next is not None
+        else:
+            items, paging, has_next = await _seek(
+                session, query, seek, limit=limit_offset.limit
+            )
+        if loader:
+            # 取得したページの分だけ追加で読み込む
+            await loader(session, items)
         return cls(
             items=transformer(items),
             count=paging.count,
             previous=paging.previous,
             next=paging.next,
+            next_cursor=(
+                cursor(items[-1])
+                if cursor and has_next and items
+                else None
+            ),
         )
 
 
@@ -109,6 +189,27 @@ async def _paginate(
     )
 
 
+async def _seek(
+    session: AsyncSession,
+    query: Select[tuple[U]],
+    seek: Select[tuple[U]],
+    limit: int,
+) -> tuple[list[U], _PagingInfo, bool]:
+    # offsetは使わないのでprevious/nextも返さない
+    # 1件多く取得して次のページがあるか判定する
+    items = await _fetch_items(
+        session, seek, 0, limit + 1 if limit else 0
+    )
+    has_next = bool(limit) and len(items) > limit
+    # 総レコード数はカーソルの位置によらない
+    count = await _get_count(session, query)
+    return (
+        items[:limit] if has_next else items,
+        _PagingInfo(count=count),
+        has_next,
+    )
+
+
 async def _fetch_items(
     session: AsyncSession,
     query: Select[tuple[U]],
@@ -129,7 +230,11 @@ async def _get_count(
     session: AsyncSession,
     query: Select[tuple[U]],
 ) -> int:
-    sub = query.order_by(None).subquery()
-    stmt = select(func.count()).select_from(sub)
+    stmt = stmt_count(query)
     count = (await session.scalars(stmt)).one()
     return count
+
+
+def stmt_count(query: Select[tuple[U]]) -> Select[tuple[int]]:
+    sub = query.order_by(None).subquery()
+    return select(func.count()).select_from(sub)
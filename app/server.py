@@ -0,0 +1,95 @@
+import os
+
+import uvicorn
+
+from app.settings import settings
+
+
+def get_workers() -> int:
+    if settings.WORKERS:
+        return settings.WORKERS
+    return os.process_cpu_count() or 1
+
+
+def _split_connections(
+    name: str,
+    max_connections: int,
+    workers: int,
+    reserved: int,
+) -> int:
+    # 全ワーカーの合計が上限を超えないように均等に割り当てる
+    pool_size = max_connections // workers - reserved
+    if pool_size < 1:
+        raise ValueError(
+            f"{name}={max_connections}"
+            f" is too small for {workers} workers"
+        )
+    return pool_size
+
+
+def get_pool_size(workers: int) -> tuple[int, int]:
+    if not settings.DB_MAX_CONNECTIONS:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+
+    # バックグラウンド用のプールは同じサーバーにつなぐので
+    # 別枠で確保する
+    pool_size = _split_connections(
+        "DB_MAX_CONNECTIONS",
+        settings.DB_MAX_CONNECTIONS,
+        workers,
+        settings.DB_BACKGROUND_POOL_SIZE
+        + settings.DB_BACKGROUND_MAX_OVERFLOW,
+    )
+    return pool_size, 0
+
+
+def get_replica_pool_size(workers: int) -> tuple[int, int]:
+    if not settings.DB_REPLICA_MAX_CONNECTIONS:
+        return (
+            settings.DB_REPLICA_POOL_SIZE,
+            settings.DB_REPLICA_MAX_OVERFLOW,
+        )
+
+    pool_size = _split_connections(
+        "DB_REPLICA_MAX_CONNECTIONS",
+        settings.DB_REPLICA_MAX_CONNECTIONS,
+        workers,
+        0,
+    )
+    return pool_size, 0
+
+
+def main() -> None:
+    workers = get_workers()
+    pool_size, max_overflow = get_pool_size(workers)
+    replica_pool_size, replica_max_overflow = (
+        get_replica_pool_size(workers)
+    )
+
+    # ワーカーは別プロセスで起動し直すため環境変数で渡す
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+    os.environ["DB_REPLICA_POOL_SIZE"] = str(replica_pool_size)
+    os.environ["DB_REPLICA_MAX_OVERFLOW"] = str(
+        replica_max_overflow
+    )
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        # 停止時は新規の受付をやめ、処理中のリクエストを待つ
+        timeout_graceful_shutdown=(
+            settings.GRACEFUL_SHUTDOWN_TIMEOUT
+        ),
+        # アクセスログは canonical-log-line で出力している
+        access_log=False,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,75 @@ class Settings(BaseSettings):
     APP_TITLE: str = "todo-api"
     LOG_LEVEL: str = "INFO"
     DB_URI: str
+    # ワーカープロセスごとのコネクションプール
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # 接続の空きを待つ秒数。超えたら503を返す
+    DB_POOL_TIMEOUT: float = 10.0
+    # バックグラウンド処理専用のコネクションプール
+    DB_BACKGROUND_POOL_SIZE: int = 2
+    DB_BACKGROUND_MAX_OVERFLOW: int = 0
+    DB_BACKGROUND_POOL_TIMEOUT: float = 60.0
+    # 起動時にDB_POOL_SIZE分の接続を作っておく
+    DB_WARM_UP: bool = True
+    # 読み取り専用のレプリカ。未設定ならプライマリのみを使う
+    DB_REPLICA_URI: str | None = None
+    # ワーカープロセスごとのレプリカのコネクションプール
+    DB_REPLICA_POOL_SIZE: int = 5
+    DB_REPLICA_MAX_OVERFLOW: int = 10
+    # レプリカで接続エラーが起きた後、プライマリへ迂回する秒数
+    DB_REPLICA_RETRY_INTERVAL: float = 30.0
+    # 書き込み後にプライマリから読み取る秒数。0なら無効
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
     USE_CONSOLE_LOG: bool = False
     WEBHOOK_URL: str = "https://api.rhoboro.com/echo/webhook"
+    # 同時に処理するリクエスト数の上限。0なら無制限
+    ADMISSION_MAX_CONCURRENCY: int = 64
+    # 上限を超えたリクエストを待たせる数と秒数
+    ADMISSION_MAX_QUEUE: int = 128
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    # 処理時間がこれを超えたら上限を下げる。0なら上限は固定
+    ADMISSION_TARGET_LATENCY: float = 0.0
+    ADMISSION_RETRY_AFTER: int = 1
+    # これ以上のサイズのレスポンスを圧縮する。0なら圧縮しない
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    # これ以上のサイズは別スレッドで圧縮する
+    COMPRESSION_OFFLOAD_SIZE: int = 1024 * 1024
+    # python -m app.openapi で出力したOpenAPIスキーマ
+    OPENAPI_SCHEMA_PATH: str | None = None
+    # リクエスト単位のプロファイラ。無効なら追加しない
+    PROFILER_ENABLED: bool = False
+    # このヘッダーがあるリクエストを計測する
+    # 値が "response" ならレスポンスの代わりに結果を返す
+    PROFILER_HEADER: str = "X-Profile"
+    # ヘッダーでの計測に必要なトークン。未設定なら無視する
+    PROFILER_TOKEN: str | None = None
+    PROFILER_TOKEN_HEADER: str = "X-Profile-Token"
+    # ヘッダーがなくても計測する割合。保存先が必要
+    PROFILER_SAMPLE_RATE: float = 0.0
+    # 計測結果 (.prof) の保存先。未設定ならレスポンスで返す
+    PROFILER_OUTPUT_DIR: str | None = None
+    # イベントループの遅延を計測する間隔。0なら無効
+    LOOP_LAG_INTERVAL: float = 0.1
+    # これ以上ループが止まったらスタックをログに出す
+    LOOP_LAG_THRESHOLD: float = 0.1
+    # 遅延の集計をログに出す間隔
+    LOOP_LAG_REPORT_INTERVAL: float = 60.0
+    # 診断用API (/api/diagnostics) のトークン。未設定なら無効
+    DIAGNOSTICS_TOKEN: str | None = None
+
+    # 本番サーバー (app.server) の設定
+    HOST: str = "0.0.0.0"
+    PORT: int = 8080
+    # 0ならCPU数から決める
+    WORKERS: int = 0
+    # 全ワーカー合計のDB接続数の上限。0なら無制限
+    # バックグラウンド用のプールも含む
+    DB_MAX_CONNECTIONS: int = 0
+    # レプリカは別のサーバーなので上限も別に持つ
+    DB_REPLICA_MAX_CONNECTIONS: int = 0
+    # シャットダウン時に処理中のリクエストを待つ秒数
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
 
 
 settings = Settings()  # type: ignore
@@ -0,0 +1,127 @@
+import tracemalloc
+from collections.abc import Iterator
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+TOKEN = {"X-Diagnostics-Token": "secret"}
+
+
+@pytest.fixture(autouse=True)
+def diagnostics_token(mocker: MockerFixture) -> Iterator[None]:
+    mocker.patch(
+        "app.api.diagnostics.views.settings.DIAGNOSTICS_TOKEN",
+        "secret",
+    )
+    yield
+    tracemalloc.stop()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    ("token", "headers"),
+    [
+        (None, TOKEN),
+        ("secret", {}),
+        ("secret", {"X-Diagnostics-Token": "wrong"}),
+    ],
+)
+async def test_forbidden(
+    ac: AsyncClient,
+    mocker: MockerFixture,
+    token: str | None,
+    headers: dict[str, str],
+) -> None:
+    mocker.patch(
+        "app.api.diagnostics.views.settings.DIAGNOSTICS_TOKEN",
+        token,
+    )
+    response = await ac.get(
+        "/api/diagnostics/tracemalloc", headers=headers
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_tracemalloc(ac: AsyncClient) -> None:
+    response = await ac.post(
+        "/api/diagnostics/tracemalloc/start",
+        params={"frames": 5},
+        headers=TOKEN,
+    )
+    assert response.status_code == 200
+    assert response.json()["tracing"] is True
+    assert response.json()["traceback_limit"] == 5
+
+    response = await ac.post(
+        "/api/diagnostics/tracemalloc/snapshots", headers=TOKEN
+    )
+    assert response.status_code == 200
+    base_id = response.json()["snapshot_id"]
+
+    # 差分に現れるように確保しておく
+    allocated = [bytearray(1024) for _ in range(100)]
+
+    response = await ac.post(
+        "/api/diagnostics/tracemalloc/snapshots",
+        params={"limit": 5},
+        headers=TOKEN,
+    )
+    snapshot_id = response.json()["snapshot_id"]
+    assert len(response.json()["top"]) <= 5
+
+    response = await ac.get(
+        f"/api/diagnostics/tracemalloc/snapshots/{snapshot_id}",
+        params={"key_type": "filename"},
+        headers=TOKEN,
+    )
+    assert response.status_code == 200
+    assert response.json()["top"]
+
+    response = await ac.get(
+        "/api/diagnostics/tracemalloc/snapshots/"
+        f"{snapshot_id}/diff/{base_id}",
+        headers=TOKEN,
+    )
+    assert response.status_code == 200
+    assert any(
+        __file__ in frame
+        for stat in response.json()["top"]
+        for frame in stat["traceback"]
+        if stat["size_diff"] > 0
+    )
+    del allocated
+
+    response = await ac.get(
+        "/api/diagnostics/tracemalloc", headers=TOKEN
+    )
+    assert response.json()["snapshots"] == [
+        base_id,
+        snapshot_id,
+    ]
+
+    response = await ac.post(
+        "/api/diagnostics/tracemalloc/stop", headers=TOKEN
+    )
+    assert response.json()["tracing"] is False
+    assert response.json()["snapshots"] == []
+
+
+@pytest.mark.anyio
+async def test_snapshot_not_started(ac: AsyncClient) -> None:
+    response = await ac.post(
+        "/api/diagnostics/tracemalloc/snapshots", headers=TOKEN
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_snapshot_not_found(ac: AsyncClient) -> None:
+    snapshot_id = UUID("00000000-0000-0000-0000-000000000000")
+    response = await ac.get(
+        f"/api/diagnostics/tracemalloc/snapshots/{snapshot_id}",
+        headers=TOKEN,
+    )
+    assert response.status_code == 404
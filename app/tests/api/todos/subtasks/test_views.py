@@ -0,0 +1,330 @@
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from app import db
+from app.database import AsyncSession
+
+TODO1 = "fa4fa0f5-2847-475f-ba67-76f4d8fa8a00"
+TODO2 = "63efd7b7-b825-4b8d-b60a-728bb94dd90b"
+SUBTASK1 = "3ae37426-2028-483c-b54d-079c4d9fc2a6"
+SUBTASK2 = "093404d4-d5ac-4a05-b6b2-092a255273a4"
+SUBTASK3 = "6bd784d7-9f84-412e-887d-dc1d95e64049"
+MISSING = "00000000-0000-0000-0000-000000000000"
+NEW_SUBTASK = "ccc92566-d062-4a43-83a2-bbb05962a49e"
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_batch_subtasks(
+    ac: AsyncClient,
+    test_session: AsyncSession,
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "app.db.subtask.uuid4", lambda: UUID(NEW_SUBTASK)
+    )
+    response = await ac.post(
+        f"/api/todos/{TODO2}/subtasks/batch",
+        json={
+            "create": [{"title": "new subtask"}],
+            "update": [
+                {
+                    "subtask_id": SUBTASK2,
+                    "title": "updated",
+                    "status": "COMPLETED",
+                },
+                {
+                    # 別のTodoのSubTaskは更新しない
+                    "subtask_id": SUBTASK1,
+                    "title": "updated",
+                    "status": "COMPLETED",
+                },
+            ],
+            "delete": [SUBTASK3, MISSING],
+        },
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    assert [r["status_code"] for r in actual["create"]] == [
+        201
+    ]
+    assert actual["create"][0]["subtask"]["title"] == (
+        "new subtask"
+    )
+    assert [r["status_code"] for r in actual["update"]] == [
+        200,
+        404,
+    ]
+    assert actual["update"][0]["subtask"]["status"] == (
+        "COMPLETED"
+    )
+    assert [r["status_code"] for r in actual["delete"]] == [
+        204,
+        404,
+    ]
+
+    async with test_session() as session:
+        subtasks = await db.SubTask.get_all_by_todo(
+            session, UUID(TODO2)
+        )
+        assert subtasks is not None
+        titles = sorted([st.title for st in subtasks])
+        assert titles == ["new subtask", "updated"]
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_batch_subtasks_todo_not_found(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.post(
+        f"/api/todos/{MISSING}/subtasks/batch",
+        json={"create": [{"title": "new subtask"}]},
+    )
+    assert response.status_code == 404
+    assert response.json() == {
+        "details": {"Todo": MISSING},
+        "message": "Not Found",
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_batch_todos_subtasks(
+    ac: AsyncClient,
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "app.db.subtask.uuid4", lambda: UUID(NEW_SUBTASK)
+    )
+    response = await ac.post(
+        "/api/todos/subtasks/batch",
+        json={
+            "create": [
+                {"todo_id": TODO1, "title": "new subtask"},
+                {"todo_id": MISSING, "title": "new subtask"},
+            ],
+            "update": [
+                {
+                    "todo_id": TODO1,
+                    "subtask_id": SUBTASK1,
+                    "title": "updated",
+                    "status": "IN_PROGRESS",
+                }
+            ],
+            "delete": [
+                {"todo_id": TODO2, "subtask_id": SUBTASK2},
+                # todo_idとsubtask_idの組が一致しない
+                {"todo_id": TODO1, "subtask_id": SUBTASK3},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    assert actual["create"][0]["subtask_id"] == NEW_SUBTASK
+    assert actual["create"][1] == {
+        "todo_id": MISSING,
+        "subtask_id": None,
+        "status_code": 404,
+        "subtask": None,
+    }
+    assert actual["update"][0]["status_code"] == 200
+    assert actual["update"][0]["subtask"]["title"] == "updated"
+    assert [r["status_code"] for r in actual["delete"]] == [
+        204,
+        404,
+    ]
+
+
+@pytest.mark.anyio
+async def test_batch_todos_subtasks_duplicated(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.post(
+        "/api/todos/subtasks/batch",
+        json={
+            "delete": [
+                {"todo_id": TODO1, "subtask_id": SUBTASK1},
+                {"todo_id": TODO1, "subtask_id": SUBTASK1},
+            ],
+        },
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_subtasks(ac: AsyncClient) -> None:
+    response = await ac.get(f"/api/todos/{TODO2}/subtasks")
+    assert response.status_code == 200
+    assert sorted(
+        st["subtask_id"] for st in response.json()["subtasks"]
+    ) == sorted([SUBTASK2, SUBTASK3])
+
+    response = await ac.get(f"/api/todos/{MISSING}/subtasks")
+    assert response.status_code == 404
+    assert response.json()["details"] == {"Todo": MISSING}
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_subtasks_empty(
+    ac: AsyncClient, test_session: AsyncSession
+) -> None:
+    async with test_session.begin() as session:
+        await db.SubTask.delete(
+            session, UUID(TODO1), UUID(SUBTASK1)
+        )
+    # SubTaskが無くてもTodoがあれば404にはならない
+    response = await ac.get(f"/api/todos/{TODO1}/subtasks")
+    assert response.status_code == 200
+    assert response.json() == {
+        "subtasks": [],
+        "next_cursor": None,
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+@pytest.mark.parametrize(
+    ("todo_id", "subtask_id", "expected"),
+    [
+        (TODO1, SUBTASK1, None),
+        (MISSING, SUBTASK1, {"Todo": MISSING}),
+        (TODO1, MISSING, {"SubTask": MISSING}),
+        # 別のTodoのSubTask
+        (TODO1, SUBTASK2, {"SubTask": SUBTASK2}),
+    ],
+)
+async def test_get_subtask(
+    ac: AsyncClient,
+    todo_id: str,
+    subtask_id: str,
+    expected: dict[str, str] | None,
+) -> None:
+    response = await ac.get(
+        f"/api/todos/{todo_id}/subtasks/{subtask_id}"
+    )
+    if expected is None:
+        assert response.status_code == 200
+        assert response.json()["subtask_id"] == subtask_id
+    else:
+        assert response.status_code == 404
+        assert response.json()["details"] == expected
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_create_subtask_todo_not_found(
+    ac: AsyncClient,
+) -> None:
+    # 外部キー制約違反を404にする
+    response = await ac.post(
+        f"/api/todos/{MISSING}/subtasks",
+        json={"title": "new subtask"},
+    )
+    assert response.status_code == 404
+    assert response.json() == {
+        "details": {"Todo": MISSING},
+        "message": "Not Found",
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+@pytest.mark.parametrize(
+    ("todo_id", "subtask_id", "expected"),
+    [
+        (TODO1, SUBTASK1, None),
+        (MISSING, SUBTASK1, {"Todo": MISSING}),
+        (TODO1, SUBTASK2, {"SubTask": SUBTASK2}),
+    ],
+)
+async def test_update_subtask(
+    ac: AsyncClient,
+    todo_id: str,
+    subtask_id: str,
+    expected: dict[str, str] | None,
+) -> None:
+    response = await ac.put(
+        f"/api/todos/{todo_id}/subtasks/{subtask_id}",
+        json={"title": "updated", "status": "COMPLETED"},
+    )
+    if expected is None:
+        assert response.status_code == 200
+        actual = response.json()
+        assert actual["title"] == "updated"
+        assert actual["updated_at"] == (
+            "2025-12-15T20:40:50.839088Z"
+        )
+    else:
+        assert response.status_code == 404
+        assert response.json()["details"] == expected
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+@pytest.mark.parametrize(
+    ("todo_id", "subtask_id", "status_code"),
+    [
+        (TODO1, SUBTASK1, 204),
+        (MISSING, SUBTASK1, 404),
+        # SubTaskが無い場合は今まで通り204
+        (TODO1, MISSING, 204),
+    ],
+)
+async def test_delete_subtask(
+    ac: AsyncClient,
+    todo_id: str,
+    subtask_id: str,
+    status_code: int,
+) -> None:
+    response = await ac.delete(
+        f"/api/todos/{todo_id}/subtasks/{subtask_id}"
+    )
+    assert response.status_code == status_code
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_subtasks_paging(ac: AsyncClient) -> None:
+    # created_atが同じならsubtask_id順
+    response = await ac.get(
+        f"/api/todos/{TODO2}/subtasks", params={"limit": 1}
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    assert [st["subtask_id"] for st in actual["subtasks"]] == [
+        SUBTASK2
+    ]
+    assert actual["next_cursor"]
+
+    response = await ac.get(
+        f"/api/todos/{TODO2}/subtasks",
+        params={"limit": 1, "cursor": actual["next_cursor"]},
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    assert [st["subtask_id"] for st in actual["subtasks"]] == [
+        SUBTASK3
+    ]
+    assert actual["next_cursor"] is None
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_subtasks_invalid_cursor(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        f"/api/todos/{TODO2}/subtasks",
+        params={"cursor": "invalid"},
+    )
+    assert response.status_code == 400
+    assert response.json() == {
+        "details": {"cursor": "invalid"},
+        "message": "Invalid cursor",
+    }
@@ -7,17 +7,19 @@ import pytest
 from fastapi import BackgroundTasks, UploadFile
 from httpx import AsyncClient
 from pytest_mock import MockerFixture
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 from app import db
 from app.api.todos.use_cases import (
     CreateTodo,
+    ExportTodos,
     GetTodo,
     ImportTodos,
 )
 from app.api.todos.webhook import WebhookClient
 from app.database import AsyncSession
 from app.exceptions import NotFound
-from app.models import Status, Todo
+from app.models import OperationStatus, Status, Todo
 from app.utils.datetime import utcnow
 
 
@@ -107,6 +109,7 @@ class TestImportTodos:
     ) -> None:
         use_case = ImportTodos(
             session=test_session,
+            background_session=test_session,
             background_tasks=BackgroundTasks(),
             webhook=WebhookClient(AsyncClient(), TaskGroup()),
         )
@@ -136,6 +139,7 @@ Todo 2,IN_PROGRESS
         mocker.patch("app.db.todo.BULK_SIZE_LIMIT", 2)
         use_case = ImportTodos(
             session=test_session,
+            background_session=test_session,
             background_tasks=BackgroundTasks(),
             webhook=WebhookClient(AsyncClient(), TaskGroup()),
         )
@@ -185,3 +189,103 @@ Todo 3,COMPLETED
         # Todo 3
         assert new_todos[2].title == "Todo 3"
         assert new_todos[2].status == Status.COMPLETED
+
+    async def test_import_operation_pool_timeout(
+        self,
+        test_session: AsyncSession,
+        mocker: MockerFixture,
+    ) -> None:
+        # バックグラウンド用のプールが枯渇している
+        background_session = mocker.MagicMock()
+        background_session.begin.side_effect = (
+            PoolTimeoutError()
+        )
+        background_tasks = BackgroundTasks()
+        use_case = ImportTodos(
+            session=test_session,
+            background_session=background_session,
+            background_tasks=background_tasks,
+            webhook=mocker.AsyncMock(),
+        )
+        operation_id = await use_case.execute(
+            UploadFile(io.BytesIO(b"title,status\n"))
+        )
+        await background_tasks()
+
+        # PENDINGのまま残らずERRORになる
+        async with test_session() as session:
+            op = await db.Operation.get_by_id(
+                session, operation_id=operation_id
+            )
+        assert op
+        assert op.status == OperationStatus.ERROR
+
+
+# 作成日時が同じTodoはtodo_idの順に並ぶ
+EXPORTED_CSV = (
+    "title,status,subtask_title,subtask_status\r\n"
+    "Todo 2,IN_PROGRESS,,\r\n"
+    ",,SubTask 2,IN_PROGRESS\r\n"
+    ",,SubTask 3,IN_PROGRESS\r\n"
+    "Todo 3,COMPLETED,,\r\n"
+    ",,SubTask 4,COMPLETED\r\n"
+    "Todo 1,NEW,,\r\n"
+    ",,SubTask 1,NEW\r\n"
+)
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+class TestExportTodos:
+    async def test_execute(
+        self, test_session: AsyncSession
+    ) -> None:
+        use_case = ExportTodos(session=test_session)
+        chunks = [chunk async for chunk in use_case.execute()]
+        assert "".join(chunks) == EXPORTED_CSV
+
+    async def test_execute_chunk(
+        self,
+        test_session: AsyncSession,
+        mocker: MockerFixture,
+    ) -> None:
+        mocker.patch.object(ExportTodos, "CHUNK_SIZE", 2)
+        use_case = ExportTodos(session=test_session)
+        chunks = [chunk async for chunk in use_case.execute()]
+        # 結合した4行を2行ずつ書き出す
+        assert len(chunks) == 2
+        assert "".join(chunks) == EXPORTED_CSV
+
+    async def test_import_exported(
+        self, test_session: AsyncSession
+    ) -> None:
+        export = ExportTodos(session=test_session)
+        exported = "".join(
+            [chunk async for chunk in export.execute()]
+        )
+        use_case = ImportTodos(
+            session=test_session,
+            background_session=test_session,
+            background_tasks=BackgroundTasks(),
+            webhook=WebhookClient(AsyncClient(), TaskGroup()),
+        )
+        new_todos, new_subtasks = await use_case.import_todos(
+            UploadFile(io.BytesIO(exported.encode("utf-8")))
+        )
+        # エクスポートした内容をそのまま読み込める
+        assert [
+            (todo.title, todo.status) for todo in new_todos
+        ] == [
+            ("Todo 2", Status.IN_PROGRESS),
+            ("Todo 3", Status.COMPLETED),
+            ("Todo 1", Status.NEW),
+        ]
+        assert [
+            (subtask.title, subtask.status)
+            for subtask in new_subtasks
+        ] == [
+            ("SubTask 2", Status.IN_PROGRESS),
+            ("SubTask 3", Status.IN_PROGRESS),
+            ("SubTask 4", Status.COMPLETED),
+            ("SubTask 1", Status.NEW),
+        ]
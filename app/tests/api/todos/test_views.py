@@ -3,6 +3,7 @@ from uuid import UUID
 import pytest
 from httpx import AsyncClient
 from pytest_mock import MockerFixture
+from sqlalchemy import update
 
 from app import db
 from app.database import AsyncSession
@@ -21,6 +22,7 @@ async def test_list_todos(
         "count": 3,
         "next": None,
         "previous": None,
+        "next_cursor": None,
         "todos": [
             {
                 "status": "NEW",
@@ -29,13 +31,6 @@ async def test_list_todos(
                 "updated_at": "2025-12-14T10:20:30.839088Z",
                 "subtask_count": 1,
             },
-            {
-                "status": "IN_PROGRESS",
-                "title": "Todo 2",
-                "todo_id": "63efd7b7-b825-4b8d-b60a-728bb94dd90b",  # noqa: E501
-                "updated_at": "2025-12-14T10:20:30.839088Z",
-                "subtask_count": 2,
-            },
             {
                 "status": "COMPLETED",
                 "title": "Todo 3",
@@ -43,6 +38,13 @@ async def test_list_todos(
                 "updated_at": "2025-12-14T10:20:30.839088Z",
                 "subtask_count": 1,
             },
+            {
+                "status": "IN_PROGRESS",
+                "title": "Todo 2",
+                "todo_id": "63efd7b7-b825-4b8d-b60a-728bb94dd90b",  # noqa: E501
+                "updated_at": "2025-12-14T10:20:30.839088Z",
+                "subtask_count": 2,
+            },
         ],
     }
 
@@ -61,6 +63,7 @@ async def test_list_todos_include_subtasks(
         "count": 3,
         "next": None,
         "previous": None,
+        "next_cursor": None,
         "todos": [
             {
                 "status": "NEW",
@@ -78,6 +81,22 @@ async def test_list_todos_include_subtasks(
                     },
                 ],
             },
+            {
+                "status": "COMPLETED",
+                "title": "Todo 3",
+                "todo_id": "8940b5c4-57ac-4e38-8af4-82a510738717",  # noqa: E501
+                "updated_at": "2025-12-14T10:20:30.839088Z",
+                "subtask_count": 1,
+                "subtasks": [
+                    {
+                        "status": "COMPLETED",
+                        "subtask_id": "bed229af-a244-4e56-9fd9-d6104255f4b1",  # noqa: E501
+                        "title": "SubTask 4",
+                        "todo_id": "8940b5c4-57ac-4e38-8af4-82a510738717",  # noqa: E501
+                        "updated_at": "2025-12-14T10:20:30.839088Z",  # noqa: E501
+                    },
+                ],
+            },
             {
                 "status": "IN_PROGRESS",
                 "title": "Todo 2",
@@ -101,24 +120,387 @@ async def test_list_todos_include_subtasks(
                     },
                 ],
             },
+        ],
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+@pytest.mark.parametrize(
+    ("q", "expected"),
+    [
+        ("todo 2", ["Todo 2"]),
+        # SubTaskのタイトルに一致したTodoも返す
+        ("SubTask 4", ["Todo 3"]),
+        # LIKEのワイルドカードとしては扱わない
+        ("Todo_", []),
+    ],
+)
+async def test_list_todos_search(
+    ac: AsyncClient, q: str, expected: list[str]
+) -> None:
+    response = await ac.get("/api/todos", params={"q": q})
+    assert response.status_code == 200
+    actual = response.json()
+    assert [
+        todo["title"] for todo in actual["todos"]
+    ] == expected
+    assert actual["count"] == len(expected)
+
+
+@pytest.mark.anyio
+async def test_list_todos_search_too_short(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get("/api/todos", params={"q": "to"})
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+@pytest.mark.parametrize(
+    ("params", "expected"),
+    [
+        ({"status": "IN_PROGRESS"}, ["Todo 2"]),
+        (
+            {"updated_after": "2025-12-14T10:20:30.839088Z"},
+            ["Todo 1", "Todo 2", "Todo 3"],
+        ),
+        # before は指定した日時を含まない
+        (
+            {"updated_before": "2025-12-14T10:20:30.839088Z"},
+            [],
+        ),
+        # タイムゾーンが無ければUTCとみなす
+        (
+            {"created_after": "2025-12-14T10:20:30.839089"},
+            [],
+        ),
+        (
             {
-                "status": "COMPLETED",
-                "title": "Todo 3",
-                "todo_id": "8940b5c4-57ac-4e38-8af4-82a510738717",  # noqa: E501
-                "updated_at": "2025-12-14T10:20:30.839088Z",
-                "subtask_count": 1,
-                "subtasks": [
-                    {
-                        "status": "COMPLETED",
-                        "subtask_id": "bed229af-a244-4e56-9fd9-d6104255f4b1",  # noqa: E501
-                        "title": "SubTask 4",
-                        "todo_id": "8940b5c4-57ac-4e38-8af4-82a510738717",  # noqa: E501
-                        "updated_at": "2025-12-14T10:20:30.839088Z",  # noqa: E501
-                    },
-                ],
+                "status": "NEW",
+                "created_after": "2025-12-14T19:20:30+09:00",
             },
-        ],
+            ["Todo 1"],
+        ),
+    ],
+)
+async def test_list_todos_filter(
+    ac: AsyncClient,
+    params: dict[str, str],
+    expected: list[str],
+) -> None:
+    response = await ac.get("/api/todos", params=params)
+    assert response.status_code == 200
+    actual = response.json()
+    assert (
+        sorted(todo["title"] for todo in actual["todos"])
+        == expected
+    )
+    assert actual["count"] == len(expected)
+
+
+@pytest.mark.anyio
+async def test_list_todos_invalid_status(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        "/api/todos", params={"status": "DONE"}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+@pytest.mark.parametrize(
+    ("sort", "expected"),
+    [
+        ("title", ["Todo 1", "Todo 2", "Todo 3"]),
+        ("-title", ["Todo 3", "Todo 2", "Todo 1"]),
+        ("status", ["Todo 3", "Todo 2", "Todo 1"]),
+        # 同じ値の中はtodo_idの順に並べる
+        ("subtask_count", ["Todo 3", "Todo 1", "Todo 2"]),
+        ("-subtask_count", ["Todo 2", "Todo 1", "Todo 3"]),
+    ],
+)
+async def test_list_todos_sort(
+    ac: AsyncClient, sort: str, expected: list[str]
+) -> None:
+    response = await ac.get(
+        "/api/todos", params={"sort": sort}
+    )
+    assert response.status_code == 200
+    assert [
+        todo["title"] for todo in response.json()["todos"]
+    ] == expected
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_todos_cursor(
+    ac: AsyncClient,
+) -> None:
+    params: dict[str, str | int] = {
+        "sort": "title",
+        "limit": 2,
     }
+    response = await ac.get("/api/todos", params=params)
+    assert response.status_code == 200
+    first = response.json()
+    assert [todo["title"] for todo in first["todos"]] == [
+        "Todo 1",
+        "Todo 2",
+    ]
+    assert first["next_cursor"] is not None
+
+    response = await ac.get(
+        "/api/todos",
+        params={**params, "cursor": first["next_cursor"]},
+    )
+    assert response.status_code == 200
+    second = response.json()
+    assert [todo["title"] for todo in second["todos"]] == [
+        "Todo 3"
+    ]
+    assert second["next_cursor"] is None
+    # 総件数はカーソルの位置によらない
+    assert second["count"] == 3
+    assert second["next"] is None
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_todos_invalid_cursor(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        "/api/todos", params={"sort": "title", "limit": 1}
+    )
+    cursor = response.json()["next_cursor"]
+    # 別の並び順のカーソル
+    response = await ac.get(
+        "/api/todos",
+        params={"sort": "-title", "cursor": cursor},
+    )
+    assert response.status_code == 400
+    assert response.json()["message"] == "Invalid cursor"
+    # offsetとは同時に使えない
+    response = await ac.get(
+        "/api/todos",
+        params={
+            "sort": "title",
+            "cursor": cursor,
+            "offset": 1,
+        },
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_subtask_count_follows_subtasks(
+    ac: AsyncClient,
+) -> None:
+    todo_id = "63efd7b7-b825-4b8d-b60a-728bb94dd90b"
+    response = await ac.post(
+        f"/api/todos/{todo_id}/subtasks",
+        json={"title": "new subtask"},
+    )
+    assert response.status_code == 201
+    subtask_id = response.json()["subtask_id"]
+    response = await ac.get(f"/api/todos/{todo_id}")
+    assert response.json()["subtask_count"] == 3
+
+    response = await ac.delete(
+        f"/api/todos/{todo_id}/subtasks/{subtask_id}"
+    )
+    assert response.status_code == 204
+    response = await ac.get(f"/api/todos/{todo_id}")
+    assert response.json()["subtask_count"] == 2
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_subtask_count_across_todos(
+    ac: AsyncClient,
+    test_session: AsyncSession,
+) -> None:
+    todo1 = UUID("fa4fa0f5-2847-475f-ba67-76f4d8fa8a00")
+    todo2 = UUID("63efd7b7-b825-4b8d-b60a-728bb94dd90b")
+
+    async def counts() -> list[int]:
+        async with test_session() as session:
+            todos = await db.Todo.get_by_ids(
+                session, [todo1, todo2]
+            )
+        by_id = {todo.todo_id: todo for todo in todos}
+        return [
+            by_id[todo1].subtask_count,
+            by_id[todo2].subtask_count,
+        ]
+
+    # 1つの文で複数のTodoのSubTaskを追加する
+    response = await ac.post(
+        "/api/todos/subtasks/batch",
+        json={
+            "create": [
+                {"todo_id": str(todo2), "title": "new 1"},
+                {"todo_id": str(todo1), "title": "new 2"},
+                {"todo_id": str(todo2), "title": "new 3"},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert await counts() == [2, 4]
+
+    # 別のTodoへ付け替えた分だけ増減する
+    async with test_session.begin() as session:
+        await session.execute(
+            update(db.SubTask)
+            .where(db.SubTask.todo_id == todo2)
+            .values(todo_id=todo1)
+        )
+    assert await counts() == [6, 0]
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_export_todos(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get("/api/todos/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == (
+        "text/csv; charset=utf-8"
+    )
+    assert response.headers["content-disposition"] == (
+        'attachment; filename="todos.csv"'
+    )
+    lines = response.text.splitlines()
+    assert (
+        lines[0] == "title,status,subtask_title,subtask_status"
+    )
+    # Todo 3件とSubTask 4件
+    assert len(lines) == 1 + 3 + 4
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_todos_fields(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        "/api/todos", params={"fields": "title"}
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    # todo_idは指定しなくても含める
+    assert actual["todos"][0] == {
+        "todo_id": "fa4fa0f5-2847-475f-ba67-76f4d8fa8a00",
+        "title": "Todo 1",
+    }
+    assert actual["count"] == 3
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_get_todo_fields(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        "/api/todos/63efd7b7-b825-4b8d-b60a-728bb94dd90b",
+        params={"fields": "status,subtask_count"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "todo_id": "63efd7b7-b825-4b8d-b60a-728bb94dd90b",
+        "status": "IN_PROGRESS",
+        "subtask_count": 2,
+    }
+
+
+@pytest.mark.anyio
+async def test_list_todos_unknown_fields(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        "/api/todos", params={"fields": "title,secret"}
+    )
+    assert response.status_code == 400
+    assert response.json() == {
+        "details": {"fields": ["secret"]},
+        "message": "Unknown fields",
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_get_todos_by_ids(
+    ac: AsyncClient,
+) -> None:
+    missing = "00000000-0000-0000-0000-000000000000"
+    response = await ac.get(
+        "/api/todos/by-ids",
+        params={
+            "ids": [
+                "63efd7b7-b825-4b8d-b60a-728bb94dd90b",
+                missing,
+                "fa4fa0f5-2847-475f-ba67-76f4d8fa8a00",
+            ]
+        },
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    # 指定した順に並ぶ
+    assert [todo["title"] for todo in actual["todos"]] == [
+        "Todo 2",
+        "Todo 1",
+    ]
+    assert "subtasks" not in actual["todos"][0]
+    assert actual["missing"] == [missing]
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_post_todos_by_ids_include_subtasks(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.post(
+        "/api/todos/by-ids",
+        json={
+            "ids": ["63efd7b7-b825-4b8d-b60a-728bb94dd90b"],
+            "include_subtasks": True,
+            "subtasks_limit": 1,
+        },
+    )
+    assert response.status_code == 200
+    actual = response.json()
+    assert actual["missing"] == []
+    assert actual["todos"][0]["subtask_count"] == 2
+    assert len(actual["todos"][0]["subtasks"]) == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_list_todos_subtasks_limit(
+    ac: AsyncClient,
+) -> None:
+    response = await ac.get(
+        "/api/todos",
+        params={"include_subtasks": True, "subtasks_limit": 1},
+    )
+    assert response.status_code == 200
+    todos = {
+        todo["title"]: todo
+        for todo in response.json()["todos"]
+    }
+    # subtask_countは含めなかった分も数える
+    assert todos["Todo 2"]["subtask_count"] == 2
+    assert [
+        st["subtask_id"] for st in todos["Todo 2"]["subtasks"]
+    ] == ["093404d4-d5ac-4a05-b6b2-092a255273a4"]
+    assert len(todos["Todo 1"]["subtasks"]) == 1
+    assert len(todos["Todo 3"]["subtasks"]) == 1
 
 
 @pytest.mark.anyio
@@ -182,3 +564,128 @@ async def test_update_todo_not_found(
         "message": "Not Found",
     }
     assert response.status_code == 404
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("setup_common_dataset")
+async def test_batch_todos(
+    ac: AsyncClient,
+    test_session: AsyncSession,
+    mocker: MockerFixture,
+) -> None:
+    new_todo_id = UUID("ccc92566-d062-4a43-83a2-bbb05962a49e")
+    mocker.patch("app.db.todo.uuid4", lambda: new_todo_id)
+    # updateとdeleteで同じidは422になるので別のidにする
+    missing_id = "00000000-0000-0000-0000-000000000000"
+    missing_delete_id = "00000000-0000-0000-0000-000000000001"
+
+    response = await ac.post(
+        "/api/todos/batch",
+        json={
+            "create": [{"title": "new todo"}],
+            "update": [
+                {
+                    "todo_id": "63efd7b7-b825-4b8d-b60a-728bb94dd90b",  # noqa: E501
+                    "title": "updated",
+                    "status": "COMPLETED",
+                },
+                {
+                    "todo_id": missing_id,
+                    "title": "missing",
+                    "status": "NEW",
+                },
+            ],
+            "delete": [
+                "8940b5c4-57ac-4e38-8af4-82a510738717",
+                missing_delete_id,
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "create": [
+            {
+                "todo_id": "ccc92566-d062-4a43-83a2-bbb05962a49e",  # noqa: E501
+                "status_code": 201,
+                "todo": {
+                    "todo_id": "ccc92566-d062-4a43-83a2-bbb05962a49e",  # noqa: E501
+                    "title": "new todo",
+                    "status": "NEW",
+                    "subtask_count": 0,
+                    "updated_at": "2025-12-15T20:40:50.839088Z",  # noqa: E501
+                },
+            }
+        ],
+        "update": [
+            {
+                "todo_id": "63efd7b7-b825-4b8d-b60a-728bb94dd90b",  # noqa: E501
+                "status_code": 200,
+                "todo": {
+                    "todo_id": "63efd7b7-b825-4b8d-b60a-728bb94dd90b",  # noqa: E501
+                    "title": "updated",
+                    "status": "COMPLETED",
+                    "subtask_count": 2,
+                    "updated_at": "2025-12-15T20:40:50.839088Z",  # noqa: E501
+                },
+            },
+            {
+                "todo_id": missing_id,
+                "status_code": 404,
+                "todo": None,
+            },
+        ],
+        "delete": [
+            {
+                "todo_id": "8940b5c4-57ac-4e38-8af4-82a510738717",  # noqa: E501
+                "status_code": 204,
+                "todo": None,
+            },
+            # 個別のDELETEと同じく存在しなくても204
+            {
+                "todo_id": missing_delete_id,
+                "status_code": 204,
+                "todo": None,
+            },
+        ],
+    }
+
+    # SubTaskごと削除されたことも確認
+    async with test_session() as session:
+        assert not await db.Todo.get_by_id(
+            session,
+            UUID("8940b5c4-57ac-4e38-8af4-82a510738717"),
+        )
+        assert await db.SubTask.get_by_id(
+            session,
+            UUID("8940b5c4-57ac-4e38-8af4-82a510738717"),
+            UUID("bed229af-a244-4e56-9fd9-d6104255f4b1"),
+        ) == (False, None)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "todo_id",
+    [
+        "63efd7b7-b825-4b8d-b60a-728bb94dd90b",
+        # 存在しないidでも重複していれば422
+        "00000000-0000-0000-0000-000000000000",
+    ],
+)
+async def test_batch_todos_duplicated(
+    ac: AsyncClient,
+    todo_id: str,
+) -> None:
+    response = await ac.post(
+        "/api/todos/batch",
+        json={
+            "update": [
+                {
+                    "todo_id": todo_id,
+                    "title": "updated",
+                    "status": "COMPLETED",
+                }
+            ],
+            "delete": [todo_id],
+        },
+    )
+    assert response.status_code == 422
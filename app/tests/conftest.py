@@ -13,7 +13,11 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import Session, SessionTransaction
 
 from app import db
-from app.database import async_engine, get_session
+from app.database import (
+    async_engine,
+    get_background_session,
+    get_session,
+)
 from app.main import app
 
 
@@ -127,6 +131,9 @@ async def test_session() -> AsyncIterator[
         app.dependency_overrides[get_session] = (
             test_get_session
         )
+        app.dependency_overrides[get_background_session] = (
+            test_get_session
+        )
 
         # このSessionオブジェクトは
         # テストデータの作成に利用する
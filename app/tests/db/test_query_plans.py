@@ -0,0 +1,439 @@
+import json
+from collections.abc import AsyncIterator, Iterator
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import Connection, Select, event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app import db
+from app.models import Status, TodoSort
+from app.pager import stmt_count
+from app.settings import settings
+
+# プランナーがインデックスを選ぶ程度の件数にする
+TODOS = 20_000
+SUBTASKS_PER_TODO = 3
+OPERATIONS = 5_000
+
+type Plan = dict[str, Any]
+type SessionMaker = async_sessionmaker[AsyncSession]
+
+
+@pytest.fixture(scope="module")
+async def plan_dataset() -> AsyncIterator[None]:
+    # 件数が多いためモジュール内で一度だけ投入して使い回す
+    # テストごとのロールバックでは消えないので最後に削除する
+    engine = create_async_engine(settings.DB_URI)
+    async with AsyncSession(engine) as session:
+        await session.execute(
+            text(
+                "INSERT INTO todos"
+                " (todo_id, title, status,"
+                "  created_at, updated_at)"
+                " SELECT gen_random_uuid(), 'Todo ' || i,"
+                "  CASE WHEN i % 10 = 0"
+                "   THEN 'IN_PROGRESS' ELSE 'NEW' END,"
+                "  now() - i * interval '1 second',"
+                "  now() - i * interval '1 second'"
+                " FROM generate_series(1, :n) AS i"
+            ),
+            {"n": TODOS},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO subtasks"
+                " (subtask_id, todo_id, title, status,"
+                "  created_at, updated_at)"
+                " SELECT gen_random_uuid(), t.todo_id,"
+                "  'SubTask ' || i, 'NEW',"
+                "  t.created_at, t.updated_at"
+                " FROM todos t, generate_series(1, :n) AS i"
+            ),
+            {"n": SUBTASKS_PER_TODO},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO operations"
+                " (operation_id, operation_type, status,"
+                "  reason, created_at, updated_at)"
+                " SELECT gen_random_uuid(), 1, 'COMPLETED',"
+                "  '',"
+                "  now(), now()"
+                " FROM generate_series(1, :n)"
+            ),
+            {"n": OPERATIONS},
+        )
+        await session.execute(
+            text("ANALYZE todos, subtasks, operations")
+        )
+        await session.commit()
+
+    yield
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("TRUNCATE todos, subtasks, operations")
+        )
+    await engine.dispose()
+
+
+def to_plan(value: Any) -> Plan:
+    if isinstance(value, str):
+        value = json.loads(value)
+    plan: Plan = value[0]["Plan"]
+    return plan
+
+
+async def explain(
+    session: AsyncSession,
+    stmt: Select[Any],
+    table: str | None = None,
+) -> Plan:
+    # 実際に発行したSQLをバインド変数ごとEXPLAINする
+    # table を指定するとローダーが追加で発行したSQLを読む
+    emitted: list[tuple[str, Any]] = []
+
+    def capture(
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        if table is None or f"FROM {table}" in statement:
+            emitted.append((statement, parameters))
+
+    engine = session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        await session.execute(stmt)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = emitted[0]
+    conn = await session.connection()
+    result = await conn.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {statement}", parameters
+    )
+    return to_plan(result.scalar_one())
+
+
+def walk(plan: Plan) -> Iterator[Plan]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def scans(plan: Plan, table: str) -> list[Plan]:
+    return [
+        node
+        for node in walk(plan)
+        if node.get("Relation Name") == table
+    ]
+
+
+def index_names(plan: Plan) -> set[str]:
+    return {
+        node["Index Name"]
+        for node in walk(plan)
+        if "Index Name" in node
+    }
+
+
+def assert_no_seq_scan(plan: Plan, table: str) -> None:
+    nodes = scans(plan, table)
+    assert nodes, f"{table} is not scanned"
+    assert all(
+        node["Node Type"] != "Seq Scan" for node in nodes
+    ), json.dumps(plan, indent=2)
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("plan_dataset")
+class TestTodoPlans:
+    async def test_get_all(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Todo.stmt_get_all(0, False).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        # ORDER BY created_at DESC をインデックスで解決する
+        assert_no_seq_scan(plan, "todos")
+        assert "ix_todos_created_at_todo_id" in index_names(
+            plan
+        )
+        assert all(
+            node["Node Type"] != "Sort" for node in walk(plan)
+        )
+        # subtask_count は列から読む
+        assert not scans(plan, "subtasks")
+        assert plan["Plan Rows"] <= 20
+
+    async def test_get_all_min_subtasks(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Todo.stmt_get_all(1, False).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "todos")
+        assert not scans(plan, "subtasks")
+
+    async def test_get_all_fields(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Todo.stmt_get_all(
+            0, False, {"todo_id", "title"}
+        ).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "todos")
+        assert not scans(plan, "subtasks")
+
+    async def test_search(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Todo.stmt_get_all(
+            0, False, q="Todo 1234"
+        ).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        # タイトルの部分一致はトライグラムのインデックスで探す
+        assert_no_seq_scan(plan, "todos")
+        assert "ix_todos_title_trgm" in index_names(plan)
+        # SubTaskのタイトルは3種類しかないので、subtasksを
+        # どう読むかはプランナーに任せる
+        assert scans(plan, "subtasks")
+
+    async def test_get_all_status(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Todo.stmt_get_all(
+            0, False, status=Status.IN_PROGRESS
+        ).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        # 絞り込んだ上でソートせずに created_at の順に読む
+        assert_no_seq_scan(plan, "todos")
+        assert (
+            "ix_todos_status_created_at_todo_id"
+            in index_names(plan)
+        )
+        assert all(
+            node["Node Type"] != "Sort" for node in walk(plan)
+        )
+
+    async def test_get_all_updated(
+        self, test_session: SessionMaker
+    ) -> None:
+        now = datetime.now(UTC)
+        stmt = db.Todo.stmt_get_all(
+            0,
+            False,
+            updated_after=now - timedelta(minutes=5),
+            updated_before=now - timedelta(minutes=1),
+        ).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "todos")
+
+    @pytest.mark.parametrize(
+        ("sort", "index"),
+        [
+            (
+                TodoSort.CREATED_AT,
+                "ix_todos_created_at_todo_id",
+            ),
+            (
+                TodoSort.UPDATED_AT_DESC,
+                "ix_todos_updated_at_todo_id",
+            ),
+            (TodoSort.TITLE, "ix_todos_title_todo_id"),
+            (
+                TodoSort.STATUS_DESC,
+                "ix_todos_status_created_at_todo_id",
+            ),
+            (
+                TodoSort.SUBTASK_COUNT,
+                "ix_todos_subtask_count_todo_id",
+            ),
+        ],
+    )
+    async def test_get_all_sort(
+        self,
+        test_session: SessionMaker,
+        sort: TodoSort,
+        index: str,
+    ) -> None:
+        stmt = db.Todo.stmt_get_all(0, False, sort=sort).limit(
+            20
+        )
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        # どの並び順もソートせずにインデックスの順に読む
+        assert index in index_names(plan)
+        assert all(
+            node["Node Type"] != "Sort" for node in walk(plan)
+        )
+
+    async def test_get_all_after(
+        self, test_session: SessionMaker
+    ) -> None:
+        async with test_session() as session:
+            todo = await session.scalar(
+                db.Todo.stmt_get_all(
+                    0, False, sort=TodoSort.TITLE
+                ).offset(10_000)
+            )
+            assert todo is not None
+            stmt = db.Todo.stmt_get_all(
+                0,
+                False,
+                sort=TodoSort.TITLE,
+                after=(todo.title, todo.todo_id),
+            ).limit(20)
+            plan = await explain(session, stmt)
+        # カーソルより後ろをインデックスの範囲で読む
+        assert "ix_todos_title_todo_id" in index_names(plan)
+        assert all(
+            node["Node Type"] != "Sort" for node in walk(plan)
+        )
+        assert plan["Plan Rows"] <= 20
+
+    async def test_with_subtasks(
+        self, test_session: SessionMaker
+    ) -> None:
+        # 先頭から順に読めればカーソルで少しずつ返せる
+        stmt = db.Todo.stmt_with_subtasks().limit(100)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "todos")
+        assert "ix_todos_created_at_todo_id" in index_names(
+            plan
+        )
+        assert_no_seq_scan(plan, "subtasks")
+        # Todoごとに並べ替える Incremental Sort は許す
+        assert all(
+            node["Node Type"] != "Sort" for node in walk(plan)
+        )
+
+    async def test_count(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = stmt_count(db.Todo.stmt_get_all(0, False))
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        # 件数だけなら subtask_count は計算しない
+        assert scans(plan, "todos")
+        assert not scans(plan, "subtasks")
+        assert plan["Plan Rows"] == 1
+
+    async def test_count_min_subtasks(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = stmt_count(db.Todo.stmt_get_all(1, False))
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert not scans(plan, "subtasks")
+        assert plan["Plan Rows"] == 1
+
+    async def test_get_by_id(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Todo.stmt_get_by_id(uuid4())
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "todos")
+        assert "pk_todos" in index_names(plan)
+        # subtask_count を持つのでsubtasksは読まない
+        assert not scans(plan, "subtasks")
+        assert plan["Plan Rows"] == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("plan_dataset")
+class TestSubTaskPlans:
+    async def test_get_all_by_todo(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.SubTask.stmt_get_all_by_todo(uuid4())
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "subtasks")
+        assert "ix_subtasks_todo_id_created_at" in index_names(
+            plan
+        )
+        assert plan["Plan Rows"] <= SUBTASKS_PER_TODO * 10
+
+    async def test_get_all_by_todo_after(
+        self, test_session: SessionMaker
+    ) -> None:
+        # 2ページ目以降もインデックスの範囲スキャンで読む
+        after = (datetime.now(UTC), uuid4())
+        stmt = db.SubTask.stmt_get_all_by_todo(
+            uuid4(), after
+        ).limit(11)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "subtasks")
+        assert "ix_subtasks_todo_id_created_at" in index_names(
+            plan
+        )
+        assert all(
+            node["Node Type"] != "Sort" for node in walk(plan)
+        )
+
+    async def test_get_all_by_todos(
+        self, test_session: SessionMaker
+    ) -> None:
+        # include_subtasks の selectinload が発行するSQL
+        stmt = db.Todo.stmt_get_all(0, True).limit(20)
+        async with test_session() as session:
+            plan = await explain(session, stmt, "subtasks")
+        assert_no_seq_scan(plan, "subtasks")
+        assert plan["Plan Rows"] <= 20 * SUBTASKS_PER_TODO * 10
+
+    async def test_get_first_by_todos(
+        self, test_session: SessionMaker
+    ) -> None:
+        # subtasks_limit のLATERAL
+        todo_ids = [uuid4() for _ in range(20)]
+        stmt = db.SubTask.stmt_get_first_by_todos(todo_ids, 2)
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "todos")
+        assert_no_seq_scan(plan, "subtasks")
+        assert "ix_subtasks_todo_id_created_at" in index_names(
+            plan
+        )
+        assert plan["Plan Rows"] <= 20 * 2
+
+    async def test_get_by_id(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.SubTask.stmt_get_by_id(uuid4(), uuid4())
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "subtasks")
+        assert plan["Plan Rows"] == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("plan_dataset")
+class TestOperationPlans:
+    async def test_get_by_id(
+        self, test_session: SessionMaker
+    ) -> None:
+        stmt = db.Operation.stmt_get_by_id(uuid4())
+        async with test_session() as session:
+            plan = await explain(session, stmt)
+        assert_no_seq_scan(plan, "operations")
+        assert "pk_operations" in index_names(plan)
+        assert plan["Plan Rows"] == 1
@@ -0,0 +1,171 @@
+import time
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from typing import cast
+
+import pytest
+from fastapi import Response
+from pytest_mock import MockerFixture
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+)
+from starlette.requests import Request
+
+from app.database import (
+    PIN_TO_PRIMARY_COOKIE,
+    ReplicaHealth,
+    get_readonly_session,
+    get_session,
+)
+from app.exceptions import ServiceUnavailable
+
+type SessionMaker = async_sessionmaker[AsyncSession]
+
+
+def make_request(method: str, cookie: str = "") -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request(
+        {"type": "http", "method": method, "headers": headers}
+    )
+
+
+@pytest.fixture
+def primary() -> SessionMaker:
+    return async_sessionmaker()
+
+
+class FakeEngine:
+    def __init__(self) -> None:
+        self.error: Exception | None = None
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[None]:
+        if self.error:
+            raise self.error
+        yield
+
+
+@pytest.fixture
+def replica_engine(mocker: MockerFixture) -> FakeEngine:
+    engine = FakeEngine()
+    mocker.patch("app.database.replica_engine", engine)
+    return engine
+
+
+@pytest.fixture
+def replica(
+    mocker: MockerFixture, replica_engine: FakeEngine
+) -> SessionMaker:
+    replica: SessionMaker = async_sessionmaker()
+    mocker.patch("app.database.ReplicaSessionLocal", replica)
+    mocker.patch(
+        "app.database.replica_health", ReplicaHealth(30.0)
+    )
+    return replica
+
+
+async def readonly(
+    request: Request, primary: SessionMaker
+) -> tuple[SessionMaker, AsyncGenerator[SessionMaker, None]]:
+    agen = cast(
+        AsyncGenerator[SessionMaker, None],
+        get_readonly_session(request, primary),
+    )
+    return await anext(agen), agen
+
+
+@pytest.mark.anyio
+class TestGetReadonlySession:
+    async def test_no_replica(
+        self, primary: SessionMaker
+    ) -> None:
+        actual, _ = await readonly(
+            make_request("GET"), primary
+        )
+        assert actual is primary
+
+    async def test_replica(
+        self, primary: SessionMaker, replica: SessionMaker
+    ) -> None:
+        actual, _ = await readonly(
+            make_request("GET"), primary
+        )
+        assert actual is replica
+
+    async def test_pinned_to_primary(
+        self, primary: SessionMaker, replica: SessionMaker
+    ) -> None:
+        cookie = f"{PIN_TO_PRIMARY_COOKIE}={time.time() + 5}"
+        request = make_request("GET", cookie)
+        actual, _ = await readonly(request, primary)
+        assert actual is primary
+
+    async def test_pin_expired(
+        self, primary: SessionMaker, replica: SessionMaker
+    ) -> None:
+        cookie = f"{PIN_TO_PRIMARY_COOKIE}={time.time() - 1}"
+        request = make_request("GET", cookie)
+        actual, _ = await readonly(request, primary)
+        assert actual is replica
+
+    async def test_fallback_on_connect_error(
+        self,
+        primary: SessionMaker,
+        replica: SessionMaker,
+        replica_engine: FakeEngine,
+    ) -> None:
+        # 接続できなければ同じリクエストをプライマリで読む
+        replica_engine.error = ConnectionRefusedError()
+        actual, _ = await readonly(
+            make_request("GET"), primary
+        )
+        assert actual is primary
+
+        # 回復していてもしばらくはプライマリを使う
+        replica_engine.error = None
+        actual, _ = await readonly(
+            make_request("GET"), primary
+        )
+        assert actual is primary
+
+    async def test_fallback_when_unhealthy(
+        self, primary: SessionMaker, replica: SessionMaker
+    ) -> None:
+        _, agen = await readonly(make_request("GET"), primary)
+        # 処理の途中で切れたら再送からプライマリに切り替える
+        with pytest.raises(ServiceUnavailable) as e:
+            await agen.athrow(ConnectionRefusedError())
+        assert e.value.headers == {"Retry-After": "1"}
+
+        actual, _ = await readonly(
+            make_request("GET"), primary
+        )
+        assert actual is primary
+
+
+@pytest.mark.anyio
+class TestGetSession:
+    async def test_pin_after_write(
+        self, replica: SessionMaker
+    ) -> None:
+        response = Response()
+        agen = cast(
+            AsyncGenerator[SessionMaker, None],
+            get_session(make_request("POST"), response),
+        )
+        await anext(agen)
+        assert PIN_TO_PRIMARY_COOKIE in response.headers.get(
+            "set-cookie", ""
+        )
+
+    async def test_no_pin_on_read(
+        self, replica: SessionMaker
+    ) -> None:
+        response = Response()
+        agen = cast(
+            AsyncGenerator[SessionMaker, None],
+            get_session(make_request("GET"), response),
+        )
+        await anext(agen)
+        assert "set-cookie" not in response.headers
@@ -0,0 +1,133 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import cast
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+from sqlalchemy.ext.asyncio import AsyncEngine
+from structlog.testing import capture_logs
+
+from app.lifespan import lifespan, warm_up
+from app.main import app
+
+
+class FakeEngine:
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+        self.connects = 0
+        self.active = 0
+        self.max_active = 0
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[object]:
+        if self.error:
+            raise self.error
+        self.connects += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            yield object()
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def prime(mocker: MockerFixture) -> AsyncMock:
+    return mocker.patch("app.lifespan.prime_statements")
+
+
+@pytest.mark.anyio
+class TestWarmUp:
+    async def test_warm_up(self, prime: AsyncMock) -> None:
+        engine = FakeEngine()
+        await warm_up(cast(AsyncEngine, engine), 3)
+        # pool_size分の接続を同時に保持する
+        assert engine.connects == 3
+        assert engine.max_active == 3
+        assert prime.await_count == 3
+
+    async def test_empty_pool(self, prime: AsyncMock) -> None:
+        engine = FakeEngine()
+        await warm_up(cast(AsyncEngine, engine), 0)
+        assert engine.connects == 0
+
+    async def test_failed(self, prime: AsyncMock) -> None:
+        engine = FakeEngine(ConnectionRefusedError())
+        with capture_logs() as logs:
+            await warm_up(cast(AsyncEngine, engine), 2)
+        assert [
+            log
+            for log in logs
+            if log["event"] == "pool warm-up failed"
+        ]
+
+
+def mock_engine(mocker: MockerFixture, name: str) -> MagicMock:
+    engine = MagicMock(dispose=AsyncMock())
+    mocker.patch(f"app.lifespan.{name}", engine)
+    return engine
+
+
+@pytest.mark.anyio
+class TestLifespan:
+    @pytest.fixture(autouse=True)
+    def settings(self, mocker: MockerFixture) -> None:
+        mocker.patch("app.lifespan.settings.DB_WARM_UP", True)
+        mocker.patch("app.lifespan.settings.DB_POOL_SIZE", 5)
+        mocker.patch(
+            "app.lifespan.settings.DB_BACKGROUND_POOL_SIZE", 2
+        )
+        mocker.patch(
+            "app.lifespan.settings.DB_REPLICA_POOL_SIZE", 3
+        )
+        mocker.patch(
+            "app.lifespan.settings.LOOP_LAG_INTERVAL", 0.0
+        )
+
+    async def test_warm_up_and_dispose(
+        self, mocker: MockerFixture
+    ) -> None:
+        primary = mock_engine(mocker, "async_engine")
+        background = mock_engine(mocker, "background_engine")
+        replica = mock_engine(mocker, "replica_engine")
+        warm_up = mocker.patch("app.lifespan.warm_up")
+
+        async with lifespan(app):
+            warm_up.assert_has_awaits(
+                [
+                    mocker.call(primary, 5),
+                    mocker.call(background, 2),
+                    mocker.call(replica, 3),
+                ]
+            )
+            primary.dispose.assert_not_awaited()
+
+        for engine in (primary, background, replica):
+            engine.dispose.assert_awaited_once()
+
+    async def test_without_replica(
+        self, mocker: MockerFixture
+    ) -> None:
+        primary = mock_engine(mocker, "async_engine")
+        background = mock_engine(mocker, "background_engine")
+        mocker.patch("app.lifespan.replica_engine", None)
+        warm_up = mocker.patch("app.lifespan.warm_up")
+
+        async with lifespan(app):
+            assert warm_up.await_count == 2
+
+        primary.dispose.assert_awaited_once()
+        background.dispose.assert_awaited_once()
+
+    async def test_no_warm_up(
+        self, mocker: MockerFixture
+    ) -> None:
+        mocker.patch("app.lifespan.settings.DB_WARM_UP", False)
+        mock_engine(mocker, "async_engine")
+        mock_engine(mocker, "background_engine")
+        mocker.patch("app.lifespan.replica_engine", None)
+        warm_up = mocker.patch("app.lifespan.warm_up")
+
+        async with lifespan(app):
+            warm_up.assert_not_awaited()
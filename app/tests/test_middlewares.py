@@ -1,13 +1,32 @@
+import asyncio
 import json
+import pstats
+import tracemalloc
 from collections.abc import AsyncIterator
+from compression import zstd
+from pathlib import Path
+from unittest.mock import AsyncMock
 from uuid import UUID
 
 import pytest
 from fastapi import FastAPI
+from fastapi.responses import (
+    PlainTextResponse,
+    StreamingResponse,
+)
 from httpx import ASGITransport, AsyncClient
 from pytest_mock import MockerFixture
+from starlette.types import Message, Receive, Scope, Send
 
-from app.middlewares import ProcessTimeMiddleware
+from app.middlewares import (
+    AdmissionController,
+    AdmissionControlMiddleware,
+    CompressionMiddleware,
+    ProcessTimeMiddleware,
+    ProfilerMiddleware,
+    init_middlewares,
+    select_encoding,
+)
 
 
 @pytest.fixture
@@ -47,3 +66,434 @@ async def test_process_time_middleware(
     assert captured_log["method"] == "GET"
     assert captured_log["path"] == "/"
     assert captured_log["request_id"] == request_id
+
+
+@pytest.mark.anyio
+async def test_process_time_middleware_process_memory_delta(
+    ac: AsyncClient,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    tracemalloc.start()
+    try:
+        buffer = bytearray(10 * 1024 * 1024)
+        del buffer
+        _, peak = tracemalloc.get_traced_memory()
+        res = await ac.get("/")
+        # プロセス全体のピークはリセットしない
+        assert tracemalloc.get_traced_memory()[1] >= peak
+    finally:
+        tracemalloc.stop()
+    assert res.status_code == 200
+
+    captured_log = json.loads(capsys.readouterr().out)
+    assert isinstance(
+        captured_log["process_memory_delta"], int
+    )
+    assert "memory_delta" not in captured_log
+    assert "memory_peak" not in captured_log
+
+
+@pytest.fixture
+def controller() -> AdmissionController:
+    return AdmissionController(
+        max_concurrency=1, max_queue=1, queue_timeout=0.5
+    )
+
+
+@pytest.fixture
+async def admission_ac(
+    controller: AdmissionController,
+) -> AsyncIterator[AsyncClient]:
+    app = FastAPI()
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=controller,
+        retry_after=3,
+    )
+
+    @app.get("/")
+    async def index(wait: float = 0) -> dict[str, str]:
+        await asyncio.sleep(wait)
+        return {"status": "ok"}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test.invalid",
+    ) as ac:
+        yield ac
+
+
+@pytest.mark.anyio
+class TestAdmissionControlMiddleware:
+    async def test_queued(
+        self, admission_ac: AsyncClient
+    ) -> None:
+        # 1件目の完了を待ってから2件目が処理される
+        first, second = await asyncio.gather(
+            admission_ac.get("/", params={"wait": 0.1}),
+            admission_ac.get("/"),
+        )
+        assert first.status_code == 200
+        assert second.status_code == 200
+
+    async def test_queue_full(
+        self, admission_ac: AsyncClient
+    ) -> None:
+        responses = await asyncio.gather(
+            admission_ac.get("/", params={"wait": 0.1}),
+            admission_ac.get("/", params={"wait": 0.1}),
+            admission_ac.get("/"),
+        )
+        assert [r.status_code for r in responses] == [
+            200,
+            200,
+            503,
+        ]
+        assert responses[2].headers["Retry-After"] == "3"
+
+    async def test_queue_timeout(
+        self, admission_ac: AsyncClient
+    ) -> None:
+        first, second = await asyncio.gather(
+            admission_ac.get("/", params={"wait": 1}),
+            admission_ac.get("/"),
+        )
+        assert first.status_code == 200
+        assert second.status_code == 503
+
+    async def test_released_before_background(
+        self, controller: AdmissionController
+    ) -> None:
+        in_flight = []
+
+        async def app(
+            scope: Scope, receive: Receive, send: Send
+        ) -> None:
+            await send(
+                {"type": "http.response.start", "status": 200}
+            )
+            await send({"type": "http.response.body"})
+            # BackgroundTasksと同じくレスポンスの送信後に動く
+            in_flight.append(controller.in_flight)
+
+        async def send(message: Message) -> None:
+            pass
+
+        middleware = AdmissionControlMiddleware(
+            app, controller=controller, retry_after=3
+        )
+        scope: Scope = {"type": "http"}
+        await middleware(scope, receive=AsyncMock(), send=send)
+        assert in_flight == [0]
+        assert controller.in_flight == 0
+
+    async def test_cors_headers(
+        self, mocker: MockerFixture
+    ) -> None:
+        mocker.patch(
+            "app.middlewares.settings.ADMISSION_MAX_CONCURRENCY",
+            1,
+        )
+        mocker.patch(
+            "app.middlewares.settings.ADMISSION_MAX_QUEUE", 0
+        )
+        app = FastAPI()
+        init_middlewares(app)
+
+        @app.get("/")
+        async def index(wait: float = 0) -> dict[str, str]:
+            await asyncio.sleep(wait)
+            return {"status": "ok"}
+
+        origin = "http://localhost"
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+            headers={"Origin": origin},
+        ) as ac:
+            first, second = await asyncio.gather(
+                ac.get("/", params={"wait": 0.1}),
+                ac.get("/"),
+            )
+        assert first.status_code == 200
+        assert second.status_code == 503
+        # ブラウザがエラーの内容を読めるようにする
+        assert (
+            second.headers["access-control-allow-origin"]
+            == origin
+        )
+
+
+class TestAdmissionController:
+    def test_adjust_limit(self) -> None:
+        controller = AdmissionController(
+            max_concurrency=10,
+            max_queue=0,
+            queue_timeout=0,
+            target_latency=0.1,
+        )
+        controller.in_flight = 2
+        controller.release(latency=1.0)
+        assert controller.limit == 9.0
+
+        controller.release(latency=0.01)
+        assert controller.limit == pytest.approx(9.0 + 1 / 9)
+
+    @pytest.mark.anyio
+    async def test_cancel_and_release(
+        self, controller: AdmissionController
+    ) -> None:
+        assert await controller.acquire()
+        task = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        # 待ちのキャンセルと枠の返却が同時に起きる
+        task.cancel()
+        controller.release()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert controller.in_flight == 0
+        assert not controller._waiters
+        assert await controller.acquire()
+
+
+@pytest.fixture
+async def compression_ac() -> AsyncIterator[AsyncClient]:
+    app = FastAPI()
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=100,
+        offload_size=1000,
+    )
+
+    @app.get("/")
+    async def index(size: int) -> PlainTextResponse:
+        return PlainTextResponse("a" * size)
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def chunks() -> AsyncIterator[str]:
+            for _ in range(10):
+                yield "a" * 500
+
+        return StreamingResponse(chunks())
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test.invalid",
+    ) as ac:
+        yield ac
+
+
+@pytest.mark.anyio
+class TestCompressionMiddleware:
+    @pytest.mark.parametrize("size", [100, 5000])
+    async def test_gzip(
+        self, compression_ac: AsyncClient, size: int
+    ) -> None:
+        res = await compression_ac.get(
+            "/",
+            params={"size": size},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert res.headers["Content-Encoding"] == "gzip"
+        assert res.headers["Vary"] == "Accept-Encoding"
+        assert int(res.headers["Content-Length"]) < size
+        assert res.text == "a" * size
+
+    async def test_zstd(
+        self, compression_ac: AsyncClient
+    ) -> None:
+        res = await compression_ac.get(
+            "/",
+            params={"size": 5000},
+            headers={"Accept-Encoding": "gzip, zstd"},
+        )
+        assert res.headers["Content-Encoding"] == "zstd"
+        assert zstd.decompress(res.content) == b"a" * 5000
+
+    async def test_below_minimum_size(
+        self, compression_ac: AsyncClient
+    ) -> None:
+        res = await compression_ac.get(
+            "/",
+            params={"size": 99},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert "Content-Encoding" not in res.headers
+        assert res.text == "a" * 99
+
+    async def test_not_accepted(
+        self, compression_ac: AsyncClient
+    ) -> None:
+        res = await compression_ac.get(
+            "/",
+            params={"size": 5000},
+            headers={"Accept-Encoding": "identity"},
+        )
+        assert "Content-Encoding" not in res.headers
+
+    async def test_streaming(
+        self, compression_ac: AsyncClient
+    ) -> None:
+        res = await compression_ac.get(
+            "/stream", headers={"Accept-Encoding": "gzip"}
+        )
+        assert res.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in res.headers
+        assert res.text == "a" * 5000
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("", None),
+        ("gzip", "gzip"),
+        ("gzip, zstd", "zstd"),
+        ("zstd;q=0.5, gzip", "gzip"),
+        ("*", "zstd"),
+        ("gzip;q=0, br", None),
+    ],
+)
+def test_select_encoding(
+    accept_encoding: str, expected: str | None
+) -> None:
+    assert select_encoding(accept_encoding) == expected
+
+
+PROFILE_HEADERS = {"X-Profile-Token": "secret"}
+
+
+def profiler_app(
+    sample_rate: float,
+    output_dir: Path | None,
+    token: str | None = "secret",
+) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        ProfilerMiddleware,
+        header="X-Profile",
+        sample_rate=sample_rate,
+        output_dir=str(output_dir) if output_dir else None,
+        token=token,
+    )
+
+    @app.get("/todos/{todo_id}")
+    async def index(todo_id: int) -> dict[str, int]:
+        return {"todo_id": todo_id}
+
+    @app.post("/todos")
+    async def create() -> dict[str, int]:
+        return {"todo_id": 2}
+
+    return app
+
+
+@pytest.mark.anyio
+class TestProfilerMiddleware:
+    async def test_not_profiled(self, tmp_path: Path) -> None:
+        app = profiler_app(0.0, tmp_path)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+        ) as ac:
+            res = await ac.get("/todos/1")
+        assert res.json() == {"todo_id": 1}
+        assert not list(tmp_path.iterdir())
+
+    async def test_output_dir(self, tmp_path: Path) -> None:
+        app = profiler_app(0.0, tmp_path)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+        ) as ac:
+            res = await ac.get(
+                "/todos/1",
+                headers={"X-Profile": "1", **PROFILE_HEADERS},
+            )
+        assert res.json() == {"todo_id": 1}
+        (path,) = tmp_path.iterdir()
+        assert path.name.endswith("-GET-todos_1.prof")
+        stats = pstats.Stats(str(path)).get_stats_profile()
+        assert stats.func_profiles
+
+    async def test_sampled(self, tmp_path: Path) -> None:
+        app = profiler_app(1.0, tmp_path)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+        ) as ac:
+            res = await ac.get("/todos/1")
+        assert res.json() == {"todo_id": 1}
+        assert len(list(tmp_path.iterdir())) == 1
+
+    @pytest.mark.parametrize("with_dir", [True, False])
+    async def test_response(
+        self, tmp_path: Path, with_dir: bool
+    ) -> None:
+        app = profiler_app(0.0, tmp_path if with_dir else None)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+        ) as ac:
+            res = await ac.get(
+                "/todos/1",
+                headers={
+                    "X-Profile": "response",
+                    **PROFILE_HEADERS,
+                },
+            )
+        assert res.status_code == 200
+        assert res.headers["Content-Type"].startswith(
+            "text/plain"
+        )
+        assert "function calls" in res.text
+        assert not list(tmp_path.iterdir())
+
+    @pytest.mark.parametrize(
+        ("token", "headers"),
+        [
+            # トークンが違う・無い
+            ("secret", {"X-Profile-Token": "wrong"}),
+            ("secret", {}),
+            # サーバーにトークンが無ければ常に無視する
+            (None, {"X-Profile-Token": ""}),
+        ],
+    )
+    async def test_token_required(
+        self,
+        tmp_path: Path,
+        token: str | None,
+        headers: dict[str, str],
+    ) -> None:
+        app = profiler_app(0.0, tmp_path, token)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+        ) as ac:
+            res = await ac.get(
+                "/todos/1",
+                headers={"X-Profile": "response", **headers},
+            )
+        assert res.json() == {"todo_id": 1}
+        assert not list(tmp_path.iterdir())
+
+    @pytest.mark.parametrize("with_dir", [True, False])
+    async def test_response_not_for_post(
+        self, tmp_path: Path, with_dir: bool
+    ) -> None:
+        # 書き込みの結果はプロファイルに差し替えない
+        app = profiler_app(0.0, tmp_path if with_dir else None)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test.invalid",
+        ) as ac:
+            res = await ac.post(
+                "/todos",
+                headers={
+                    "X-Profile": "response",
+                    **PROFILE_HEADERS,
+                },
+            )
+        assert res.json() == {"todo_id": 2}
+        assert len(list(tmp_path.iterdir())) == int(with_dir)
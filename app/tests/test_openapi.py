@@ -0,0 +1,31 @@
+import json
+from pathlib import Path
+
+from fastapi import FastAPI
+from pytest_mock import MockerFixture
+
+from app.openapi import init_openapi
+
+
+def test_generate(mocker: MockerFixture) -> None:
+    mocker.patch(
+        "app.openapi.settings.OPENAPI_SCHEMA_PATH", None
+    )
+    app = FastAPI(title="test")
+    init_openapi(app)
+    assert app.openapi()["info"]["title"] == "test"
+
+
+def test_load_prebuilt_schema(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    path = tmp_path / "openapi.json"
+    path.write_text(
+        json.dumps({"info": {"title": "prebuilt"}})
+    )
+    mocker.patch(
+        "app.openapi.settings.OPENAPI_SCHEMA_PATH", str(path)
+    )
+    app = FastAPI(title="test")
+    init_openapi(app)
+    assert app.openapi()["info"]["title"] == "prebuilt"
@@ -0,0 +1,85 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from app.server import (
+    get_pool_size,
+    get_replica_pool_size,
+    get_workers,
+)
+
+
+class TestGetWorkers:
+    def test_from_settings(
+        self, mocker: MockerFixture
+    ) -> None:
+        mocker.patch("app.server.settings.WORKERS", 3)
+        assert get_workers() == 3
+
+    def test_from_cpu_count(
+        self, mocker: MockerFixture
+    ) -> None:
+        mocker.patch("app.server.settings.WORKERS", 0)
+        mocker.patch(
+            "app.server.os.process_cpu_count", lambda: 8
+        )
+        assert get_workers() == 8
+
+
+@pytest.fixture
+def budget(mocker: MockerFixture) -> None:
+    mocker.patch("app.server.settings.DB_MAX_CONNECTIONS", 40)
+    mocker.patch(
+        "app.server.settings.DB_BACKGROUND_POOL_SIZE", 2
+    )
+    mocker.patch(
+        "app.server.settings.DB_BACKGROUND_MAX_OVERFLOW", 0
+    )
+    mocker.patch(
+        "app.server.settings.DB_REPLICA_MAX_CONNECTIONS", 20
+    )
+
+
+class TestGetPoolSize:
+    def test_default(self, mocker: MockerFixture) -> None:
+        mocker.patch(
+            "app.server.settings.DB_MAX_CONNECTIONS", 0
+        )
+        mocker.patch("app.server.settings.DB_POOL_SIZE", 5)
+        mocker.patch("app.server.settings.DB_MAX_OVERFLOW", 10)
+        assert get_pool_size(4) == (5, 10)
+
+    def test_max_connections(self, budget: None) -> None:
+        # 1ワーカー10接続のうち2接続はバックグラウンド用
+        assert get_pool_size(4) == (8, 0)
+        assert get_pool_size(13) == (1, 0)
+
+    def test_max_connections_too_small(
+        self, budget: None
+    ) -> None:
+        with pytest.raises(ValueError):
+            get_pool_size(14)
+
+
+class TestGetReplicaPoolSize:
+    def test_default(self, mocker: MockerFixture) -> None:
+        mocker.patch(
+            "app.server.settings.DB_REPLICA_MAX_CONNECTIONS", 0
+        )
+        mocker.patch(
+            "app.server.settings.DB_REPLICA_POOL_SIZE", 5
+        )
+        mocker.patch(
+            "app.server.settings.DB_REPLICA_MAX_OVERFLOW", 10
+        )
+        assert get_replica_pool_size(4) == (5, 10)
+
+    def test_max_connections(self, budget: None) -> None:
+        # プライマリやバックグラウンド用とは別に割り当てる
+        assert get_replica_pool_size(4) == (5, 0)
+        assert get_replica_pool_size(20) == (1, 0)
+
+    def test_max_connections_too_small(
+        self, budget: None
+    ) -> None:
+        with pytest.raises(ValueError):
+            get_replica_pool_size(21)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+from structlog.testing import capture_logs
+
+from app.utils.loop_monitor import LoopLagMonitor
+
+
+def blocking_call() -> None:
+    time.sleep(0.3)
+
+
+@pytest.mark.anyio
+async def test_blocked() -> None:
+    monitor = LoopLagMonitor(
+        interval=0.01, threshold=0.1, report_interval=0.2
+    )
+    with capture_logs() as logs:
+        async with monitor.start():
+            await asyncio.sleep(0.05)
+            blocking_call()
+            await asyncio.sleep(0.3)
+
+    (blocked,) = [
+        log
+        for log in logs
+        if log["event"] == "event-loop-blocked"
+    ]
+    assert blocked["blocked"] > 0.1
+    assert "blocking_call" in blocked["stack"]
+
+    (report, *_) = [
+        log for log in logs if log["event"] == "event-loop-lag"
+    ]
+    assert report["max_lag"] >= 0.25
+    assert report["blocked"] == 1
+    assert monitor.max_lag > 0
+
+
+@pytest.mark.anyio
+async def test_not_blocked() -> None:
+    monitor = LoopLagMonitor(
+        interval=0.01, threshold=0.1, report_interval=0.05
+    )
+    with capture_logs() as logs:
+        async with monitor.start():
+            await asyncio.sleep(0.2)
+
+    assert not [
+        log
+        for log in logs
+        if log["event"] == "event-loop-blocked"
+    ]
+    assert [
+        log for log in logs if log["event"] == "event-loop-lag"
+    ]
+
+
+@pytest.mark.anyio
+async def test_stopped() -> None:
+    monitor = LoopLagMonitor(
+        interval=0.01, threshold=0.1, report_interval=0.05
+    )
+    before = asyncio.all_tasks()
+    async with monitor.start():
+        await asyncio.sleep(0.02)
+    # 監視用のタスクを止めきってから抜ける
+    assert asyncio.all_tasks() == before
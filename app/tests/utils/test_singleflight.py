@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.mark.anyio
+class TestSingleFlight:
+    async def test_share_in_flight_call(self) -> None:
+        calls = 0
+
+        async def fn() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        sf = SingleFlight[int]()
+        actual = await asyncio.gather(
+            sf.do("key", fn), sf.do("key", fn)
+        )
+        assert list(actual) == [1, 1]
+        assert calls == 1
+
+        # 完了後の呼び出しは結果を使い回さない
+        assert await sf.do("key", fn) == 2
+
+    async def test_different_keys(self) -> None:
+        async def fn() -> int:
+            await asyncio.sleep(0.01)
+            return 1
+
+        sf = SingleFlight[int]()
+        await asyncio.gather(sf.do("a", fn), sf.do("b", fn))
+        assert sf._calls == {}
+
+    async def test_share_exception(self) -> None:
+        async def fn() -> int:
+            await asyncio.sleep(0.01)
+            raise ValueError()
+
+        sf = SingleFlight[int]()
+        results = await asyncio.gather(
+            sf.do("key", fn),
+            sf.do("key", fn),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    async def test_caller_cancelled(self) -> None:
+        async def fn() -> int:
+            await asyncio.sleep(0.05)
+            return 1
+
+        sf = SingleFlight[int]()
+        first = asyncio.create_task(sf.do("key", fn))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(sf.do("key", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        # 最初の呼び出し元がキャンセルされても処理は続く
+        assert await second == 1
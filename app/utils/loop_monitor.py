@@ -0,0 +1,102 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
+import structlog
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        interval: float,
+        threshold: float,
+        report_interval: float,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.report_interval = report_interval
+        self.logger = structlog.get_logger()
+        # 直近の集計期間の遅延 (秒)
+        self.max_lag = 0.0
+        self._lags: list[float] = []
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        report_at = loop.time() + self.report_interval
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self._heartbeat = time.monotonic()
+            self._lags.append(max(0.0, now - expected))
+            if now >= report_at:
+                self.report()
+                report_at = now + self.report_interval
+
+    def report(self) -> None:
+        if not self._lags:
+            return
+        self.max_lag = max(self._lags)
+        # ログ基盤でメトリクスとして集計する
+        self.logger.info(
+            "event-loop-lag",
+            max_lag=self.max_lag,
+            mean_lag=sum(self._lags) / len(self._lags),
+            blocked=sum(
+                1 for lag in self._lags if lag > self.threshold
+            ),
+            samples=len(self._lags),
+        )
+        self._lags.clear()
+
+    def watch(self) -> None:
+        # ループが止まっている間も動けるよう別スレッドで監視
+        reported = 0.0
+        period = min(self.interval, self.threshold) / 2
+        while not self._stopped.wait(period):
+            heartbeat = self._heartbeat
+            blocked = (
+                time.monotonic() - heartbeat - self.interval
+            )
+            if (
+                blocked <= self.threshold
+                or heartbeat == reported
+            ):
+                continue
+            # 1回の停止につき1度だけ出力する
+            reported = heartbeat
+            frame = sys._current_frames().get(
+                self._loop_thread_id
+            )
+            if frame is None:
+                continue
+            self.logger.warning(
+                "event-loop-blocked",
+                blocked=blocked,
+                stack="".join(traceback.format_stack(frame)),
+            )
+
+    @asynccontextmanager
+    async def start(self) -> AsyncIterator[None]:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        task = asyncio.create_task(self.run())
+        watcher = threading.Thread(
+            target=self.watch, name="loop-monitor", daemon=True
+        )
+        watcher.start()
+        try:
+            yield
+        finally:
+            self._stopped.set()
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            watcher.join()
@@ -0,0 +1,21 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+
+class SingleFlight[T]:
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Future[T]] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[T]]
+    ) -> T:
+        # 同じキーの処理が実行中なら、その結果を待つ
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(
+                lambda _: self._calls.pop(key, None)
+            )
+        # 呼び出し元がキャンセルされても共有中の処理は止めない
+        return await asyncio.shield(call)
@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+from typing import Any
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+def compare(
+    base: dict[str, Any],
+    head: dict[str, Any],
+    threshold: float,
+) -> tuple[list[str], bool]:
+    lines: list[str] = []
+    regressed = False
+    for name, result in head["results"].items():
+        before = base["results"].get(name)
+        if before is None:
+            lines.append(f"{name}: (new)")
+            continue
+
+        diffs = []
+        for metric in [*METRICS, "throughput_rps"]:
+            old, new = before[metric], result[metric]
+            ratio = (new - old) / old if old else 0.0
+            # スループットは下がったら悪化
+            worse = (
+                -ratio if metric == "throughput_rps" else ratio
+            )
+            mark = ""
+            if worse > threshold:
+                mark = " !"
+                regressed = True
+            diffs.append(
+                f"{metric} {old:.1f} -> {new:.1f} "
+                f"({ratio:+.1%}){mark}"
+            )
+        lines.append(f"{name}: " + ", ".join(diffs))
+    return lines, regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="bench.load の結果を比較する"
+    )
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="この割合を超えて悪化したら失敗",
+    )
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    lines, regressed = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
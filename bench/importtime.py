@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+# 子プロセスで計測するコード
+# import と初回の OpenAPI 生成までを time-to-ready とする
+READY_CODE = """
+import json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+app.openapi()
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "ready_ms": (ready - start) * 1000,
+}))
+"""
+
+
+def run_once() -> tuple[
+    dict[str, float], list[tuple[str, int]]
+]:
+    env = dict(os.environ)
+    env.setdefault(
+        "DB_URI", "postgresql+asyncpg://bench@localhost/bench"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", READY_CODE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    # "import time: self | cumulative | name" の形式
+    modules: list[tuple[str, int]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line.removeprefix(
+            "import time:"
+        ).split("|")
+        if self_us.strip().isdigit():
+            modules.append((name.strip(), int(self_us)))
+    return json.loads(proc.stdout), modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="app.main の起動時間を計測する"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="ready_ms の中央値がこれを超えたら失敗",
+    )
+    args = parser.parse_args()
+
+    # 1回目は .pyc の生成などが混ざるので捨てる
+    run_once()
+    results = [run_once() for _ in range(args.runs)]
+
+    self_times: dict[str, list[int]] = {}
+    for _, modules in results:
+        for name, self_us in modules:
+            self_times.setdefault(name, []).append(self_us)
+    top = sorted(
+        (
+            (name, statistics.median(values))
+            for name, values in self_times.items()
+        ),
+        key=lambda x: x[1],
+        reverse=True,
+    )[: args.top]
+
+    ready = statistics.median(
+        r["ready_ms"] for r, _ in results
+    )
+    report: dict[str, Any] = {
+        "runs": args.runs,
+        "import_ms": statistics.median(
+            r["import_ms"] for r, _ in results
+        ),
+        "ready_ms": ready,
+        "budget_ms": args.budget_ms,
+        "top_modules_us": dict(top),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.budget_ms is not None and ready > args.budget_ms:
+        print(
+            f"time-to-ready {ready:.1f}ms exceeds "
+            f"budget {args.budget_ms:.1f}ms",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
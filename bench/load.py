@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any
+from uuid import UUID, uuid4
+
+from httpx import AsyncClient, Response
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import db
+from app.models import Status
+from app.settings import settings
+from app.utils.datetime import utcnow
+
+CHUNK_SIZE = 1000
+
+type Request = Callable[[AsyncClient], Awaitable[Response]]
+
+
+@dataclass
+class Dataset:
+    todo_ids: list[UUID] = field(default_factory=list)
+    # (todo_id, subtask_id)
+    subtask_ids: list[tuple[UUID, UUID]] = field(
+        default_factory=list
+    )
+    # DELETEで消すためのTodo
+    disposable_ids: list[UUID] = field(default_factory=list)
+
+
+@dataclass
+class Result:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        ms = sorted(x * 1000 for x in self.latencies)
+        if len(ms) >= 2:
+            q = statistics.quantiles(
+                ms, n=100, method="inclusive"
+            )
+            p50, p95, p99 = q[49], q[94], q[98]
+        else:
+            p50 = p95 = p99 = ms[0] if ms else 0.0
+        return {
+            "requests": len(ms),
+            "errors": self.errors,
+            "throughput_rps": (
+                len(ms) / self.elapsed if self.elapsed else 0.0
+            ),
+            "mean_ms": statistics.fmean(ms) if ms else 0.0,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": ms[-1] if ms else 0.0,
+        }
+
+
+def random_uuid() -> UUID:
+    # --seed で同じデータを再現できるようにする
+    return UUID(int=random.getrandbits(128), version=4)
+
+
+async def seed(
+    todos: int, subtasks: int, disposable: int
+) -> Dataset:
+    # 計測のたびに同じ状態から始める
+    engine = create_async_engine(settings.DB_URI)
+    dataset = Dataset()
+    now = utcnow()
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("TRUNCATE subtasks, todos, operations")
+        )
+        rows: list[dict[str, Any]] = []
+        subtask_rows: list[dict[str, Any]] = []
+        for i in range(todos + disposable):
+            todo_id = random_uuid()
+            created_at = now - timedelta(seconds=i)
+            rows.append(
+                {
+                    "todo_id": todo_id,
+                    "title": f"Todo {i}",
+                    "status": random.choice(list(Status)),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+            if i >= todos:
+                dataset.disposable_ids.append(todo_id)
+                continue
+
+            dataset.todo_ids.append(todo_id)
+            for j in range(subtasks):
+                subtask_id = random_uuid()
+                subtask_rows.append(
+                    {
+                        "subtask_id": subtask_id,
+                        "todo_id": todo_id,
+                        "title": f"SubTask {i}-{j}",
+                        "status": random.choice(list(Status)),
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    }
+                )
+                dataset.subtask_ids.append(
+                    (todo_id, subtask_id)
+                )
+
+        tables: list[
+            tuple[type[db.Base], list[dict[str, Any]]]
+        ] = [
+            (db.Todo, rows),
+            (db.SubTask, subtask_rows),
+        ]
+        for table, values in tables:
+            for start in range(0, len(values), CHUNK_SIZE):
+                await conn.execute(
+                    insert(table),
+                    values[start : start + CHUNK_SIZE],
+                )
+        await conn.execute(text("ANALYZE"))
+    await engine.dispose()
+    return dataset
+
+
+def scenarios(
+    dataset: Dataset, todos: int
+) -> dict[str, Request]:
+    def todo_id() -> UUID:
+        return random.choice(dataset.todo_ids)
+
+    def subtask() -> tuple[UUID, UUID]:
+        return random.choice(dataset.subtask_ids)
+
+    csv = (
+        "title,status,subtask_title,subtask_status\n"
+        + "".join(
+            f"Import {i},NEW\n,,SubTask {i},NEW\n"
+            for i in range(10)
+        )
+    )
+
+    async def get_subtask(c: AsyncClient) -> Response:
+        t, s = subtask()
+        return await c.get(f"/api/todos/{t}/subtasks/{s}")
+
+    async def delete_todo(c: AsyncClient) -> Response:
+        # 使い切ったら存在しないTodoの削除になる
+        ids = dataset.disposable_ids
+        target = ids.pop() if ids else uuid4()
+        return await c.delete(f"/api/todos/{target}")
+
+    reqs: dict[str, Request] = {
+        "list_todos": lambda c: c.get(
+            "/api/todos", params={"limit": 20}
+        ),
+        "list_todos_include_subtasks": lambda c: c.get(
+            "/api/todos",
+            params={"limit": 20, "include_subtasks": True},
+        ),
+        "list_todos_min_subtasks": lambda c: c.get(
+            "/api/todos",
+            params={"limit": 20, "min_subtasks": 1},
+        ),
+        "list_todos_deep_offset": lambda c: c.get(
+            "/api/todos",
+            params={
+                "limit": 20,
+                "offset": max(0, todos - 20),
+            },
+        ),
+        "get_todo": lambda c: c.get(f"/api/todos/{todo_id()}"),
+        "list_subtasks": lambda c: c.get(
+            f"/api/todos/{todo_id()}/subtasks"
+        ),
+        "get_subtask": get_subtask,
+        "update_todo": lambda c: c.put(
+            f"/api/todos/{todo_id()}",
+            json={"title": "updated", "status": "IN_PROGRESS"},
+        ),
+        "delete_todo": delete_todo,
+        "import_todos": lambda c: c.post(
+            "/api/todos/import",
+            files={"file": ("todos.csv", csv.encode())},
+        ),
+    }
+    if not dataset.subtask_ids:
+        del reqs["get_subtask"]
+    return reqs
+
+
+async def run_scenario(
+    client: AsyncClient,
+    name: str,
+    request: Request,
+    concurrency: int,
+    requests: int,
+) -> Result:
+    result = Result(name=name)
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                res = await request(client)
+            except Exception:
+                result.errors += 1
+                continue
+            latency = time.perf_counter() - start
+            if res.is_success:
+                result.latencies.append(latency)
+            else:
+                result.errors += 1
+
+    start = time.perf_counter()
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(concurrency):
+            tg.create_task(worker())
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    random.seed(args.seed)
+    deletes = args.warmup + args.requests
+    if args.scenario and "delete_todo" not in args.scenario:
+        deletes = 0
+    dataset = await seed(args.todos, args.subtasks, deletes)
+    reqs = scenarios(dataset, args.todos)
+    names = args.scenario or list(reqs)
+
+    results: dict[str, Any] = {}
+    async with AsyncClient(
+        base_url=args.base_url, timeout=args.timeout
+    ) as client:
+        for name in names:
+            # ウォームアップの結果は捨てる
+            await run_scenario(
+                client,
+                name,
+                reqs[name],
+                args.concurrency,
+                args.warmup,
+            )
+            result = await run_scenario(
+                client,
+                name,
+                reqs[name],
+                args.concurrency,
+                args.requests,
+            )
+            results[name] = result.summary()
+            print(
+                f"{name}: {json.dumps(results[name])}",
+                file=sys.stderr,
+            )
+
+    return {
+        "revision": git_revision(),
+        "timestamp": utcnow().isoformat(),
+        "python": platform.python_version(),
+        "params": {
+            "base_url": args.base_url,
+            "todos": args.todos,
+            "subtasks": args.subtasks,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "DB_URIのデータを作り直してから、"
+            "起動中のAPIに負荷をかけてレイテンシを計測する"
+        )
+    )
+    parser.add_argument(
+        "--base-url", default="http://localhost:8080"
+    )
+    parser.add_argument("--todos", type=int, default=1000)
+    parser.add_argument("--subtasks", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="計測するシナリオ。未指定なら全て",
+    )
+    parser.add_argument(
+        "--output", help="結果のJSONを書き出すファイル"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import OperationStatus, OperationType, Status
+from app.settings import settings
+
+TODO_COLUMNS = [
+    "todo_id",
+    "title",
+    "status",
+    "created_at",
+    "updated_at",
+]
+SUBTASK_COLUMNS = [
+    "subtask_id",
+    "todo_id",
+    "title",
+    "status",
+    "created_at",
+    "updated_at",
+]
+OPERATION_COLUMNS = [
+    "operation_id",
+    "operation_type",
+    "status",
+    "reason",
+    "created_at",
+    "updated_at",
+]
+
+type Record = tuple[object, ...]
+
+
+class Generator:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        # 同じseedなら同じデータになるよう乱数はこれだけを使う
+        self.rng = random.Random(args.seed)
+        self.end: datetime = args.end
+        self.start = self.end - timedelta(days=args.days)
+        statuses, weights = zip(*args.status_mix.items())
+        self.statuses: list[Status] = list(statuses)
+        self.weights: list[float] = list(weights)
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.rng.getrandbits(128), version=4)
+
+    def status(self) -> Status:
+        return self.rng.choices(self.statuses, self.weights)[0]
+
+    def created_at(
+        self, after: datetime | None = None
+    ) -> datetime:
+        start = after or self.start
+        span = (self.end - start).total_seconds()
+        return start + timedelta(
+            seconds=self.rng.random() * span
+        )
+
+    def subtask_count(self, index: int) -> int:
+        args = self.args
+        # 先頭の数件を巨大なTodoにする
+        if index < args.heavy_todos:
+            return int(args.heavy_subtasks)
+        match args.subtasks_dist:
+            case "fixed":
+                return int(args.subtasks_max)
+            case "uniform":
+                return self.rng.randint(
+                    0, int(args.subtasks_max)
+                )
+            case "pareto":
+                # 大半は少なく、ごく一部が多いロングテール
+                n = (
+                    self.rng.paretovariate(args.pareto_alpha)
+                    - 1
+                )
+                return min(int(n), int(args.subtasks_max))
+        raise ValueError(args.subtasks_dist)
+
+    def todos(self) -> Iterator[tuple[Record, list[Record]]]:
+        for i in range(self.args.todos):
+            todo_id = self.uuid()
+            created_at = self.created_at()
+            todo = (
+                todo_id,
+                f"Todo {i}",
+                self.status().name,
+                created_at,
+                self.created_at(after=created_at),
+            )
+            subtasks: list[Record] = []
+            for j in range(self.subtask_count(i)):
+                subtask_created_at = self.created_at(
+                    after=created_at
+                )
+                subtasks.append(
+                    (
+                        self.uuid(),
+                        todo_id,
+                        f"SubTask {i}-{j}",
+                        self.status().name,
+                        subtask_created_at,
+                        self.created_at(
+                            after=subtask_created_at
+                        ),
+                    )
+                )
+            yield todo, subtasks
+
+    def operations(self) -> Iterator[Record]:
+        statuses = list(OperationStatus)
+        for _ in range(self.args.operations):
+            status = self.rng.choice(statuses)
+            created_at = self.created_at()
+            yield (
+                self.uuid(),
+                int(OperationType.IMPORT_TODOS),
+                status.name,
+                "error"
+                if status == OperationStatus.ERROR
+                else "",
+                created_at,
+                self.created_at(after=created_at),
+            )
+
+
+def batched[T](
+    records: Iterator[T], size: int
+) -> Iterator[list[T]]:
+    batch: list[T] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def load(args: argparse.Namespace) -> None:
+    gen = Generator(args)
+    engine = create_async_engine(settings.DB_URI)
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        # COPYはasyncpgの接続を直接使う
+        await copy_all(gen, args, raw.driver_connection)
+    await engine.dispose()
+
+
+async def copy_all(
+    gen: Generator, args: argparse.Namespace, conn: Any
+) -> None:
+    if args.truncate:
+        await conn.execute(
+            "TRUNCATE subtasks, todos, operations"
+        )
+
+    started = time.perf_counter()
+    todo_total = subtask_total = 0
+    todos: list[Record] = []
+    subtasks: list[Record] = []
+    # 親のTodoを先にCOPYしてから子のSubTaskをCOPYする
+    for todo, children in gen.todos():
+        todos.append(todo)
+        subtasks.extend(children)
+        if len(subtasks) + len(todos) >= args.batch_size:
+            await copy(conn, todos, subtasks)
+            todo_total += len(todos)
+            subtask_total += len(subtasks)
+            todos, subtasks = [], []
+            report(todo_total, subtask_total, started)
+    await copy(conn, todos, subtasks)
+    todo_total += len(todos)
+    subtask_total += len(subtasks)
+    report(todo_total, subtask_total, started)
+
+    for operations in batched(
+        gen.operations(), args.batch_size
+    ):
+        await conn.copy_records_to_table(
+            "operations",
+            records=operations,
+            columns=OPERATION_COLUMNS,
+        )
+
+    if args.analyze:
+        await conn.execute(
+            "ANALYZE todos, subtasks, operations"
+        )
+
+
+async def copy(
+    conn: Any,
+    todos: list[Record],
+    subtasks: list[Record],
+) -> None:
+    async with conn.transaction():
+        await conn.copy_records_to_table(
+            "todos", records=todos, columns=TODO_COLUMNS
+        )
+        await conn.copy_records_to_table(
+            "subtasks",
+            records=subtasks,
+            columns=SUBTASK_COLUMNS,
+        )
+
+
+def report(todos: int, subtasks: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = (todos + subtasks) / elapsed if elapsed else 0.0
+    print(
+        f"todos={todos} subtasks={subtasks} "
+        f"elapsed={elapsed:.1f}s rows/s={rate:.0f}",
+        file=sys.stderr,
+    )
+
+
+def status_mix(value: str) -> dict[Status, float]:
+    # NEW=0.5,IN_PROGRESS=0.3,COMPLETED=0.2
+    mix: dict[Status, float] = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[Status[name.strip()]] = float(weight)
+    return mix
+
+
+def aware_datetime(value: str) -> datetime:
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="COPYで大量のテストデータを投入する"
+    )
+    parser.add_argument("--todos", type=int, default=100_000)
+    parser.add_argument(
+        "--subtasks-dist",
+        choices=["fixed", "uniform", "pareto"],
+        default="pareto",
+    )
+    parser.add_argument(
+        "--subtasks-max",
+        type=int,
+        default=50,
+        help="fixedなら件数、uniform/paretoなら上限",
+    )
+    parser.add_argument(
+        "--pareto-alpha", type=float, default=1.2
+    )
+    parser.add_argument(
+        "--heavy-todos",
+        type=int,
+        default=0,
+        help="上限を無視して大量のSubTaskを持つTodoの数",
+    )
+    parser.add_argument(
+        "--heavy-subtasks", type=int, default=10_000
+    )
+    parser.add_argument(
+        "--status-mix",
+        type=status_mix,
+        default=status_mix(
+            "NEW=0.5,IN_PROGRESS=0.3,COMPLETED=0.2"
+        ),
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=365,
+        help="created_atを分布させる日数",
+    )
+    parser.add_argument(
+        "--end",
+        type=aware_datetime,
+        default=aware_datetime("2026-01-01T00:00:00+00:00"),
+        help="created_atの最大値",
+    )
+    parser.add_argument("--operations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--batch-size", type=int, default=50_000
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="投入前に既存のデータを削除する",
+    )
+    parser.add_argument(
+        "--no-analyze", dest="analyze", action="store_false"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(load(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())